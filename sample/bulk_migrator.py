@@ -1,301 +1,149 @@
 """
     WORKATO ADMIN: Bulk-migrate contents of workspaces
 
-
+    EXAMPLE
+
+    python bulk_migrator.py <workato_env> <migrations_csv> <workspaces_json> [--dry-run]
+
+        <workato_env>       The Workato region ('us' or 'eu')
+        <migrations_csv>    Rows of <bsg_id>,<package_id>: the package is exported from workspace E<bsg_id> and
+                            imported into the HOME project of workspace E<bsg_id>_DEV
+        <workspaces_json>   Workspace details (with projects) as saved by tools/dump_workspaces.py
+        --dry-run           Estimate the run instead, without touching the API: requests per endpoint, expected
+                            duration and peak concurrency, and the migrations that can't run
+
+    Each package goes from the download straight into the import upload, held in memory rather than written to
+    disk and read back. Every step is written to bulk/operations_<timestamp>.ndjson.gz as it happens, one JSON
+    record per line with the fields time, status, error, message, operation, input and output (secrets scrubbed,
+    large payloads cut down to a preview), so the log costs the same at hour ten as in minute one. Progress (migrations done, ETA,
+    API request rate and throttling) is shown on stderr while it runs.
 """
 
-    # log is list of lists; fields are:
-    # [ 
-    #    [ <timestamp>, <status>, <error>, <message>, <operation>, <input>, <output> ],
-    #    [ <timestamp>, <status>, <error>, <message>, <operation>, <input>, <output> ]
-    # ]
-
-
-import requests, json, sys, csv, time
+import csv, json, os, sys
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-workato_config = {
-    'us': ('https://www.workato.com', '<token>'),
-    'eu': ('https://app.eu.workato.com', '<token>')
-}
+import workato_oem
 
-try:
-    api_root, api_token = workato_config[sys.argv[1]]
-    base_header = {"Authorization": f"Bearer {api_token}"}
-    mlist = csv.reader(open(sys.argv[2], 'r'))
-    wdict = json.load(open(sys.argv[3], 'r'))
-except:
-    print("Input error. Check your arguments and try again.")
+workato_tokens = {
+    'us': '<token>',
+    'eu': '<token>'
+}
 
 ## DEFINITIONS ##
 
-def export_log(logfile, log):
-    with open(f"bulk/{logfile}", 'w') as of:
-        for line in log:
-            text = "\"" + ("\", \"").join(log) + "\""
-            of.write(text)
-
-def download_package(source_ws, pkg_id):
-    fn = f"bulk/{source_ws}_{pkg_id}.zip"
-    package = { "data": fn, "log": [] }
-    error_state = False
+def get_download_url(client, log, operation, source_ws, pkg_id):
+    log.event('get_package_meta', "Getting package metadata.", operation, {'workspace': source_ws, 'package_id': pkg_id})
+    status = client.get_export_status(pkg_id, workspace_id=source_ws)
+    if status.status_code not in [200, 201] or status.data['status'] != 'completed':
+        log.event('get_package_meta', 'Failed to get package download URL.', operation, None,
+                  {'status': status.status_code, 'text': status.message}, error=True)
+        return None
+    return status.data['download_url']
+
+def transfer_package(client, log, operation, download_url, dest_ws, dest_folder):
+    # the package goes straight from the download into the import upload, held in memory rather than on disk
+    log.event('import_start', "Package transferring to import.", operation, {'workspace': dest_ws, 'folder': dest_folder, 'download_url': download_url})
+    started = client.transfer_package(download_url, dest_folder, workspace_id=dest_ws)
+    if started.status_code not in [200, 201] or 'id' not in started.data:
+        log.event('import_failed', f"Abnormal response while importing {download_url}.", operation, None,
+                  {'status': started.status_code, 'text': started.message}, error=True)
+        return None
+    finished = client.get_import_status(started.data['id'], workspace_id=dest_ws)
+    if finished.status_code in [200, 201] and finished.data['status'] == 'completed':
+        log.event('import_finish', 'Import completed.', operation, {'import_id': started.data['id']}, finished.data)
+        return finished.data
+    log.event('import_failed', 'Import operation failed.', operation, {'import_id': started.data['id']},
+              {'status': finished.status_code, 'text': finished.message}, error=True)
+    return None
+
+def process_migration(client, log, op_in):
+    # returns True once the package has been imported; failures are logged and return False
+    operation = f"{op_in['bsg_id']}:{op_in['source_package_id']}"
+    log.event('initializing', "Initializing migration.", operation, op_in)
     try:
-        target = f"{api_root}/api/managed_users/{source_ws}/exports/{pkg_id}"
-        package['log'].append([datetime.now(), # timestamp
-                            'get_package_meta', # status
-                            False, # error
-                            "Getting package metadata.", # message
-                            "requests.get() used to query package status.", # operation
-                            {
-                                "api_root": api_root,
-                                "package_status_endpoint": target,
-                                "headers": base_header
-                            }, # input
-                            None]) # output
-        # get package details from workato, to get download uri
-        r = requests.get(target, headers=base_header)
-        r_data, r_status = r.json()['result'], r.status_code
-        while r_status in [200, 201] and r_data['status'] not in ['completed', 'failed', 'error']:
-            time.sleep(3)
-            r = requests.get(target, headers=base_header)
-            r_data, r_status = r.json()['result'], r.status_code
-            package['log'].append([ datetime.now(), 'get_package_meta', False, 'Waiting for package export to finish.', None, None, {"status": r_status, "text": r_data}])
-        if r_data['status'] == 'completed':
-            package['log'].append([datetime.now(), # timestamp
-                                'get_package_meta', # status
-                                False, # error
-                                'Received reponse for package metadata request.', # message
-                                None, # operation
-                                None, # input
-                                {
-                                    "status": r_status,
-                                    "text": r_data
-                                }]) # output
-        elif r_data['status'] in ['error', 'failed'] or r_status not in [200, 201]:
-            package['log'].append([datetime.now(), 'get_package_meta', True, 'Failed to get package download URL. Request for package info failed.',
-                                   "Get package metadata: API response error.", None, { "status": r_status, "text": r_data }])
-            error_state = True
-        if error_state == False:
-            target = r_data['download_url']
-            package['log'].append([datetime.now(), # timestamp
-                                'download_start', # status
-                                False, # error
-                                "Beginning file download.", # message
-                                "requests.get() streaming file download to temp file", # operation
-                                { "download_url": target }, # input
-                                None]) # output
-            # download file from download uri; stream into fn for local copy; store binary data in package['data']
-            r = requests.get(target, stream=True)
-            with open(fn, 'wb') as of:
-                for chunk in r.iter_content(chunk_size=128):
-                    of.write(chunk)
-            package['log'].append([datetime.now(), # timestamp
-                                'download_finish', # status
-                                False, # error
-                                'Downloaded ZIP package.', # message
-                                None, # operation
-                                None, # input
-                                f"File saved as {fn}"]) # output
+        download_url = get_download_url(client, log, operation, op_in['source_workspace'], op_in['source_package_id'])
+        if download_url is None:
+            return False
+        return transfer_package(client, log, operation, download_url, op_in['destination_workspace'], op_in['destination_folder']) is not None
     except Exception as ex:
-        package['log'].append([datetime.now(),
-                    None,
-                    True,
-                    "error",
-                    ex,
-                    None,
-                    None])
-        print(package['log'])
-        #export_prompt = input("Export log for troubleshooting? [y/n]: ")
-        #if export_prompt in ['y', 'Y']:
-        #    edf = f"bulk_migrator_logdump-{datetime.now().strftime('%Y-%m-%d_%H-%M-%s')}.csv"
-        #    export_log(edf, package['log'])
-    else:
-        return package
-
-def import_package(dest_ws, dest_folder, pkg):
-    import_header = {**base_header, 'content-type': 'application/octet-stream'}
-    target = f"{api_root}/api/managed_users/{dest_ws}/imports?folder_id={dest_folder}"
-    imported = { "meta": { "upload_to": target, "package_file": pkg['data'], "import_headers": import_header}, "log": [] }
+        log.exception('error', ex, operation, op_in)
+        return False
+
+def find_migration(m, workspaces):
+    # the workspaces and folder for one CSV row; any that can't be found are left as None
+    migration = {
+        'bsg_id': m[0],
+        'source_package_id': m[1],
+        'source_workspace': None,
+        'destination_workspace': None,
+        'destination_folder': None
+    }
+    for w in workspaces:
+        if w['external_id'] == migration['bsg_id'] + "_DEV":
+            migration['destination_workspace'] = w['id']
+            for p in w['projects']:
+                if p['name'] in ['HOME', 'Home']:
+                    migration['destination_folder'] = p['folder_id']
+        elif w['external_id'] == migration['bsg_id']:
+            migration['source_workspace'] = w['id']
+    return migration
+
+def dry_run(region, migrations, workspaces):
+    # the migrations as a deployment plan (package source, one destination), run one at a time as main() does
+    client = workato_oem.Workato(region, workato_tokens[region])
+    deployments, missing = [], []
+    for m in migrations:
+        migration = find_migration(m, workspaces)
+        if None in migration.values():
+            missing.append(f"{migration['bsg_id']}:{migration['source_package_id']}: one or more parameters are missing.")
+            continue
+        deployments.append({'name': f"{migration['bsg_id']}:{migration['source_package_id']}",
+                            'source': {'workspace': migration['source_workspace'], 'package': migration['source_package_id']},
+                            'destinations': [{'workspace': migration['destination_workspace'],
+                                              'folder': migration['destination_folder']}]})
+    with workato_oem.DeploymentPlan({'deployments': deployments, 'max_workers': 1}, client) as plan:
+        result = plan.dry_run(inventory=workspaces)
+    result['problems'] = missing + result['problems']
+    print(f"{len(deployments)} migrations, {result['requests']} requests; expected to take {result['expected_seconds']}s "
+          f"with up to {result['peak_concurrency']} at once.\n")
+    for endpoint, count in sorted(result['requests_by_endpoint'].items()):
+        print(f"{count:>8}  {endpoint}")
+    for problem in result['problems']:
+        print(f"PROBLEM: {problem}")
+    return result
+
+def main(region, migrations, workspaces):
+    os.makedirs('bulk', exist_ok=True)
+    sink = workato_oem.NDJSONSink(f"bulk/operations_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.ndjson.gz")
+    log = workato_oem.OperationLog(sink)
+    client = workato_oem.Workato(region, workato_tokens[region])
+    log.listen(client.metrics, sample_every=20)
+    progress = workato_oem.ProgressReporter(len(migrations), client.metrics, 'migrations').start()
     try:
-        package = open(pkg['data'], 'rb')
-        imported['log'].append([datetime.now(),
-                                'import_start',
-                                False,
-                                "Package file opened. Queued to import.",
-                                "open(pkg_file, 'rw')",
-                                { 'pkg_file': pkg['data'] },
-                                None])
-        import_result = requests.post(target, headers=import_header, data=package)
-        i_status, i_data = import_result.status_code, import_result.json()
-        if 'id' not in i_data.keys():
-            print(i_data)
-            raise Exception(f"Abnormal reponse received while trying to import package {pkg['data']} to {target}.")
-        pkg_id = i_data['id']
-        while i_status in [200, 201] and i_data['status'] not in ['completed', 'failed', 'error']:
-            time.sleep(3)
-            target = f"{api_root}/api/managed_users/{dest_ws}/imports/{pkg_id}"
-            import_result = requests.get(target, headers=base_header)
-            i_status, i_data = import_result.status_code, import_result.json()
-            imported['log'].append([datetime.now(),
-                                    'import_in_progress',
-                                    False,
-                                    'Waiting for import to complete',
-                                    'check import status',
-                                    { 'workspace': dest_ws, 'import_id': pkg_id },
-                                    { 'request_status': i_status, 'response': i_data }])
-        if i_status in [200, 201] and i_data['status'] == 'completed':
-            imported['log'].append([datetime.now(),
-                                    'import_finish',
-                                    False,
-                                    'Waiting for import to complete',
-                                    'check import status',
-                                    { 'workspace': dest_ws, 'import_id': pkg_id },
-                                    { 'request_status': i_status, 'response': i_data }])
-        else:
-            imported['log'].append([datetime.now(),
-                                    'import_failed',
-                                    True,
-                                    'Import operation failed.',
-                                    None,
-                                    { 'workspace': dest_ws, 'import_id': pkg_id },
-                                    { 'request_status': i_status, 'response': i_data }])
-    except Exception as ex:
-        package['log'].append([datetime.now(),
-                    None,
-                    True,
-                    "error",
-                    ex,
-                    None,
-                    None])
-        print(package['log'])
-        #export_prompt = input("Export log for troubleshooting? [y/n]: ")
-        #if export_prompt in ['y', 'Y']:
-        #    edf = f"bulk_migrator_logdump-{datetime.now().strftime('%Y-%m-%d_%H-%M-%s')}.csv"
-        #    export_log(edf, package['log'])
-    else:
-        package.close()
-        return imported
-
-
-def process_migration(op_in):
-    source_workspace = op_in['source_workspace']
-    source_package = op_in['source_package_id']
-    destination_workspace = op_in['destination_workspace']
-    destination_folder = op_in['destination_folder']
-    log = [[datetime.now(),
-            "initializing", 
-            False, 
-            "Initializing migration.", 
-            "Setting migration parameters.", 
-            op_in, 
-            {
-                "source_workspace": source_workspace,
-                "source_package": source_package,
-                "destination_workspace": destination_workspace,
-                "destination_folder": destination_folder
-            }]]
-    #log.append([datetime.now(),
-    #            "initializing", 
-    #            False, 
-    #            "Initializing migration.", 
-     #           "Setting migration parameters.", 
-     #           op_in, 
-     #           {
-     #               "source_workspace": source_workspace,
-     #               "source_package": source_package,
-     #               "destination_workspace": destination_workspace,
-     #               "destination_folder": destination_folder
-     #           }])
+        for m in migrations:
+            migration = find_migration(m, workspaces)
+            if None not in migration.values():
+                progress.started(migration['bsg_id'])
+                progress.finished(migration['bsg_id'], ok=process_migration(client, log, migration))
+            else:
+                progress.finished(migration['bsg_id'], ok=False)
+                log.event('operation_audit_failed', "One or more parameters are missing for operation.", None, migration, error=True)
+    finally:
+        progress.stop()
+        log.close()
+    print(f"Done. {log.summary()}")
+
+if __name__ == '__main__':
     try:
-        log.append([datetime.now(),
-                    "download_package",
-                    False,
-                    "download_start",
-                    "Calling download_package()",
-                    {
-                        "source_workspace": source_workspace,
-                        "source_package": source_package
-                    },
-                    None])
-        package = download_package(source_workspace, source_package)
-        log.append([datetime.now(),
-                    "download_package",
-                    False,
-                    "download_finish",
-                    "Download package returned package successfully.",
-                    None,
-                    package['log']])
-        log.append([datetime.now(),
-                    "import_package",
-                    False,
-                    "import_start",
-                    "Calling import_package()",
-                    {
-                        "destination_workspace": destination_workspace,
-                        "destination_folder": destination_folder,
-                        "source_package": package['data']
-                    },
-                    None])
-        import_operation = import_package(destination_workspace, destination_folder, package)
-        log.append([datetime.now(),
-                    "import_package",
-                    False,
-                    "import_finish",
-                    "Import finished successfully.",
-                    None,
-                    import_operation['log']])
-    except Exception as ex:
-        log.append([datetime.now(),
-                    None,
-                    True,
-                    "error",
-                    ex,
-                    None,
-                    None])
-        print(log)
-        #export_prompt = input("Export log for troubleshooting? [y/n]: ")
-        #if export_prompt in ['y', 'Y']:
-        #    edf = f"bulk_migrator_logdump-{datetime.now().strftime('%Y-%m-%d_%H-%M-%s')}.csv"
-        #    export_log(edf, log)
-    else:
-        return log
-
-def main(migrations, workspaces):
-    print(f"{api_root}\n{api_token}\n{base_header}\n\n")
-    operations = []
-    log = []
-    for m in migrations:
-        migration = {
-            'bsg_id': m[0],
-            'source_package_id': m[1],
-            'source_workspace': None,
-            'destination_workspace': None,
-            'destination_folder': None
-        }
-        for w in workspaces:
-            if w['external_id'] == migration['bsg_id'] + "_DEV":
-                migration['destination_workspace'] = w['id']
-                for p in w['projects']:
-                    if p['name'] in ['HOME', 'Home']:
-                        migration['destination_folder'] = p['folder_id']
-            elif w['external_id'] == migration['bsg_id']:
-                migration['source_workspace'] = w['id']
-        operations.append(migration)
-    for op in operations:
-        if None not in op.values():
-            operation = process_migration(op)
-            for m in operation:
-                log.append(m)
-        else:
-            log.append([datetime.now(),
-                        'operation_audit_failed',
-                        True,
-                        'check_operation_parameters_failed',
-                        "One or more parameters are missing for operation.",
-                        op,
-                        None])
-    export_log(f"operations_{datetime.now().strftime('%Y-%m-%d_%H-%M-%s')}.csv", log)
-    print("Done.")
-
-main(mlist, wdict)
\ No newline at end of file
+        region = sys.argv[1]
+        with open(sys.argv[2], 'r') as mf:
+            mlist = list(csv.reader(mf))
+        with open(sys.argv[3], 'r') as wf:
+            wdict = json.load(wf)
+    except (IndexError, OSError, ValueError):
+        sys.exit("Input error. Check your arguments and try again.")
+    if '--dry-run' in sys.argv[4:]:
+        sys.exit(1 if dry_run(region, mlist, wdict)['problems'] else 0)
+    main(region, mlist, wdict)
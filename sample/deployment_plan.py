@@ -0,0 +1,106 @@
+"""
+    WORKATO DEPLOYMENT PLAN
+    Run a release touching many workspaces as one job
+
+    EXAMPLE
+
+    python deployment_plan.py <workato_env> <plan_file> [<report_file>] [--dry-run] [--inventory=<file>]
+
+    PARAMETERS:
+        <workato_env>       The Workato region to perform the deployments in ('us' or 'eu')
+        <plan_file>         A JSON or YAML (needs PyYAML) plan listing the deployments; see below
+        <report_file>       Optional; where to write the per-step results (or the dry-run estimate) as JSON
+        --dry-run           Estimate the run instead: requests per endpoint, expected duration, peak concurrency
+        --inventory=<file>  With --dry-run, check every workspace and folder against a workspace dump (eg. the
+                            output of tools/dump_workspaces.py)
+
+    PLAN FORMAT:
+        max_workers: 8
+        record: deployed_us.json                                # optional; skip imports that would change nothing
+        deployments:
+          - name: client-9000
+            source: {workspace: E9000_DEV, manifest: 123}       # or package: <package_id>
+            destinations:
+              - workspace: E9000
+                folder: 111
+                restart: true                                   # restart recipes stopped by the import
+                properties: {from: E9000_DEV, prefix: acme_}    # or values: {name: value, ...}
+                restart_recipes: [1, 2]                         # stopped and started after the import
+            depends_on: [client-8000]                           # optional; other deployments to finish first
+        workspaces:                                             # optional; workspaces to create first
+          - {name: Acme, external_id: "9000", notification_email: ops@acme.com}
+
+    Each source is exported and downloaded once however many deployments use it, and every step runs as soon as
+    the steps it depends on have succeeded. A failed step skips only what depends on it; the script carries on
+    with the rest and exits with status 1 at the end if anything did not succeed.
+"""
+
+import json, os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workato_oem
+
+## CONSTANTS
+
+WORKATO_TOKENS = {
+    'us': '<token>',
+    'eu': '<token>'
+}
+
+## FUNCTIONS
+
+def step_finished(step):
+    print(f"{step.status.upper():>10}  {step.id}" + (f"  ({step.error})" if step.error else ""))
+    return None
+
+def estimate(plan, inventory_file):
+    inventory = None
+    if inventory_file:
+        with open(inventory_file, 'r') as inf:
+            inventory = json.load(inf)
+    result = plan.dry_run(inventory=inventory)
+    print(f"{result['steps']} steps, {result['requests']} requests; expected to take {result['expected_seconds']}s "
+          f"with up to {result['peak_concurrency']} steps at once ({result['rate_limit_wait_seconds']}s waiting on "
+          f"the rate limit).\n")
+    for endpoint, count in sorted(result['requests_by_endpoint'].items()):
+        print(f"{count:>8}  {endpoint}")
+    for problem in result['problems']:
+        print(f"PROBLEM: {problem}")
+    return result
+
+def summary(report):
+    counts = {}
+    for step in report:
+        counts[step['status']] = counts.get(step['status'], 0) + 1
+    print("\n" + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    return counts
+
+## MAIN
+
+def main(argv):
+    flags = {a.split('=')[0]: a.partition('=')[2] for a in argv if a.startswith('--')}
+    args = [a for a in argv if not a.startswith('--')]
+    region, plan_file = args[1], args[2]
+    client = workato_oem.Workato(region, WORKATO_TOKENS[region])
+    with workato_oem.DeploymentPlan(workato_oem.load_plan(plan_file), client) as plan:
+        if '--dry-run' in flags:
+            result = estimate(plan, flags.get('--inventory'))
+            if len(args) > 3:
+                with open(args[3], 'w') as rf:
+                    json.dump(result, rf, indent=4)
+            if result['problems']:
+                sys.exit(1)
+            return None
+        print(f"Running {len(plan.steps)} steps (working directory: {plan.workdir}).\n")
+        report = plan.execute(on_step=step_finished)
+    if len(args) > 3:
+        with open(args[3], 'w') as rf:
+            json.dump(report, rf, indent=4)
+    counts = summary(report)
+    if set(counts) - {'succeeded'}:
+        sys.exit(1)
+    return None
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -15,18 +15,23 @@
         <dest_folder>       The folder ID of the destination folder in the destination workspace
         <restart>           Set to 1 if you would like recipes to be restarted manually (when stopped during deployment); otherwise, 0
 
+    The package is passed from the download straight into the import upload, held in memory (or, past 64MB, in an
+    anonymous temporary file) rather than written to a local file and read back.
+
 """
 
-import requests, json, sys, time, tempfile
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workato_oem
 
 ## CONSTANTS
 
-WORKATO_ENVS = {
-    'us': ('https://www.workato.com', '<token>'),
-    'eu': ('https://www.eu.workato.com', '<token>')
+WORKATO_TOKENS = {
+    'us': '<token>',
+    'eu': '<token>'
 }
-TEMP_DIR = tempfile.TemporaryDirectory()
-PKG_DIR = TEMP_DIR.name
 
 ## FUNCTIONS
 def generate_input(sys_args):
@@ -42,92 +47,51 @@ def generate_input(sys_args):
         "dest_params": {
             "dest_workspace": sys_args[5],
             "dest_folder": sys_args[6],
-            "restart_recipes": sys_args[7]
+            "restart_recipes": sys_args[7] == '1'
         }
     }
     return in_obj
 
-def global_config(src_data):
-    api_root, api_token = WORKATO_ENVS[src_data['workato_env']]
-    base_header = {'Authorization': f"Bearer {api_token}"}
-    return api_root, base_header
-
 def request_failed(message):
     print("API ERROR\n")
     print(message)
     print("\n")
     sys.exit("Aborting...")
 
-def download_package(url, file_name):
-    print("DOWNLOADING PACKAGE ZIP...")
-    r = requests.get(url, stream=True)
-    with open(f"{PKG_DIR}/{file_name}", 'wb') as fd:
-        for chunk in r.iter_content(chunk_size=128):
-            fd.write(chunk)
-    return file_name
-
-def export_package(source_workspace, manifest_id):
+def export_package(client, source_workspace, manifest_id):
     print("EXPORTING MANIFEST AS DOWNLOADABLE PACKAGE...")
-    target = f"{API_ROOT}/api/managed_users/{source_workspace}/exports/{manifest_id}"
-    export_operation = requests.post(target, headers=BASE_HEADER)
-    response, r_code = json.loads(export_operation.text), export_operation.status_code
-    ## test
-    print(response, "\n", r_code)
-    ##
-    if r_code in [200, 201]:
-        return response['id']
+    export_operation = client.export_package(manifest_id, workspace_id=source_workspace)
+    print(export_operation.data, "\n", export_operation.status_code)
+    if export_operation.status_code in [200, 201]:
+        return export_operation.data['id']
     else:
-        request_failed(f"Error exporting package.\n\n{response}\n\n")
+        request_failed(f"Error exporting package.\n\n{export_operation.message}\n\n")
 
-def get_package(package):
+def get_package(client, package):
     print("GETTING PACKAGE FROM SOURCE WORKSPACE...")
     if package['pkg_type'] == 'manifest':
-        package_id = export_package(package['src_workspace'], package['id'])
+        package_id = export_package(client, package['src_workspace'], package['id'])
     else:
         package_id = package['id']
-    target = f"{API_ROOT}/api/managed_users/{package['src_workspace']}/exports/{package_id}"
-    response = requests.get(target, headers=BASE_HEADER)
-    r_data, r_code = json.loads(response.text)['result'], response.status_code
-    ## test
-    print(r_data, "\n", r_code)
-    ##
-    while r_code in [200, 201] and r_data['status'] not in ['completed', 'failed', 'error']:
-        time.sleep(3)
-        response = requests.get(target, headers=BASE_HEADER)
-        r_data, r_code = json.loads(response.text), response.status_code
-        ## test
-        print(r_data, "\n", r_code)
-        ##
-    if r_code in [200, 201] and r_data['status'] == 'completed':
-        package = download_package(r_data['download_url'], f"{r_data['id']}.zip")
+    status = client.get_export_status(package_id, workspace_id=package['src_workspace'])
+    print(status.data, "\n", status.status_code)
+    if status.status_code in [200, 201] and status.data['status'] == 'completed':
+        return status.data['download_url']
     else:
-        request_failed("Package ID not available. Response:\n{r_data}")
-    return package
+        request_failed(f"Package ID not available. Response:\n{status.message}")
 
-def deploy_package(destination, package):
+def deploy_package(client, destination, download_url):
     print("DEPLOYING PACKAGE TO DESTINATION WORKSPACE...")
-    up_headers = {**BASE_HEADER, 'Content-Type': 'application/octet-stream'}
-    up_to = f"{API_ROOT}/api/managed_users/{destination['dest_workspace']}/imports?folder_id={destination['dest_folder']}"
-    if destination['restart_recipes'] is True:
-        up_to += '&restart_recipes=true' # UNTESTED
-    pkg = open(f"{PKG_DIR}/{package}", 'rb')
-    import_operation = requests.post(up_to, headers=up_headers, data=pkg)
-    i_data, i_code = json.loads(import_operation.text), import_operation.status_code
-    ## test
-    print(i_data, "\n", i_code)
-    ##
-    while i_code in [200, 201] and i_data['status'] not in ['completed', 'failed', 'error']:
-        time.sleep(3)
-        target = f"{API_ROOT}/api/managed_users/{destination['dest_workspace']}/imports/{i_data['id']}"
-        response = requests.get(target, headers=BASE_HEADER)
-        i_data, i_code = json.loads(response.text), response.status_code
-        ## test
-        print(i_data, "\n", i_code)
-        ##
-    if i_code in [200, 201] and i_data['status'] == 'completed':
-        return i_data
+    import_operation = client.transfer_package(download_url, destination['dest_folder'], destination['restart_recipes'],
+                                               workspace_id=destination['dest_workspace'])
+    print(import_operation.data, "\n", import_operation.status_code)
+    if import_operation.status_code not in [200, 201]:
+        request_failed(f"Package import failed. Response:\n{import_operation.message}")
+    result = client.get_import_status(import_operation.data['id'], workspace_id=destination['dest_workspace'])
+    if result.status_code in [200, 201] and result.data['status'] == 'completed':
+        return result.data
     else:
-        request_failed(f"Package import failed. Response:\n{i_data}")
+        request_failed(f"Package import failed. Response:\n{result.message}")
 
 def deployment_report(result):
     dep_table_format = "{f:>20}:\t{v:<}"
@@ -141,21 +105,16 @@ def deployment_report(result):
     print("\n\n")
     return True
 
-## GLOBAL CONFIG
-
-input_object = generate_input(sys.argv)
-API_ROOT, BASE_HEADER = global_config(input_object['ops_params'])
-
 ## MAIN
 
 def main(config):
-    print(f"Using temporary directory: {PKG_DIR}.\n")
-    solution_package = get_package(config['src_params'])
-    imported_package = deploy_package(config['dest_params'], solution_package)
+    region = config['ops_params']['workato_env']
+    client = workato_oem.Workato(region, WORKATO_TOKENS[region])
+    download_url = get_package(client, config['src_params'])
+    imported_package = deploy_package(client, config['dest_params'], download_url)
     print(f"Package deployed successfully!\n\nDETAILS:\n")
     deployment_report(imported_package)
     sys.exit("Exiting.")
 
-main(input_object)
-
-TEMP_DIR.cleanup()
\ No newline at end of file
+if __name__ == '__main__':
+    main(generate_input(sys.argv))
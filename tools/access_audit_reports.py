@@ -4,7 +4,7 @@
 
     EXAMPLE:
 
-    $ python access_audit_reports.py <workato_env>
+    $ python access_audit_reports.py <workato_env> [--workers=N] [--processes=N]
 
     Where <workato_env> is the regional Workato environment (ie., 'us' or 'eu'). The output will be three HTML files, as follows:
 
@@ -27,91 +27,100 @@
 
     Output files are stored in ./data, relative to the filesystem location of this script.
 
+    Workspace members are fetched on several threads while the report rows are rendered in worker processes
+    (see workato_oem.CPUPool), so rendering a large organization doesn't hold up the crawl. Pass --workers=N to
+    change the number of request threads (default 4) and --processes=N the number of worker processes (default:
+    one per CPU; 0 renders in the main process).
+
 """
 
-import requests, json, datetime, sys
+import datetime, os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workato_oem
 
 ## CONSTANTS
 
-WORKATO_ENVS = {
-    'us': ('https://www.workato.com', '<token>'),
-    'eu': ('https://app.eu.workato.com', '<token>')
+WORKATO_TOKENS = {
+    'us': '<token>',
+    'eu': '<token>'
 }
-API_ROOT, API_TOKEN = WORKATO_ENVS[sys.argv[1]]
-BASE_HEADER = {'Authorization': f"Bearer {API_TOKEN}"}
 RUNTIME = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 REPORT_DIR = './data/reports' # 'data/reports'
+DEPLOYER_ROLE = 'Deployment Engineer'
 
 ## FUNCTIONS
-
-def generate_roles_report():
-    report_title = "Workato User Roles"
-    results = {
-        'report': f"<html><head><title>{report_title}</title></head><body><header><h1>{report_title}</h1></header><main>",
-        'error': False
-    }
-    target = f"{API_ROOT}/api/roles"
-    response = requests.get(target, headers=BASE_HEADER)
-    if response.status_code in [200, 201]:
-        results['report'] += "<table><tr><th>Role ID</th><th>Role Name</th><th>Role Permissions</th></tr>"
-        roles = json.loads(response.text)
-        for role in roles:
-            results['report'] += f"<tr><td>{role['id']}</td><td>{role['name']}</td><td>{role['privileges']}</td></tr>"
-        results['report'] += f"</table></main><hr /><footer>{RUNTIME}</footer></body></html>"
-    else:
-        results['report'] = response.text
-        results['error'] = True
-    return results
-
-def generate_workspace_members_report():
-    report_title = "Workato Users by Workspace"
-    results = {
-        'report': f"<html><head><title>{report_title}</title></head><body><header><h1>{report_title}</h1></header><main>",
-        'error': False,
-        'dep_eng': []
-    }
-    target = f"{API_ROOT}/api/managed_users"
-    response = requests.get(target, headers=BASE_HEADER)
-    if response.status_code in [200, 201]:
-        workspaces = json.loads(response.text)['result']
-        results['report'] += "<table><tr><th>User Name</th><th>User ID</th><th>Role In Workspace</th></tr>"
-        for wksp in workspaces:
-            results['report'] += f"<tr><td colspan=\"3\"><strong>{wksp['name']}</strong> ({wksp['external_id']})</td></tr>"
-            target = f"{API_ROOT}/api/managed_users/{wksp['id']}/members"
-            response2 = requests.get(target, headers=BASE_HEADER)
-            if response2.status_code in [200, 201]:
-                wksp_members = json.loads(response2.text)
-                for mem in wksp_members:
-                    results['report'] += f"<tr><td>{mem['name']}</td><td>{mem['id']}</td><td>{mem['role_name']}</td></tr>"
-                    if mem['role_name'] == 'Deployment Engineer':
-                        results['dep_eng'].append({'member_id': mem['id'], 'member_name': mem['name'], 'workspace': wksp['name'], 'workspace_ext_id': wksp['external_id']})
-            else:
-                results['report'] += f"<tr><td colspan=\"3\"><em>ERROR OCCURRED RETRIEVING WORKSPACE MEMBERS</em></td></tr>"
-        results['report'] += f"</table></main><footer>{RUNTIME}</footer></body></html>"
-    else:
-        results['report'] = response.text
-        results['error'] = True
-    return results
-
-def generate_deployers_report(deployers):
-    report_title = "Workato Users with Deployment Permissions"
-    results = {
-        'report': f"<html><head><title>{report_title}</title></head><body><header><h1>{report_title}</h1></header><main><table>",
-        'error': False
-    }
+# (the render_* functions run in worker processes, so they take and return plain data)
+
+def render_roles(roles):
+    rows = "".join(f"<tr><td>{role['id']}</td><td>{role['name']}</td><td>{role['privileges']}</td></tr>" for role in roles)
+    return f"<table><tr><th>Role ID</th><th>Role Name</th><th>Role Permissions</th></tr>{rows}</table>"
+
+def render_workspace(wksp, wksp_members):
+    rows = [f"<tr><td colspan=\"3\"><strong>{wksp['name']}</strong> ({wksp['external_id']})</td></tr>"]
+    deployers = []
+    if wksp_members is None:
+        rows.append("<tr><td colspan=\"3\"><em>ERROR OCCURRED RETRIEVING WORKSPACE MEMBERS</em></td></tr>")
+        return "".join(rows), deployers
+    for mem in wksp_members:
+        rows.append(f"<tr><td>{mem['name']}</td><td>{mem['id']}</td><td>{mem['role_name']}</td></tr>")
+        if mem['role_name'] == DEPLOYER_ROLE:
+            deployers.append({'member_id': mem['id'], 'member_name': mem['name'], 'workspace': wksp['name'], 'workspace_ext_id': wksp['external_id']})
+    return "".join(rows), deployers
+
+def render_deployers(deployers):
     dep_eng = {}
     for each in deployers:
         if str(each['member_id']) not in dep_eng.keys():
             dep_eng[str(each['member_id'])] = { 'name': each['member_name'], 'workspaces': [{'name': each['workspace'], 'external_id': each['workspace_ext_id']}]}
         else:
             dep_eng[str(each['member_id'])]['workspaces'].append({'name': each['workspace'], 'external_id': each['workspace_ext_id']})
+    rows = []
     for de in dep_eng:
-        results['report'] += f"<tr><th><strong>{dep_eng[de]['name']}</strong> <em>(Workato ID: {de})</em></th></tr>"
+        rows.append(f"<tr><th><strong>{dep_eng[de]['name']}</strong> <em>(Workato ID: {de})</em></th></tr>")
         for ws in dep_eng[de]['workspaces']:
-            results['report'] += f"<tr><td>{ws['name']}</td><td>External ID: {ws['external_id']}</td></tr>"
-    #
-    results['report'] += f"</table></main><footer>{RUNTIME}</footer></body></html>"
-    return results
+            rows.append(f"<tr><td>{ws['name']}</td><td>External ID: {ws['external_id']}</td></tr>")
+    return f"<table>{''.join(rows)}</table>"
+
+def page(report_title, body, rule=False):
+    return (f"<html><head><title>{report_title}</title></head><body><header><h1>{report_title}</h1></header>"
+            f"<main>{body}</main>{'<hr />' if rule else ''}<footer>{RUNTIME}</footer></body></html>")
+
+def generate_roles_report(client, cpu):
+    response = client.api_request('get', '/api/roles')
+    if response.status_code not in [200, 201]:
+        return {'report': response.message, 'error': True}
+    return {'report': page("Workato User Roles", cpu.run(render_roles, response.data), rule=True), 'error': False}
+
+def crawl_members(client, workspaces, workers):
+    # yields (workspace, members) in order as the request threads fetch them; members is None if that failed
+    from concurrent.futures import ThreadPoolExecutor
+
+    def members(wksp):
+        try:
+            with client.priority('bulk'):
+                return client.list_workspace_members(wksp['id'])
+        except workato_oem.InternalOperationError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from zip(workspaces, pool.map(client.carry_deadline(members), workspaces))
+
+def generate_workspace_members_report(client, cpu, workers):
+    try:
+        workspaces = list(client.list_workspaces())
+    except workato_oem.InternalOperationError as ex:
+        return {'report': ex.message, 'error': True, 'dep_eng': []}
+    rows, dep_eng = [], []
+    for wksp_rows, deployers in cpu.starmap(render_workspace, crawl_members(client, workspaces, workers)):
+        rows.append(wksp_rows)
+        dep_eng.extend(deployers)
+    body = f"<table><tr><th>User Name</th><th>User ID</th><th>Role In Workspace</th></tr>{''.join(rows)}</table>"
+    return {'report': page("Workato Users by Workspace", body), 'error': False, 'dep_eng': dep_eng}
+
+def generate_deployers_report(cpu, deployers):
+    return {'report': page("Workato Users with Deployment Permissions", cpu.run(render_deployers, deployers)), 'error': False}
 
 def export_report(data, filename):
     out_file = f"{REPORT_DIR}/{filename}" #f"{filename}" #f"{REPORT_DIR}/{filename}"
@@ -125,13 +134,19 @@ def export_report(data, filename):
 
 ## MAIN
 
-def main():
-    roles = generate_roles_report()
-    export_report(roles, f"workato_roles_{sys.argv[1]}_{RUNTIME}.html")
-    wksp_members = generate_workspace_members_report()
-    export_report(wksp_members, f"user_membership_by_workspace_{sys.argv[1]}_{RUNTIME}.html")
-    dep_eng = generate_deployers_report(wksp_members['dep_eng'])
-    export_report(dep_eng, f"users_with_deploy_permissions_{sys.argv[1]}_{RUNTIME}.html")
+def main(argv):
+    flags = {a.split('=')[0]: a.partition('=')[2] for a in argv if a.startswith('--')}
+    region = [a for a in argv if not a.startswith('--')][1]
+    processes = int(flags['--processes']) if flags.get('--processes') else None
+    client = workato_oem.Workato(region, WORKATO_TOKENS[region])
+    with workato_oem.CPUPool(processes) as cpu, client.priority('bulk'):
+        roles = generate_roles_report(client, cpu)
+        export_report(roles, f"workato_roles_{region}_{RUNTIME}.html")
+        wksp_members = generate_workspace_members_report(client, cpu, int(flags.get('--workers') or 4))
+        export_report(wksp_members, f"user_membership_by_workspace_{region}_{RUNTIME}.html")
+        dep_eng = generate_deployers_report(cpu, wksp_members['dep_eng'])
+        export_report(dep_eng, f"users_with_deploy_permissions_{region}_{RUNTIME}.html")
     return None
 
-main()
\ No newline at end of file
+if __name__ == '__main__':
+    main(sys.argv)
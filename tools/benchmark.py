@@ -0,0 +1,244 @@
+"""
+    benchmark.py
+
+    Offline benchmark suite for workato_oem. Starts the local Workato stand-in from mock_workato.py, runs the
+    call patterns of our tools against it through the `Workato` client, and reports throughput (ops/sec) and
+    per-operation p50/p99 latency so performance regressions show up before a change reaches production.
+
+    WORKLOADS
+        audit       roles, every managed user workspace (paginated), and each workspace's members
+                    (the access_audit_reports crawl); one op per workspace
+        dump        every managed user workspace plus its folders and projects (dump_workspaces); one op
+                    per workspace
+        migrate     export -> poll -> download -> import -> poll for each migration (bulk_migrator); one op
+                    per migration
+        package     download to disk and re-upload of an exported package; one op per package
+        transfer    the same through `transfer_package()`, in memory (rlcm_pipeline, bulk_migrator); one op
+                    per package
+
+    USAGE
+        $ python benchmark.py [--workloads audit,dump,migrate,package,transfer] [--workspaces 50] [--concurrency 4]
+                              [--latency 0.02] [--throttle 0.0] [--output results.json]
+                              [--baseline previous.json] [--tolerance 0.15]
+
+    With --baseline, any workload whose ops/sec dropped by more than --tolerance (a fraction) against the
+    baseline file is reported and the script exits with status 1.
+"""
+
+import argparse, json, os, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workato_oem
+from mock_workato import MockWorkato
+
+## FUNCTIONS
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+def with_retry(client, fn, *args, attempts=5, **kwargs):
+    """
+    Calls one of the client's methods, retrying while the API answers 429 (honouring Retry-After).
+    """
+    for attempt in range(attempts):
+        response = fn(*args, **kwargs)
+        if getattr(response, 'status_code', None) != 429 or attempt == attempts - 1:
+            return response
+        client.metrics.record_retry(None, fn.__name__, 'throttled')
+        time.sleep(float(response.header.get('Retry-After', 0) or 0))
+    return response
+
+def list_workspaces(client, per_page=100):
+    workspaces, page = [], 1
+    while True:
+        response = with_retry(client, client.api_request, 'get', '/api/managed_users', url_params={'page': page, 'per_page': per_page})
+        batch = response.data['result'] if response.status_code == 200 else []
+        workspaces += batch
+        if len(batch) < per_page:
+            return workspaces
+        page += 1
+
+def run_ops(items, op, concurrency):
+    """Runs `op` over `items` on a thread pool; returns (per-op latencies, failures, wall seconds)."""
+    latencies, failures = [], 0
+
+    def timed(item):
+        started = time.perf_counter()
+        op(item)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(timed, item) for item in items]:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                failures += 1
+    return latencies, failures, time.perf_counter() - started
+
+#
+# Workloads (each returns the items to process and the per-item operation)
+
+def audit_workload(client, args):
+    with_retry(client, client.api_request, 'get', '/api/roles')
+    workspaces = list_workspaces(client)
+
+    def op(ws):
+        response = with_retry(client, client.api_request, 'get', f"/api/managed_users/{ws['id']}/members")
+        if response.status_code != 200:
+            raise workato_oem.InternalOperationError(response.log_message)
+    return workspaces, op
+
+def dump_workload(client, args):
+    workspaces = list_workspaces(client)
+
+    def op(ws):
+        for resource in ['folders', 'projects']:
+            response = with_retry(client, client.api_request, 'get', f"/api/managed_users/{ws['id']}/{resource}")
+            if response.status_code != 200:
+                raise workato_oem.InternalOperationError(response.log_message)
+    return workspaces, op
+
+def migrate_workload(client, args):
+    workspaces = list_workspaces(client)
+    pairs = [(workspaces[i]['id'], workspaces[i + 1]['id']) for i in range(0, len(workspaces) - 1, 2)][:args.migrations]
+    workdir = tempfile.mkdtemp(prefix='workato_bench_')
+
+    def op(pair):
+        source, destination = pair
+        export = with_retry(client, client.export_package, 1, workspace_id=source)
+        status = with_retry(client, client.get_export_status, export.data['id'], workspace_id=source)
+        local_file = os.path.join(workdir, f"{source}_{export.data['id']}.zip")
+        client.download_package(status.data['download_url'], local_file)
+        started = with_retry(client, client.import_package, local_file, 1, workspace_id=destination)
+        finished = with_retry(client, client.get_import_status, started.data['id'], workspace_id=destination)
+        os.remove(local_file)
+        if finished.data['status'] != 'completed':
+            raise workato_oem.InternalOperationError(f"Import {started.data['id']} did not complete.")
+    return pairs, op
+
+def package_workload(client, args):
+    workspaces = list_workspaces(client)
+    source = workspaces[0]['id']
+    export = with_retry(client, client.export_package, 1, workspace_id=source)
+    status = with_retry(client, client.get_export_status, export.data['id'], workspace_id=source)
+    workdir = tempfile.mkdtemp(prefix='workato_bench_')
+
+    def op(n):
+        local_file = os.path.join(workdir, f"package_{n}.zip")
+        client.download_package(status.data['download_url'], local_file)
+        response = with_retry(client, client.import_package, local_file, 1, workspace_id=workspaces[n % len(workspaces)]['id'])
+        os.remove(local_file)
+        if response.status_code != 200:
+            raise workato_oem.InternalOperationError(response.log_message)
+    return list(range(args.packages)), op
+
+def transfer_workload(client, args):
+    workspaces = list_workspaces(client)
+    source = workspaces[0]['id']
+    export = with_retry(client, client.export_package, 1, workspace_id=source)
+    status = with_retry(client, client.get_export_status, export.data['id'], workspace_id=source)
+
+    def op(n):
+        response = with_retry(client, client.transfer_package, status.data['download_url'], 1,
+                              workspace_id=workspaces[n % len(workspaces)]['id'])
+        if response.status_code != 200:
+            raise workato_oem.InternalOperationError(response.log_message)
+    return list(range(args.packages)), op
+
+WORKLOADS = {
+    'audit': audit_workload,
+    'dump': dump_workload,
+    'migrate': migrate_workload,
+    'package': package_workload,
+    'transfer': transfer_workload,
+}
+
+def run_workload(name, args):
+    server = MockWorkato(workspaces=args.workspaces, members=args.members, latency=args.latency, jitter=args.jitter,
+                         throttle=args.throttle, page_size=args.page_size, operation_polls=args.operation_polls,
+                         package_recipe_size=args.package_kb * 1024 // 5).start()
+    try:
+        client = workato_oem.Workato('us', 'benchmark-token', poll_interval=args.poll_interval)
+        client.api_root = server.url
+        items, op = WORKLOADS[name](client, args)
+        latencies, failures, wall = run_ops(items, op, args.concurrency)
+        snapshot = client.metrics.snapshot()
+        return {
+            'workload': name,
+            'ops': len(latencies),
+            'failures': failures,
+            'seconds': wall,
+            'ops_per_sec': len(latencies) / wall if wall else 0.0,
+            'p50': percentile(latencies, 0.50),
+            'p99': percentile(latencies, 0.99),
+            'requests': sum(e['count'] for e in snapshot['endpoints']),
+            'bytes_in': sum(e['bytes_in'] for e in snapshot['endpoints']),
+            'bytes_out': sum(e['bytes_out'] for e in snapshot['endpoints']),
+            'throttled': snapshot['throttled'],
+            'retries': snapshot['retries'],
+        }
+    finally:
+        server.stop()
+
+def report(results):
+    row = "{workload:<10} {ops:>6} {failures:>5} {seconds:>9} {ops_per_sec:>9} {p50:>9} {p99:>9} {requests:>8} {throttled:>6}"
+    print(row.format(workload='workload', ops='ops', failures='fail', seconds='seconds', ops_per_sec='ops/sec',
+                     p50='p50 ms', p99='p99 ms', requests='requests', throttled='429s'))
+    for r in results:
+        print(row.format(workload=r['workload'], ops=r['ops'], failures=r['failures'], seconds=f"{r['seconds']:.3f}",
+                         ops_per_sec=f"{r['ops_per_sec']:.1f}", p50=f"{(r['p50'] or 0) * 1000:.1f}",
+                         p99=f"{(r['p99'] or 0) * 1000:.1f}", requests=r['requests'], throttled=r['throttled']))
+    return None
+
+def compare(results, baseline_file, tolerance):
+    with open(baseline_file, 'r') as bf:
+        baseline = {r['workload']: r for r in json.load(bf)['results']}
+    regressions = []
+    for r in results:
+        before = baseline.get(r['workload'])
+        if before and before['ops_per_sec'] and r['ops_per_sec'] < before['ops_per_sec'] * (1 - tolerance):
+            regressions.append(f"{r['workload']}: {before['ops_per_sec']:.1f} -> {r['ops_per_sec']:.1f} ops/sec")
+    return regressions
+
+## MAIN
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark workato_oem against a local mock of the Workato API.")
+    parser.add_argument('--workloads', default=','.join(WORKLOADS))
+    parser.add_argument('--workspaces', type=int, default=50)
+    parser.add_argument('--members', type=int, default=5)
+    parser.add_argument('--migrations', type=int, default=10)
+    parser.add_argument('--packages', type=int, default=10)
+    parser.add_argument('--package-kb', type=int, default=64, help="approximate uncompressed package size")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--throttle', type=float, default=0.0)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--operation-polls', type=int, default=2)
+    parser.add_argument('--poll-interval', type=float, default=0.05)
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--baseline', help="JSON results from an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    results = [run_workload(name.strip(), args) for name in args.workloads.split(',') if name.strip()]
+    report(results)
+    if args.output:
+        with open(args.output, 'w') as of:
+            json.dump({'settings': vars(args), 'results': results}, of, indent=4)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\nPERFORMANCE REGRESSIONS:\n\t" + "\n\t".join(regressions))
+            sys.exit(1)
+    return None
+
+if __name__ == '__main__':
+    main()
@@ -4,58 +4,43 @@
     python env_properties_tool.py <region> <src_workspace> <dest_workspace> <properties_prefix>
 
     workspaces are id'd by external_id (not workato id) -- do not include 'E' prefix.
-    properties_prefix is optional (and doesn't do anything yet, anyway) but will allow to filter by
-      property prefix in the future.
-    
+    properties_prefix is optional; when given, only properties whose names start with it are copied.
+
+    The same copy is available as `python workato4py.py props <src_workspace> <dest_workspace>` (which takes
+    Workato IDs or "E<external_id>").
 """
 
-import json, sys
-import workato
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workato_oem
 
 workato_tokens = {
-    'us': ('https://www.workato.com', '<token>')
-    'eu': ('https://www.eu.workato.com', '<token>')
+    'us': '<token>',
+    'eu': '<token>'
 }
 
-region = sys.argv[1]
-src = sys.argv[2]
-dest = sys.argv[3]
-
-wkto = workato.Workato(region, workato_tokens[region])
-
-def get_properties_from_workspace(workspace, workato_connection = workato.Workato, prefix=''):
-    results = {}
-    target = f"/api/managed_users/E{workspace}/properties?prefix={prefix}"
-    r = workato_connection.api_request('get', target)
-    if r.status_code not in [200, 201]:
-        raise Exception(f"get_properties_from_workspace(): Invalid response from Workato.\n{r.status_code}\n{r.message}")
-    else:
-        if r.data['result']:
-            results['properties'] = r.data['result']
-        else:
-            raise Exception(f"get_properties_from_workspace(): No properties returned for {workspace}.\n{r.data}")
-    return results
-
-def upsert_properties_to_workspace(workspace, workato_connection = workato.Workato, properties=None):
-    result = []
-    if type(properties) is not dict():
+def get_properties_from_workspace(workspace, workato_connection, prefix=''):
+    properties = workato_connection.get_properties(external_id=workspace, prefix=prefix)
+    if not properties:
+        raise Exception(f"get_properties_from_workspace(): No properties returned for {workspace}.")
+    return properties
+
+def upsert_properties_to_workspace(workspace, workato_connection, properties=None):
+    if type(properties) is not dict:
         raise Exception("upsert_properties_to_workspace(): No dictionary of properties provided.")
-    target = f"/api/managed_users/E{workspace}/properties"
-    r = workato_connection.api_request('post', target, payload=json.dumps(properties))
-    if r.status_code not in [200, 201]:
-        raise Exception(f"upsert_properties_to_workspace(): Upsert operation received abnormal response.\n{r.status_code}\n{r.message}")
-    else:
-        if r.data['success'] is True:
-            result = [True]
-        else:
-            result = [False, r.data]
-    return result
-
-def copy_properties(workato_connection, source_workspace, destination_workspace):
+    return workato_connection.upsert_properties(properties, external_id=workspace)
+
+def copy_properties(workato_connection, source_workspace, destination_workspace, prefix=''):
     # get properties from source
-    props_to_copy = get_properties_from_workspace(source_workspace, workato_connection)
+    props_to_copy = get_properties_from_workspace(source_workspace, workato_connection, prefix)
     # push to destination
-    copied = upsert_properties_to_workspace(destination_workspace, workato_connection, props_to_copy)
-    return None
-
-copy_properties(wkto, src, dest)
+    upsert_properties_to_workspace(destination_workspace, workato_connection, props_to_copy)
+    return props_to_copy
+
+if __name__ == '__main__':
+    region, src, dest = sys.argv[1], sys.argv[2], sys.argv[3]
+    wkto = workato_oem.Workato(region, workato_tokens[region])
+    copied = copy_properties(wkto, src, dest, sys.argv[4] if len(sys.argv) > 4 else '')
+    print(f"Copied {len(copied)} properties from E{src} to E{dest}.")
@@ -0,0 +1,68 @@
+"""
+    import_time.py
+
+    Cold-start benchmark for workato_oem. Short-lived tools import the library on every CI invocation, so the
+    time it adds to interpreter start-up is paid over and over. This script runs `import workato_oem` (or any
+    other statement) in fresh interpreters, reports the median time it adds on top of a bare interpreter, and
+    lists the modules that cost the most according to `python -X importtime`.
+
+    USAGE
+        $ python import_time.py [--statement "import workato_oem"] [--runs 15] [--top 10] [--budget 50]
+
+    With --budget (milliseconds), the script exits with status 1 when the median added time exceeds it.
+"""
+
+import argparse, os, statistics, subprocess, sys, time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+## FUNCTIONS
+
+def run_python(args):
+    # runs a fresh interpreter from the repo root so the library (and its cached bytecode) is the one on disk;
+    # bytecode writing is allowed so that compiling the module isn't counted as importing it
+    environment = {k: v for k, v in os.environ.items() if k != 'PYTHONDONTWRITEBYTECODE'}
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable] + args, cwd=REPO_ROOT, env=environment, capture_output=True, text=True)
+    if completed.returncode != 0:
+        sys.exit(f"Failed to run {args}:\n{completed.stderr}")
+    return time.perf_counter() - started, completed.stderr
+
+def median_seconds(statement, runs):
+    return statistics.median(run_python(['-c', statement])[0] for _ in range(runs))
+
+def heaviest_imports(statement, top):
+    """Returns (cumulative microseconds, module) for the `top` most expensive imports of `statement`."""
+    _, trace = run_python(['-X', 'importtime', '-c', statement])
+    costs = []
+    for line in trace.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, module = line.split('|', 2)
+        costs.append((int(cumulative_us), module.rstrip()))
+    return sorted(costs, reverse=True)[:top]
+
+## MAIN
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long importing workato_oem adds to a cold start.")
+    parser.add_argument('--statement', default='import workato_oem')
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--budget', type=float, help="maximum added milliseconds before exiting with status 1")
+    args = parser.parse_args()
+
+    run_python(['-c', args.statement])    # warm the bytecode cache so compilation isn't measured
+    bare = median_seconds('pass', args.runs)
+    loaded = median_seconds(args.statement, args.runs)
+    added = (loaded - bare) * 1000
+    print(f"interpreter: {bare * 1000:.1f} ms    with `{args.statement}`: {loaded * 1000:.1f} ms    added: {added:.1f} ms\n")
+    for cumulative_us, module in heaviest_imports(args.statement, args.top):
+        print(f"{cumulative_us / 1000:>9.1f} ms  {module}")
+    if args.budget is not None and added > args.budget:
+        print(f"\nIMPORT TIME OVER BUDGET: {added:.1f} ms > {args.budget:.1f} ms")
+        sys.exit(1)
+    return None
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+"""
+    mock_workato.py
+
+    A local stand-in for the Workato Embedded API, for benchmarking and offline testing of workato_oem
+    and the tools built on it. It serves generated data for the endpoints our pipelines use:
+
+        GET    /api/roles
+        GET    /api/managed_users                          (paginated with ?page= and ?per_page=)
+        POST   /api/managed_users
+        GET    /api/managed_users/<id>/members
+        POST   /api/managed_users/<id>/member_invitations
+        GET    /api/managed_users/<id>/folders             (paginated)
+        GET    /api/managed_users/<id>/projects            (paginated)
+        GET    /api/managed_users/<id>/properties
+        GET    /api/managed_users/<id>/export_manifests    (paginated)
+        GET    /api/managed_users/<id>/recipes             (paginated)
+        GET    /api/managed_users/<id>/connections
+        POST   /api/managed_users/<id>/properties
+        POST   /api/managed_users/<id>/exports/<manifest_id>
+        GET    /api/managed_users/<id>/exports/<package_id>
+        POST   /api/managed_users/<id>/imports
+        GET    /api/managed_users/<id>/imports/<import_id>
+        PUT    /api/managed_users/<id>/recipes/<recipe_id>/(start|stop)
+        GET    /downloads/<package_id>.zip
+
+    Workspaces can be addressed by Workato ID or by "E<external_id>". Every response is delayed by the configured
+    latency (plus jitter), a configurable share of requests is refused with 429, exports and imports stay
+    "in_progress" for a configurable number of status checks, and GETs carry an ETag and honour If-None-Match.
+    Package downloads stand in for pre-signed storage links, so they are never throttled.
+
+    USAGE
+        $ python mock_workato.py [--port 8000] [--workspaces 50] [--latency 0.05] [--throttle 0.0]
+
+    or, from Python:
+
+        server = MockWorkato(workspaces=20, latency=0.01).start()
+        client = workato_oem.Workato('us', 'token', poll_interval=0)
+        client.api_root = server.url
+        ...
+        server.stop()
+"""
+
+import argparse, hashlib, io, json, random, re, threading, time, zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+## CONSTANTS
+
+ROLE_NAMES = ['Admin', 'Integration Engineer Dev', 'Integration Engineer Prod', 'Integration Manager', 'QA Analyst',
+              'Deployment Engineer']
+PACKAGE_TIMESTAMP = (2024, 1, 1, 0, 0, 0)
+CONNECTORS = ['salesforce', 'netsuite', 'http', 'slack', 'workday']
+
+## FUNCTIONS
+
+def build_package(package_id, recipes=5, recipe_size=2048, variant=0):
+    """
+    Returns the bytes of a zip that looks like an RLCM package: a handful of recipe and connection JSON files.
+    The bytes depend only on the arguments (members carry a fixed timestamp), and `variant` changes the recipes.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for r in range(recipes):
+            body = {'name': f"Recipe {r}", 'version': 1 + variant, 'code': {'block': 'x' * recipe_size}}
+            zf.writestr(zipfile.ZipInfo(f"recipes/recipe_{r}.recipe.json", PACKAGE_TIMESTAMP), json.dumps(body),
+                        zipfile.ZIP_DEFLATED)
+        zf.writestr(zipfile.ZipInfo("connections/http.connection.json", PACKAGE_TIMESTAMP),
+                    json.dumps({'name': 'HTTP', 'provider': 'rest'}), zipfile.ZIP_DEFLATED)
+    return buffer.getvalue()
+
+## CLASSES
+
+class MockWorkato:
+    def __init__(self, workspaces=50, members=5, folders=4, projects=2, latency=0.0, jitter=0.0, throttle=0.0,
+                 page_size=100, operation_polls=2, package_recipes=5, package_recipe_size=2048, manifests=2, recipes=6,
+                 connections=3, seed=0):
+        """
+        Generates the data set (workspaces, members, folders, projects, properties, export manifests, recipes and
+        connections) and holds the server state. Manifest N of every workspace exports the same package, as a
+        template deployed to many clients would, and recipe N is triggered by connection N (modulo
+        `connections`) and calls the HTTP connector; even-numbered recipes are running.
+        `latency` and `jitter` are in seconds, `throttle` is the fraction (0-1) of requests answered with 429,
+        `page_size` is the default page size for paginated lists and `operation_polls` is how many status checks
+        an export or import reports "in_progress" before it completes.
+        """
+        self.latency, self.jitter, self.throttle = latency, jitter, throttle
+        self.page_size = page_size
+        self.operation_polls = operation_polls
+        self.package_recipes, self.package_recipe_size = package_recipes, package_recipe_size
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests_served = 0
+        self.throttled = 0
+        self.next_id = 100000
+        self.roles = [{'id': i + 1, 'name': name, 'inheritable': True, 'privileges': {'recipes': ['read', 'update']}}
+                      for i, name in enumerate(ROLE_NAMES)]
+        self.workspaces = {}
+        self.manifest_variants = {}
+        for w in range(workspaces):
+            ws_id = 1000 + w
+            external_id = f"{9000 + w // 2}" + ("_DEV" if w % 2 else "")
+            self.workspaces[ws_id] = {
+                'info': {'id': ws_id, 'name': f"Client {w // 2}" + (" Dev" if w % 2 else ""), 'external_id': external_id,
+                         'notification_email': 'integrations@example.com', 'plan_id': 'oem_plan'},
+                'members': [{'id': ws_id * 100 + m, 'name': f"User {m}", 'email': f"user{m}@example.com",
+                             'role_name': ROLE_NAMES[m % len(ROLE_NAMES)]} for m in range(members)],
+                'folders': [{'id': ws_id * 10 + f, 'name': 'Home' if f == 0 else f"Folder {f}", 'parent_id': None}
+                            for f in range(folders)],
+                'projects': [{'id': ws_id * 10 + p, 'name': 'Home' if p == 0 else f"Project {p}",
+                              'folder_id': ws_id * 10 + p} for p in range(projects)],
+                'properties': {'env': 'dev' if w % 2 else 'prod', 'client_id': str(9000 + w // 2)},
+                'manifests': [{'id': ws_id * 10 + m, 'name': f"Manifest {m}", 'folder_id': ws_id * 10}
+                              for m in range(manifests)],
+            }
+            self.workspaces[ws_id]['connections'] = [
+                {'id': ws_id * 10 + c, 'name': f"{CONNECTORS[(w + c) % len(CONNECTORS)].title()} {c}",
+                 'application': CONNECTORS[(w + c) % len(CONNECTORS)], 'folder_id': ws_id * 10,
+                 'authorization_status': 'success' if c or w % 3 else 'failed', 'updated_at': '2024-01-01T00:00:00Z'}
+                for c in range(connections)]
+            self.workspaces[ws_id]['recipes'] = [self.recipe(ws_id, r, self.workspaces[ws_id]['connections'])
+                                                 for r in range(recipes)]
+            self.manifest_variants.update({ws_id * 10 + m: m for m in range(manifests)})
+        self.operations = {}
+        self.packages = {}
+        self.server = None
+        self.thread = None
+        self.url = None
+
+    #
+    # Server lifecycle
+
+    def start(self, host='127.0.0.1', port=0):
+        mock = self
+
+        class Handler(MockWorkatoHandler):
+            state = mock
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        return None
+
+    def __enter__(self):
+        return self.start() if self.server is None else self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    #
+    # State helpers
+
+    def new_id(self):
+        with self.lock:
+            self.next_id += 1
+            return self.next_id
+
+    def recipe(self, ws_id, r, connections):
+        trigger = connections[r % len(connections)] if connections else None
+        config = ([{'keyword': 'application', 'provider': trigger['application'], 'name': trigger['application'],
+                    'account_id': trigger['id']}] if trigger else []) + \
+                 [{'keyword': 'application', 'provider': 'http', 'name': 'http', 'account_id': None}]
+        return {'id': ws_id * 100 + r, 'user_id': ws_id, 'name': f"Recipe {r}", 'folder_id': ws_id * 10,
+                'running': r % 2 == 0, 'trigger_application': trigger['application'] if trigger else 'scheduler',
+                'action_applications': ['http'], 'applications': sorted({c['provider'] for c in config}),
+                'config': config, 'version_no': r + 1, 'job_succeeded_count': r * 10, 'job_failed_count': r % 3,
+                'created_at': '2024-01-01T00:00:00Z', 'updated_at': '2024-01-01T00:00:00Z',
+                'last_run_at': '2024-01-02T00:00:00Z' if r % 2 == 0 else None, 'stopped_at': None, 'stop_cause': None,
+                'code': json.dumps({'number': 0, 'provider': 'http', 'block': [{'keyword': 'action'}] * 50})}
+
+    def find_workspace(self, client_id):
+        if client_id.startswith('E'):
+            for ws in self.workspaces.values():
+                if ws['info']['external_id'] == client_id[1:]:
+                    return ws
+            return None
+        return self.workspaces.get(int(client_id)) if client_id.isdigit() else None
+
+    def package_bytes(self, package_id):
+        with self.lock:
+            variant = self.manifest_variants.get(self.operations.get(package_id, {}).get('manifest_id'), 0)
+            if variant not in self.packages:
+                self.packages[variant] = build_package(package_id, self.package_recipes, self.package_recipe_size, variant)
+            return self.packages[variant]
+
+    def start_operation(self, kind, workspace_id, manifest_id=None):
+        op_id = self.new_id()
+        with self.lock:
+            self.operations[op_id] = {'kind': kind, 'workspace_id': workspace_id, 'checks': 0, 'manifest_id': manifest_id}
+        return op_id
+
+    def check_operation(self, op_id):
+        with self.lock:
+            op = self.operations.get(op_id)
+            if op is None:
+                return None
+            op['checks'] += 1
+            return 'completed' if op['checks'] > self.operation_polls else 'in_progress'
+
+    def should_throttle(self):
+        with self.lock:
+            self.requests_served += 1
+            if self.throttle and self.random.random() < self.throttle:
+                self.throttled += 1
+                return True
+        return False
+
+    def delay(self):
+        wait = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if wait > 0:
+            time.sleep(wait)
+
+class MockWorkatoHandler(BaseHTTPRequestHandler):
+    state = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        return None
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_PATCH(self):
+        self.dispatch('PATCH')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def dispatch(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.state.delay()
+        if not self.path.startswith('/downloads/') and self.state.should_throttle():
+            return self.reply(429, {'message': 'Too many requests'}, {'Retry-After': '0'})
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        for pattern, methods in ROUTES:
+            match = re.fullmatch(pattern, url.path.rstrip('/'))
+            if match and method in methods:
+                return methods[method](self, query, body, *match.groups())
+        return self.reply(404, {'message': 'Not found'})
+
+    def reply(self, status, payload, headers=None, raw=None, content_type='application/json'):
+        data = raw if raw is not None else json.dumps(payload).encode('utf-8')
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        if status == 200 and self.command == 'GET' and self.headers.get('If-None-Match') == etag:
+            status, data = 304, b''
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        if status in [200, 304] and self.command == 'GET':
+            self.send_header('ETag', etag)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+        return None
+
+    def page(self, items, query):
+        page = int(query.get('page', 1))
+        per_page = int(query.get('per_page', self.state.page_size))
+        return items[(page - 1) * per_page:page * per_page]
+
+    def workspace_or_404(self, client_id):
+        ws = self.state.find_workspace(client_id)
+        if ws is None:
+            self.reply(404, {'message': 'Not found'})
+        return ws
+
+    #
+    # Route handlers
+
+    def get_roles(self, query, body):
+        return self.reply(200, self.state.roles)
+
+    def get_managed_users(self, query, body):
+        return self.reply(200, {'result': self.page([w['info'] for w in self.state.workspaces.values()], query)})
+
+    def post_managed_users(self, query, body):
+        data = json.loads(body or b'{}')
+        ws_id = self.state.new_id()
+        self.state.workspaces[ws_id] = {'info': {'id': ws_id, 'name': data.get('name'), 'external_id': data.get('external_id'),
+                                                 'notification_email': data.get('notification_email')},
+                                        'members': [], 'folders': [{'id': ws_id * 10, 'name': 'Home', 'parent_id': None}],
+                                        'projects': [{'id': ws_id * 10, 'name': 'Home', 'folder_id': ws_id * 10}],
+                                        'properties': {}}
+        return self.reply(200, self.state.workspaces[ws_id]['info'])
+
+    def get_members(self, query, body, client_id):
+        ws = self.workspace_or_404(client_id)
+        return ws and self.reply(200, ws['members'])
+
+    def post_member_invitation(self, query, body, client_id):
+        ws = self.workspace_or_404(client_id)
+        if ws:
+            data = json.loads(body or b'{}')
+            member = {'id': self.state.new_id(), 'name': data.get('name'), 'email': data.get('email'),
+                      'role_name': data.get('role_name')}
+            ws['members'].append(member)
+            self.reply(200, member)
+
+    def get_folders(self, query, body, client_id):
+        ws = self.workspace_or_404(client_id)
+        return ws and self.reply(200, {'result': self.page(ws['folders'], query)})
+
+    def get_projects(self, query, body, client_id):
+        ws = self.workspace_or_404(client_id)
+        return ws and self.reply(200, {'result': self.page(ws['projects'], query)})
+
+    def get_properties(self, query, body, client_id):
+        ws = self.workspace_or_404(client_id)
+        if ws:
+            prefix = query.get('prefix', '')
+            self.reply(200, {'result': [{'name': k, 'value': v} for k, v in ws['properties'].items() if k.startswith(prefix)]})
+
+    def post_properties(self, query, body, client_id):
+        ws = self.workspace_or_404(client_id)
+        if ws:
+            ws['properties'].update(json.loads(body or b'{}').get('properties', {}))
+            self.reply(200, {'success': True})
+
+    def get_export_manifests(self, query, body, client_id):
+        ws = self.workspace_or_404(client_id)
+        return ws and self.reply(200, {'result': self.page(ws['manifests'], query)})
+
+    def get_recipes(self, query, body, client_id):
+        ws = self.workspace_or_404(client_id)
+        return ws and self.reply(200, {'result': self.page(ws.get('recipes', []), query)})
+
+    def get_connections(self, query, body, client_id):
+        ws = self.workspace_or_404(client_id)
+        return ws and self.reply(200, {'result': ws.get('connections', [])})
+
+    def post_export(self, query, body, client_id, manifest_id):
+        ws = self.workspace_or_404(client_id)
+        if ws:
+            package_id = self.state.start_operation('export', ws['info']['id'], int(manifest_id))
+            self.reply(200, {'id': package_id, 'operation_type': 'export', 'status': 'in_progress'})
+
+    def get_export(self, query, body, client_id, package_id):
+        status = self.state.check_operation(int(package_id))
+        if status is None:
+            return self.reply(404, {'message': 'Not found'})
+        result = {'id': int(package_id), 'operation_type': 'export', 'status': status,
+                  'download_url': f"{self.state.url}/downloads/{package_id}.zip" if status == 'completed' else None}
+        return self.reply(200, {**result, 'result': result})
+
+    def get_download(self, query, body, package_id):
+        return self.reply(200, None, raw=self.state.package_bytes(int(package_id)), content_type='application/zip')
+
+    def post_import(self, query, body, client_id):
+        ws = self.workspace_or_404(client_id)
+        if ws:
+            if not body.startswith(b'PK'):
+                return self.reply(400, {'message': 'Bad request'})
+            import_id = self.state.start_operation('import', ws['info']['id'])
+            self.reply(200, {'id': import_id, 'operation_type': 'import', 'status': 'in_progress'})
+
+    def get_import(self, query, body, client_id, import_id):
+        status = self.state.check_operation(int(import_id))
+        if status is None:
+            return self.reply(404, {'message': 'Not found'})
+        return self.reply(200, {'id': int(import_id), 'operation_type': 'import', 'status': status,
+                                'recipe_status': [{'id': 1, 'name': 'Recipe 0', 'import_result': 'no_update_or_update_without_restart'}]
+                                if status == 'completed' else None})
+
+    def put_recipe(self, query, body, client_id, recipe_id, operation):
+        ws = self.workspace_or_404(client_id)
+        if ws:
+            for recipe in ws.get('recipes', []):
+                if recipe['id'] == int(recipe_id):
+                    recipe['running'] = operation == 'start'
+            self.reply(200, {'success': True})
+
+ROUTES = [
+    (r"/api/roles", {'GET': MockWorkatoHandler.get_roles}),
+    (r"/api/managed_users", {'GET': MockWorkatoHandler.get_managed_users, 'POST': MockWorkatoHandler.post_managed_users}),
+    (r"/api/managed_users/([^/]+)/members", {'GET': MockWorkatoHandler.get_members}),
+    (r"/api/managed_users/([^/]+)/member_invitations", {'POST': MockWorkatoHandler.post_member_invitation}),
+    (r"/api/managed_users/([^/]+)/folders", {'GET': MockWorkatoHandler.get_folders}),
+    (r"/api/managed_users/([^/]+)/projects", {'GET': MockWorkatoHandler.get_projects}),
+    (r"/api/managed_users/([^/]+)/properties", {'GET': MockWorkatoHandler.get_properties, 'POST': MockWorkatoHandler.post_properties}),
+    (r"/api/managed_users/([^/]+)/export_manifests", {'GET': MockWorkatoHandler.get_export_manifests}),
+    (r"/api/managed_users/([^/]+)/exports/(\d+)", {'POST': MockWorkatoHandler.post_export, 'GET': MockWorkatoHandler.get_export}),
+    (r"/api/managed_users/([^/]+)/imports", {'POST': MockWorkatoHandler.post_import}),
+    (r"/api/managed_users/([^/]+)/imports/(\d+)", {'GET': MockWorkatoHandler.get_import}),
+    (r"/api/managed_users/([^/]+)/recipes", {'GET': MockWorkatoHandler.get_recipes}),
+    (r"/api/managed_users/([^/]+)/connections", {'GET': MockWorkatoHandler.get_connections}),
+    (r"/api/managed_users/([^/]+)/recipes/(\d+)/(start|stop)", {'PUT': MockWorkatoHandler.put_recipe}),
+    (r"/downloads/(\d+)\.zip", {'GET': MockWorkatoHandler.get_download}),
+]
+
+## MAIN
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Workato Embedded API.")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workspaces', type=int, default=50)
+    parser.add_argument('--members', type=int, default=5)
+    parser.add_argument('--manifests', type=int, default=2, help="export manifests per workspace")
+    parser.add_argument('--recipes', type=int, default=6, help="recipes per workspace")
+    parser.add_argument('--connections', type=int, default=3, help="connections per workspace")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="up to this many extra seconds per response")
+    parser.add_argument('--throttle', type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--operation-polls', type=int, default=2)
+    args = parser.parse_args()
+    server = MockWorkato(workspaces=args.workspaces, members=args.members, manifests=args.manifests, recipes=args.recipes,
+                         connections=args.connections, latency=args.latency, jitter=args.jitter,
+                         throttle=args.throttle, page_size=args.page_size, operation_polls=args.operation_polls)
+    server.start(port=args.port)
+    print(f"Mock Workato API listening on {server.url} (Ctrl+C to stop)")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
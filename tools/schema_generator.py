@@ -5,11 +5,32 @@
 ##  Generate a Workato-compatible schema definition from an API-generated
 ##  JSON response.
 ##
+##  The response is read incrementally (in 64KB chunks) and types are inferred
+##  from the stream of parse events, so memory use depends on the size of the
+##  resulting schema rather than the size of the sample -- multi-GB responses
+##  are fine. Types are merged across every element of every array (or, with
+##  --sample N, across a random sample of N elements per array), strings that
+##  look like ISO 8601 dates or timestamps are typed "date" or "date_time", and
+##  the output is a single valid schema.
+##
 ##  USAGE
-##      $ python schema_generator.py <response_to_parse> [<output_file>]
-##      
+##      $ python schema_generator.py <response_to_parse> [<output_file>] [--sample N] [--json]
+##
 ##      <response_to_parse>     A .json file containing the API-generated response
+##                              (looked up in ./data/schemas/ if not found as given)
 ##      <output_file>           [optional] specify the name of the output file
+##                              (defaults to the response file name with a .rb or .schema.json extension)
+##      --sample N              [optional] infer each array from a sample of N elements
+##      --json                  [optional] write the schema as JSON instead of Ruby
+##
+##      $ python schema_generator.py --batch <sample_dir> [<output_dir>] [--workers N] [--sample N] [--json]
+##
+##      Generates a schema for every .json file in <sample_dir> across a pool of N
+##      worker processes (default: one per CPU). Once a file's types are inferred
+##      (which still visits every value), the output for structurally identical
+##      nested objects is built once per worker and reused -- within a file and
+##      across the files that worker handles. Most of the time goes on parsing,
+##      so the batch gains come from the worker processes, not this reuse.
 ##
 ##  EXAMPLE
 ##      If you submit a file containing the following:
@@ -19,110 +40,427 @@
 ##              "type": "dog",
 ##              "age": 3,
 ##              "home": ["123 Sunflower Rd.", "New York, NY", "1-234-567-8910"],
-##              "diet": {"food": "Iams", "treats": "Milkbones", "other": "occassional table scraps"}
+##              "diet": {"food": "Iams", "treats": "Milkbones", "other": "occassional table scraps"},
 ##              "lastVisit": "2022-10-01T12:35:10.000-500"
 ##          }
 ##
 ##      ...we would expect to see the following output...
 ##
 ##          [
-##              { name: "name", type: "string" },
-##              { name: "type", type: "type" },
-##              { name: "age", type: "integer" },
-##              { name: "home", type: "array", of: "string" },
-##              { name: "diet", type: "object",
-##                paroperties: [
-##                  { name: "food", type: "string" },
-##                  { name: "treats", type: "string" },
-##                  { name: "other", type: "string" }
-##                ]
-##              },
-##              { name: "lastVisit", type: "datetime" }
+##            { name: "name", type: "string" },
+##            { name: "type", type: "string" },
+##            { name: "age", type: "integer" },
+##            { name: "home", type: "array", of: "string" },
+##            { name: "diet", type: "object", properties: [
+##              { name: "food", type: "string" },
+##              { name: "treats", type: "string" },
+##              { name: "other", type: "string" }
+##            ] },
+##            { name: "lastVisit", type: "date_time" }
 ##          ]
 ##
 ####
 
+import codecs
 import json
+import os
+import random
+import re
 import sys
-from datetime import datetime, date
-#from types import NoneType
-
-# set source and output files based on arguments passed
-sf = "./data/schemas/{fn}".format(fn=sys.argv[1])
-#if sys.argv[2]:
-#    of = sys.argv[2]
-#else:
-of = ".".join(sf.split(".")[:-1]) + ".rb" #"./data/schemas/{fn}".format(fn=".".join(sf.split(".")[:-1]) + ".rb")
-
-# load JSON for parsing
-src = open(sf)
-model = json.load(src)
-
-dataTypes = {
-    str: "string",
-    int: "int",
-    float: "decimal",
-    datetime: "date_time",
-    date: "date",
-    bool: "boolean",
-    dict: "object",
-    list: "array",
-    None: "void"
-}
-
-def parseField(fieldName, fieldValue):
-    fieldObject = {}
-    if type(fieldValue) != dict and type(fieldValue) != list:
-        if fieldValue is not None:
-            fieldObject = {"name": fieldName, "type": dataTypes[type(fieldValue)]}
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+CHUNK_SIZE = 65536
+
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+DATETIME_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2,3})?$")
+
+TOKEN = re.compile(r'[ \t\n\r]*(?:([{}\[\],:])|"([^"\\]*(?:\\.[^"\\]*)*)"|(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null))')
+LITERALS = {'true': True, 'false': False, 'null': None}
+DELIMITERS = ",]} \t\n\r"
+SKIP_TOKEN = re.compile(r'[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]]')
+
+#
+# Incremental parsing
+
+class JsonEventReader:
+    """
+    Reads a JSON document from a file object a chunk at a time and yields parse events:
+
+        ('start_map', None), ('map_key', key), ('end_map', None),
+        ('start_array', None), ('end_array', None), ('value', python_value)
+
+    Only the current token (plus one chunk) is ever held in memory.
+    """
+    def __init__(self, source, chunk_size=CHUNK_SIZE):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = codecs.getincrementaldecoder('utf-8')()     # a character may straddle two chunks
+
+    def _fill(self):
+        while not self.eof:
+            chunk = self.source.read(self.chunk_size)
+            if not chunk:
+                self.eof = True
+                chunk = self.decoder.decode(b'', final=True)
+            elif isinstance(chunk, bytes):
+                chunk = self.decoder.decode(chunk)
+            if chunk:
+                break
         else:
-            fieldObject = {"name": fieldName, "type": "string"}
-    elif type(fieldValue) == list:
-        if len(fieldValue) > 0:
-            if type(fieldValue[0]) != dict:
-                dataType = dataTypes[type(fieldValue[0])]
-                fieldObject = {"name": fieldName, type: "array", "of": dataType}
-            # elif type(fieldValue[0]) == list: # workato doesn't accept nested arrays in schema
-            elif type(fieldValue[0]) == dict:
-                dataType = "object"
-                properties = []
-                for ef in fieldValue[0]:
-                    subfieldObject = parseField(ef, fieldValue[0][ef])
-                    properties.append(subfieldObject)
-                fieldObject = {"name": fieldName, "type": "array", "of": dataType, "properties": properties}
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _next(self):
+        # a token may straddle a chunk boundary, so a match is only trusted once it's complete: punctuation and
+        # strings are, but numbers and literals need a following delimiter (so "2" isn't taken for "2.5")
+        while True:
+            match = TOKEN.match(self.buffer, self.pos)
+            if match is not None and (match.lastindex != 3 or self.eof or
+                                      (match.end() < len(self.buffer) and self.buffer[match.end()] in DELIMITERS)):
+                self.pos = match.end()
+                return match
+            if not self._fill():
+                match = TOKEN.match(self.buffer, self.pos)
+                if match is not None:
+                    self.pos = match.end()
+                    return match
+                if self.buffer[self.pos:].strip():
+                    raise ValueError(f"Invalid JSON near: {self.buffer[self.pos:self.pos + 40]!r}")
+                return None
+
+    def skip(self):
+        """
+        Called right after a 'start_map' or 'start_array' event: jumps past the rest of that container without
+        producing events for it, which is much faster than tokenizing it.
+        """
+        depth = 1
+        while depth:
+            match = SKIP_TOKEN.match(self.buffer, self.pos)
+            if match is None:
+                if not self._fill():
+                    raise ValueError("Unexpected end of JSON input.")
+                continue
+            self.pos = match.end()
+            char = match.group(0)
+            if char in '{[':
+                depth += 1
+            elif char in '}]':
+                depth -= 1
+        self._skipped = True
+
+    def events(self):
+        stack = []      # True for each open object, False for each open array
+        expect_key = False
+        self._skipped = False
+        while True:
+            if self._skipped:
+                stack.pop()
+                self._skipped = False
+            match = self._next()
+            if match is None:
+                if stack:
+                    raise ValueError("Unexpected end of JSON input.")
+                return
+            kind = match.lastindex
+            if kind == 1:
+                char = match.group(1)
+                if char == ',':
+                    expect_key = stack[-1]
+                elif char == ':':
+                    expect_key = False
+                elif char == '{':
+                    stack.append(True)
+                    expect_key = True
+                    yield ('start_map', None)
+                elif char == '[':
+                    stack.append(False)
+                    expect_key = False
+                    yield ('start_array', None)
+                else:
+                    stack.pop()
+                    yield ('end_map' if char == '}' else 'end_array', None)
+            elif kind == 2:
+                text = match.group(2)
+                if '\\' in text:
+                    text = json.loads(f'"{text}"')
+                yield ('map_key' if expect_key else 'value', text)
+            else:
+                text = match.group(3)
+                if text in LITERALS:
+                    yield ('value', LITERALS[text])
+                elif '.' in text or 'e' in text or 'E' in text:
+                    yield ('value', float(text))
+                else:
+                    yield ('value', int(text))
+
+#
+# Type inference
+
+class SchemaNode:
+    """The merged type information for every value seen at one position in the document."""
+    __slots__ = ('kinds', 'fields', 'items')
+
+    def __init__(self):
+        self.kinds = {}
+        self.fields = {}
+        self.items = None
+
+    def add(self, kind):
+        self.kinds[kind] = self.kinds.get(kind, 0) + 1
+
+    def field(self, name):
+        node = self.fields.get(name)
+        if node is None:
+            node = self.fields[name] = SchemaNode()
+        return node
+
+def scalar_kind(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        return 'integer'
+    if isinstance(value, float):
+        return 'number'
+    if len(value) < 10 or value[4:5] != '-':
+        return 'string'     # cheap pre-check; most strings can't be dates
+    if DATE_PATTERN.match(value):
+        return 'date'
+    if DATETIME_PATTERN.match(value):
+        return 'date_time'
+    return 'string'
+
+def infer(events, sample=None, seed=0, skip=None):
+    """
+    Builds a SchemaNode tree from a stream of parse events. With `sample`, each array contributes only its
+    first `sample` elements plus a random `sample`/n share of the rest. Objects and arrays left out of the
+    sample are passed over with `skip` (JsonEventReader.skip) when given, or parsed and ignored otherwise.
+    """
+    rng = random.Random(seed)
+    root = SchemaNode()
+    stack = []     # frames: [kind, node, pending field node | array element count]
+
+    def target():
+        if not stack:
+            return root
+        kind, node, state = stack[-1]
+        if node is None:
+            return None
+        if kind == 'map':
+            return state
+        stack[-1][2] += 1
+        if sample is None or state < sample or rng.random() < sample / (state + 1):
+            return node.items
+        return None
+
+    for event, value in events:
+        if event == 'map_key':
+            kind, node, state = stack[-1]
+            stack[-1][2] = node.field(value) if node is not None else None
+        elif event == 'value':
+            node = target()
+            if node is not None:
+                node.add(scalar_kind(value))
+        elif event == 'start_map':
+            node = target()
+            if node is None and skip is not None:
+                skip()
+                continue
+            if node is not None:
+                node.add('object')
+            stack.append(['map', node, None])
+        elif event == 'start_array':
+            node = target()
+            if node is None and skip is not None:
+                skip()
+                continue
+            if node is not None:
+                node.add('array')
+                if node.items is None:
+                    node.items = SchemaNode()
+            stack.append(['array', node, 0])
         else:
-            dataType = "string"
-            fieldObject = {"name": fieldName, "type": "array", "of": dataType}
-    elif type(fieldValue) == dict:
-        dataType = "object"
-        properties = []
-        for ef in fieldValue:
-            subfieldObject = parseField(ef, fieldValue[ef])
-            properties.append(subfieldObject)
-        fieldObject = {"name": fieldName, "type": dataType, "properties": properties}
-    return fieldObject
-
-#def formatOutput(object):
-#    formattedString = "{\n"
-#    for ef in object:
-#        if type(object[ef]) != list:
-#            formattedString += "\t%s\: \"%s\"" % (ef, object[ef])
-#        else:
-#            for eo in object[ef]:
+            stack.pop()
+    return root
+
 #
-#    return formattedString
-
-def main(sourceData, outFile):
-    schemaModel = []
-    for ef in sourceData:
-        fn = ef
-        fv = sourceData[ef]
-        fieldObj = parseField(fn, fv)
-        schemaModel.append(fieldObj)
-    with open(outFile, "w") as out:
-        for each in schemaModel:
-            jsonified = json.dumps(each, indent=4)
-            out.write(jsonified)
-            out.write(",\n")
-
-main(model, of)
\ No newline at end of file
+# Schema output
+
+def merged_type(kinds):
+    types = {k for k in kinds if k != 'null'}
+    if not types:
+        return 'string'
+    if 'object' in types:
+        return 'object'
+    if 'array' in types:
+        return 'array'
+    if types <= {'integer'}:
+        return 'integer'
+    if types <= {'integer', 'number'}:
+        return 'number'
+    if types <= {'date'}:
+        return 'date'
+    if types <= {'date', 'date_time'}:
+        return 'date_time'
+    if types == {'boolean'}:
+        return 'boolean'
+    return 'string'
+
+class ShapeCache:
+    """
+    Memoizes the output step, building sub-schemas once per structural shape. Every inferred node is reduced to
+    a shape id -- its merged type plus the (name, shape id) of each field, or the shape id of its items -- so
+    identical nested structures (the same address or user object under many parents, or across many samples in
+    a batch) get the same id and share one properties list. Inference is not affected: `infer()` still merges
+    every value into the tree, and each build still walks the whole tree once to find its shapes. Once more
+    than `max_shapes` shapes are known, the cache starts over at the next build.
+    """
+    def __init__(self, max_shapes=10000):
+        self.max_shapes = max_shapes
+        self.ids = {}
+        self.built = {}
+        self.node_ids = {}      # id(node) -> shape id, only for the tree currently being built
+        self.hits, self.misses = 0, 0
+
+    def reset(self):
+        self.ids.clear()
+        self.built.clear()
+
+    def shape(self, node):
+        if id(node) in self.node_ids:
+            return self.node_ids[id(node)]
+        field_type = merged_type(node.kinds)
+        if field_type == 'object':
+            key = ('object', tuple((name, self.shape(child)) for name, child in node.fields.items()))
+        elif field_type == 'array':
+            key = ('array', self.shape(node.items or SchemaNode()))
+        else:
+            key = (field_type,)
+        shape_id = self.node_ids[id(node)] = self.ids.setdefault(key, len(self.ids))
+        return shape_id
+
+    def properties(self, node):
+        shape_id = self.shape(node)
+        if shape_id in self.built:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.built[shape_id] = [self.field(name, child) for name, child in node.fields.items()]
+        return self.built[shape_id]
+
+    def field(self, name, node):
+        field_type = merged_type(node.kinds)
+        field = {'name': name, 'type': field_type}
+        if field_type == 'object':
+            field['properties'] = self.properties(node)
+        elif field_type == 'array':
+            items = node.items or SchemaNode()
+            item_type = merged_type(items.kinds)
+            if item_type == 'object':
+                field['of'] = 'object'
+                field['properties'] = self.properties(items)
+            else:
+                field['of'] = 'string' if item_type == 'array' else item_type    # workato doesn't accept nested arrays
+        return field
+
+SHAPES = ShapeCache()   # per process, so batch workers share sub-schemas across the files they handle (bounded)
+
+def build_schema(root, shapes=None):
+    """Turns the inferred tree into a Workato schema: the fields of the root object, or of the root array's items."""
+    shapes = shapes if shapes is not None else ShapeCache()
+    root_type = merged_type(root.kinds)
+    if root_type == 'array' and root.items is not None and merged_type(root.items.kinds) == 'object':
+        root = root.items
+    elif root_type != 'object':
+        raise ValueError("The response must be a JSON object or an array of objects.")
+    if len(shapes.ids) > shapes.max_shapes:
+        shapes.reset()
+    try:
+        return shapes.properties(root)
+    finally:
+        shapes.node_ids.clear()
+
+def ruby_literal(fields, indent=0):
+    pad = "  " * indent
+    lines = []
+    for i, field in enumerate(fields):
+        attributes = ", ".join(f"{k}: {json.dumps(v)}" for k, v in field.items() if k != 'properties')
+        tail = "," if i < len(fields) - 1 else ""
+        if 'properties' in field:
+            lines.append(f"{pad}  {{ {attributes}, properties: [")
+            lines.append(ruby_literal(field['properties'], indent + 1))
+            lines.append(f"{pad}  ] }}{tail}")
+        else:
+            lines.append(f"{pad}  {{ {attributes} }}{tail}")
+    return "\n".join(lines) if indent else "[\n" + "\n".join(lines) + "\n]\n"
+
+def generate_schema(source_file, sample=None, shapes=None):
+    with open(source_file, 'rb') as src:
+        reader = JsonEventReader(src)
+        return build_schema(infer(reader.events(), sample, skip=reader.skip), shapes)
+
+def batch_task(source_file, out_file, sample, as_json):
+    # runs in a worker process; SHAPES lives for the life of the worker
+    started = time.perf_counter()
+    try:
+        write_schema(generate_schema(source_file, sample, SHAPES), out_file, as_json)
+    except (OSError, ValueError) as ex:
+        return source_file, None, time.perf_counter() - started, str(ex)
+    return source_file, out_file, time.perf_counter() - started, None
+
+def generate_batch(source_dir, out_dir=None, sample=None, as_json=False, workers=None):
+    """
+    Generates a schema for every .json file in `source_dir` across a pool of worker processes, writing each
+    to `out_dir` (default: next to its sample). Returns a list of (source, output, seconds, error) tuples.
+    """
+    out_dir = out_dir or source_dir
+    os.makedirs(out_dir, exist_ok=True)
+    sources = sorted(fn for fn in os.listdir(source_dir) if fn.endswith('.json') and not fn.endswith('.schema.json'))
+    jobs = [(os.path.join(source_dir, fn), os.path.join(out_dir, fn[:-5] + (".schema.json" if as_json else ".rb")))
+            for fn in sources]
+    # largest samples first, so one big file doesn't start last and hold up the whole batch
+    jobs.sort(key=lambda job: os.path.getsize(job[0]), reverse=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(batch_task, source, out, sample, as_json) for source, out in jobs]
+        return [future.result() for future in futures]
+
+def write_schema(schema, out_file, as_json=False):
+    with open(out_file, "w") as out:
+        out.write(json.dumps(schema, indent=2) + "\n" if as_json else ruby_literal(schema))
+
+def main(args):
+    sample, as_json, batch, workers, positional = None, False, False, None, []
+    i = 0
+    while i < len(args):
+        if args[i] == '--sample':
+            sample = int(args[i + 1])
+            i += 1
+        elif args[i] == '--workers':
+            workers = int(args[i + 1])
+            i += 1
+        elif args[i] == '--json':
+            as_json = True
+        elif args[i] == '--batch':
+            batch = True
+        else:
+            positional.append(args[i])
+        i += 1
+    if batch:
+        results = generate_batch(positional[0], positional[1] if len(positional) > 1 else None, sample, as_json, workers)
+        for source, out, seconds, error in results:
+            print(f"{source}: {'FAILED (' + error + ')' if error else out} [{seconds:.2f}s]")
+        return None
+    # set source and output files based on arguments passed
+    sf = positional[0] if os.path.exists(positional[0]) else "./data/schemas/{fn}".format(fn=positional[0])
+    of = positional[1] if len(positional) > 1 else ".".join(sf.split(".")[:-1]) + (".schema.json" if as_json else ".rb")
+    write_schema(generate_schema(sf, sample), of, as_json)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
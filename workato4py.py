@@ -0,0 +1,429 @@
+"""
+    workato4py.py
+
+    One command line for the workato4py tools, built on the `Workato` client in workato_oem. Every command
+    shares the client's connection pools, rate limiter and (with --cache) response cache, and `batch` runs many
+    commands from a file in one process so they keep sharing them.
+
+    USAGE
+        $ python workato4py.py [--region us] [--token <token>] [--rate-limit <per_sec>] [--cache]
+                               [--processes <n>] [--timeout <sec>] [--deadline <sec>] [--metrics <file>]
+                               <command> [<args>]
+
+    COMMANDS
+        audit       roles, and every managed user workspace with its members (access audit); JSON
+        dump        every managed user workspace with its folders and projects; JSON
+        migrate     run the package migrations listed in a CSV (source workspace, package ID, destination
+                    workspace, destination folder) as one deployment plan
+        deploy      run (or --dry-run) a deployment plan file; see sample/deployment_plan.py for the format
+        backup      export every manifest (of every workspace, or those given) into a dated archive directory,
+                    or with --incremental into a deduplicated backup store
+        inventory   crawl the recipes and connections of every workspace (or those given) into an NDJSON file
+        recipes     query a saved inventory, eg. the running recipes using a connector; JSON (offline)
+        invite      invite collaborators ("<name>:<email>:<role>") to a workspace
+        provision   create (or --dry-run) the Dev and Prod workspaces for each row (external ID, name) of a CSV
+        props       copy environment properties from one workspace to another
+        jobs        list a recipe's jobs, or show one job
+        schema      generate a Workato schema from JSON (arguments as for tools/schema_generator.py)
+        batch       run the commands in a file, one per line (blank lines and lines starting with # are
+                    skipped); each line may start with its own global options, eg. `--region eu audit`
+
+    Workspaces are given as Workato IDs or "E<external_id>". The API token comes from --token or the
+    WORKATO_TOKEN_<REGION> environment variable (eg. WORKATO_TOKEN_US). With --processes, CPU-heavy work (hashing
+    and trimming packages for migrate/deploy) runs in that many worker processes, leaving the request threads free.
+    --timeout sets how long each request may wait for the server to respond, and --deadline how long the whole
+    command may take; a command that runs out of time fails rather than hangs.
+"""
+
+import argparse, contextlib, csv, json, os, shlex, sys
+
+import workato_oem
+
+## CONSTANTS
+
+TOKEN_VARIABLE = "WORKATO_TOKEN_{region}"
+
+## FUNCTIONS
+
+class Clients:
+    def __init__(self):
+        """One Workato client per (region, token, settings), shared by every command run in this process."""
+        self.clients = {}
+        self.cpu_pools = {}
+
+    def get(self, args):
+        token = args.token or os.environ.get(TOKEN_VARIABLE.format(region=args.region.upper()))
+        if not token:
+            raise workato_oem.InternalOperationError(
+                f"No API token: pass --token or set {TOKEN_VARIABLE.format(region=args.region.upper())}.")
+        key = (args.region, token, args.rate_limit, args.cache, args.processes, args.timeout)
+        if key not in self.clients:
+            if args.processes is not None and args.processes not in self.cpu_pools:
+                self.cpu_pools[args.processes] = workato_oem.CPUPool(args.processes)
+            self.clients[key] = workato_oem.Workato(args.region, token, cache=args.cache, rate_limit=args.rate_limit,
+                                                    cpu_pool=self.cpu_pools.get(args.processes),
+                                                    timeout=(workato_oem.DEFAULT_TIMEOUT[0], args.timeout or workato_oem.DEFAULT_TIMEOUT[1]))
+        return self.clients[key]
+
+    def close(self):
+        for pool in self.cpu_pools.values():
+            pool.close()
+
+def write_json(data, output):
+    if output in [None, '-']:
+        json.dump(data, sys.stdout, indent=4, default=str)
+        sys.stdout.write("\n")
+    else:
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'w') as of:
+            json.dump(data, of, indent=4, default=str)
+        print(f"Wrote {output}.")
+    return None
+
+def positive_number(text):
+    # argparse type for --rate-limit: 0 or less would never let a request through
+    value = float(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, not {text}")
+    return value
+
+def read_rows(csv_file):
+    with open(csv_file, 'r', newline='') as cf:
+        return [[field.strip() for field in row] for row in csv.reader(cf) if row and not row[0].startswith('#')]
+
+#
+# Commands (each returns the exit status)
+
+def audit(client, args):
+    from concurrent.futures import ThreadPoolExecutor
+    with client.priority('bulk'):
+        roles = client.api_request('get', '/api/roles')
+        if roles.status_code not in [200, 201]:
+            raise workato_oem.InternalOperationError(f"Reading roles failed: {roles.log_message}")
+        workspaces = list(client.list_workspaces())
+
+    def members(workspace):
+        with client.priority('bulk'):
+            found = client.list_workspace_members(workspace['id'])
+        if args.role:
+            found = [m for m in found if m.get('role_name') == args.role]
+        return {**workspace, 'members': found}
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        report = list(pool.map(client.carry_deadline(members), workspaces))
+    if args.role:
+        report = [ws for ws in report if ws['members']]
+    write_json({'roles': roles.data, 'workspaces': report}, args.output)
+    return 0
+
+def dump(client, args):
+    from concurrent.futures import ThreadPoolExecutor
+    with client.priority('bulk'):
+        workspaces = list(client.list_workspaces())
+
+    def details(workspace):
+        with client.priority('bulk'):
+            return {**workspace,
+                    'folders': list(client.paginate(f"/api/managed_users/{workspace['id']}/folders")),
+                    'projects': list(client.paginate(f"/api/managed_users/{workspace['id']}/projects"))}
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        write_json(list(pool.map(client.carry_deadline(details), workspaces)), args.output)
+    return 0
+
+def estimate_plan(deployment, args, max_workers=None):
+    # --dry-run: the plan's estimate, checked against --inventory if given; sends no requests
+    inventory = None
+    if args.inventory:
+        with open(args.inventory, 'r') as inf:
+            inventory = json.load(inf)
+    estimate = deployment.dry_run(inventory=inventory, max_workers=max_workers)
+    write_json(estimate, args.report)
+    return 1 if estimate['problems'] else 0
+
+def run_plan(client, plan, args):
+    with workato_oem.DeploymentPlan(plan, client) as deployment:
+        if args.dry_run:
+            return estimate_plan(deployment, args, args.workers)
+        log = workato_oem.OperationLog(workato_oem.NDJSONSink(args.log)) if args.log else None
+        progress = None
+        if args.progress:
+            progress = workato_oem.ProgressReporter(len(deployment.steps), client.metrics, args.command, args.progress).start()
+        try:
+            report = deployment.execute(max_workers=args.workers, log=log, progress=progress, on_step=None if progress else lambda step: print(
+                f"{step.status.upper():>10}  {step.id}" + (f"  ({step.error})" if step.error else ""), file=sys.stderr))
+        finally:
+            if progress is not None:
+                progress.stop()
+            if log is not None:
+                log.close()
+        if args.report:
+            write_json(report, args.report)
+        return 0 if all(step['status'] == 'succeeded' for step in report) else 1
+
+def migrate(client, args):
+    deployments, bad_rows = [], 0
+    for n, row in enumerate(read_rows(args.migrations), 1):
+        if len(row) < 4 or not all(row[:4]):
+            bad_rows += 1
+            print(f"SKIPPED  row {n}: expected source workspace, package ID, destination workspace, destination folder; "
+                  f"got {row}", file=sys.stderr)
+            continue
+        source, package_id, destination, folder = row[:4]
+        deployments.append({'name': f"{n}:{source}->{destination}", 'source': {'workspace': source, 'package': package_id},
+                            'destinations': [{'workspace': destination, 'folder': folder, 'restart': args.restart}]})
+    plan = {'deployments': deployments, **({'record': args.record} if args.record else {})}
+    status = run_plan(client, plan, args)
+    return 1 if bad_rows else status
+
+def deploy(client, args):
+    return run_plan(client, workato_oem.load_plan(args.plan), args)
+
+def backup(client, args):
+    store = workato_oem.BackupStore(args.archive) if args.incremental else None
+    exporter = workato_oem.BulkExport(client, os.path.join(args.archive, 'incoming') if store else args.archive,
+                                      workers=args.workers, store=store)
+    workspaces = [{'id': w, 'external_id': w[1:] if w.startswith('E') else None} for w in args.workspace or []]
+    exports = exporter.manifests(workspaces or None)
+    progress = None
+    if args.progress:
+        progress = workato_oem.ProgressReporter(len(exports), client.metrics, 'backup', args.progress).start()
+    try:
+        results = exporter.run(exports, progress=progress, on_export=None if progress else lambda result: print(
+            f"{result['status'].upper():>10}  {result['file'] or '{workspace_id}/{manifest_id}'.format(**result)}" +
+            (f"  ({result['error']})" if result['error'] else ""), file=sys.stderr))
+    finally:
+        if progress is not None:
+            progress.stop()
+    archived = [result for result in results if result['status'] == 'archived']
+    if store is not None:
+        print(f"Backed up {len(archived)} of {len(results)} manifests in {args.archive} "
+              f"({sum(result['new_objects'] for result in archived)} new assets, {sum(result['new_bytes'] for result in archived)} bytes).")
+    else:
+        print(f"Archived {len(archived)} of {len(results)} manifests in {args.archive} "
+              f"({sum(1 for result in archived if result['duplicate_of'])} duplicates linked).")
+    return 0 if len(archived) == len(results) else 1
+
+def inventory(client, args):
+    workspaces = [{'id': w, 'external_id': w[1:] if w.startswith('E') else None} for w in args.workspace or []]
+    progress = None
+    if args.progress:
+        progress = workato_oem.ProgressReporter(None, client.metrics, 'inventory', args.progress).start()
+    try:
+        found = client.crawl_inventory(workspaces or None, workers=args.workers, progress=progress)
+    finally:
+        if progress is not None:
+            progress.stop()
+    found.save(args.file)
+    summary = found.summary()
+    print(f"Wrote {summary['recipes']} recipes ({summary['running']} running) and {summary['connections']} connections "
+          f"from {summary['workspaces']} workspaces to {args.file}.")
+    for workspace_id, error in found.errors.items():
+        print(f"FAILED  {workspace_id}  ({error})", file=sys.stderr)
+    return 1 if found.errors else 0
+
+def recipes(client, args):
+    found = workato_oem.Inventory.load(args.file)
+    write_json(found.recipes(args.workspace, args.connector, args.running), args.output)
+    return 0
+
+def invite(client, args):
+    failures = 0
+    for collaborator in args.collaborators:
+        name, email, role = collaborator.split(':', 2)
+        response = client.add_workspace_collaborator(name, email, role, workspace_id=args.workspace)
+        if response.status_code in [200, 201]:
+            print(f"Invited {name} <{email}> to {args.workspace} as {role}.")
+        else:
+            failures += 1
+            print(f"Failed to invite {name} <{email}> to {args.workspace}: {response.message}", file=sys.stderr)
+    return 1 if failures else 0
+
+def provision(client, args):
+    rows = read_rows(args.workspaces)
+    if args.dry_run:
+        # the same workspaces as a plan of create steps, one at a time as below
+        workspaces = []
+        for row in rows:
+            external_id, name = row[0], row[1]
+            workspaces += [{'name': f"{name} Dev", 'external_id': f"{external_id}_DEV", 'notification_email': args.dev_email},
+                           {'name': name, 'external_id': external_id, 'notification_email': args.prod_email}]
+        with workato_oem.DeploymentPlan({'workspaces': workspaces, 'max_workers': 1}, client) as plan:
+            return estimate_plan(plan, args)
+    failures = 0
+    for row in rows:
+        external_id, name = row[0], row[1]
+        for label, workspace_name, workspace_external_id, email in [('Dev', f"{name} Dev", f"{external_id}_DEV", args.dev_email),
+                                                                    ('Prod', name, external_id, args.prod_email)]:
+            response = client.create_workspace(workspace_name, workspace_external_id, email)
+            if response.status_code in [200, 201]:
+                print(f"Created {label} workspace for {name} (E{workspace_external_id}).")
+            else:
+                failures += 1
+                print(f"Failed to create {label} workspace for {name}: {response.message}", file=sys.stderr)
+    return 1 if failures else 0
+
+def props(client, args):
+    properties = client.get_properties(args.source, prefix=args.prefix)
+    if not args.dry_run:
+        client.upsert_properties(properties, workspace_id=args.destination)
+    print(f"{'Would copy' if args.dry_run else 'Copied'} {len(properties)} properties from {args.source} to {args.destination}.")
+    return 0
+
+def jobs(client, args):
+    root = f"/api/managed_users/{args.workspace}/recipes" if args.workspace else "/api/recipes"
+    target = f"{root}/{args.recipe}/jobs" + (f"/{args.job}" if args.job else '')
+    response = client.api_request('get', target, use_cache=False)
+    if response.status_code not in [200, 201]:
+        raise workato_oem.InternalOperationError(f"Reading jobs failed: {response.log_message}")
+    write_json(response.data, args.output)
+    return 0
+
+def schema(client, args):
+    from tools import schema_generator
+    schema_generator.main(args.arguments)
+    return 0
+
+COMMANDS = {
+    'audit': audit, 'dump': dump, 'migrate': migrate, 'deploy': deploy, 'backup': backup, 'invite': invite,
+    'provision': provision, 'props': props, 'jobs': jobs, 'schema': schema, 'inventory': inventory, 'recipes': recipes,
+}
+OFFLINE_COMMANDS = ['schema', 'recipes']   # commands that don't need an API client
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='workato4py', description="Workato Embedded API tools.")
+    parser.add_argument('--region', default='us', choices=sorted(workato_oem.API_ENVIRONMENTS))
+    parser.add_argument('--token', help="API token (defaults to $WORKATO_TOKEN_<REGION>)")
+    parser.add_argument('--rate-limit', type=positive_number, help="maximum requests per second")
+    parser.add_argument('--cache', action='store_true', help="cache GET responses in memory (shared by a batch's commands)")
+    parser.add_argument('--processes', type=int, help="worker processes for CPU-heavy work (0: none, in-thread)")
+    parser.add_argument('--timeout', type=float, help="seconds to wait for each response (default: 60)")
+    parser.add_argument('--deadline', type=float, help="seconds the whole command may take")
+    parser.add_argument('--metrics', help="write the clients' request metrics to this JSON file at exit")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sub = commands.add_parser('audit', help="roles and workspace members")
+    sub.add_argument('--role', help="only report members with this role (eg. 'Deployment Engineer')")
+    sub.add_argument('--workers', type=int, default=4)
+    sub.add_argument('--output', help="JSON file (default: stdout)")
+
+    sub = commands.add_parser('dump', help="workspaces with their folders and projects")
+    sub.add_argument('--workers', type=int, default=4)
+    sub.add_argument('--output', default='data/workspace_details.json')
+
+    for name, help_text in [('migrate', "run package migrations from a CSV"), ('deploy', "run a deployment plan")]:
+        sub = commands.add_parser(name, help=help_text)
+        if name == 'migrate':
+            sub.add_argument('migrations', help="CSV of source workspace, package ID, destination workspace, folder ID")
+            sub.add_argument('--restart', action='store_true', help="restart recipes stopped by the imports")
+            sub.add_argument('--record', help="deployment record file; skip imports that would change nothing")
+        else:
+            sub.add_argument('plan', help="JSON or YAML plan file")
+        sub.add_argument('--workers', type=int, help="steps to run at once")
+        sub.add_argument('--dry-run', action='store_true', help="estimate requests and duration instead")
+        sub.add_argument('--inventory', help="with --dry-run, a workspace dump to check workspaces and folders against")
+        sub.add_argument('--report', help="JSON file for the per-step results (or the estimate)")
+        sub.add_argument('--log', help="NDJSON operation log to append each finished step to (.gz to compress)")
+        sub.add_argument('--progress', choices=['terminal', 'json'], help="show live progress instead of each step")
+
+    sub = commands.add_parser('backup', help="export manifests into a dated archive")
+    sub.add_argument('archive', help="archive directory (each run writes to a <YYYY-MM-DD> directory in it)")
+    sub.add_argument('--workspace', action='append', help="only this workspace (repeatable; default: all)")
+    sub.add_argument('--workers', type=int, default=8)
+    sub.add_argument('--incremental', action='store_true', help="keep a deduplicated BackupStore in the archive directory")
+    sub.add_argument('--progress', choices=['terminal', 'json'], help="show live progress instead of each manifest")
+
+    sub = commands.add_parser('inventory', help="crawl recipes and connections into an inventory file")
+    sub.add_argument('file', help="NDJSON inventory file (.gz to compress)")
+    sub.add_argument('--workspace', action='append', help="only this workspace (repeatable; default: all)")
+    sub.add_argument('--workers', type=int, default=8)
+    sub.add_argument('--progress', choices=['terminal', 'json'], help="show live progress")
+
+    sub = commands.add_parser('recipes', help="query the recipes in an inventory file")
+    sub.add_argument('file', help="inventory file written by the inventory command")
+    sub.add_argument('--workspace', help="only this workspace")
+    sub.add_argument('--connector', help="only recipes using this connector (eg. salesforce)")
+    state = sub.add_mutually_exclusive_group()
+    state.add_argument('--running', action='store_const', const=True, help="only running recipes")
+    state.add_argument('--stopped', action='store_const', const=False, dest='running', help="only stopped recipes")
+    sub.add_argument('--output', help="JSON file (default: stdout)")
+
+    sub = commands.add_parser('invite', help="invite collaborators to a workspace")
+    sub.add_argument('workspace')
+    sub.add_argument('collaborators', nargs='+', help='"<name>:<email>:<role>"')
+
+    sub = commands.add_parser('provision', help="create Dev and Prod workspaces from a CSV")
+    sub.add_argument('workspaces', help="CSV of external ID, name")
+    sub.add_argument('--dev-email', required=True, help="notification e-mail for Dev workspaces")
+    sub.add_argument('--prod-email', required=True, help="notification e-mail for Prod workspaces")
+    sub.add_argument('--dry-run', action='store_true', help="estimate requests and duration instead")
+    sub.add_argument('--inventory', help="with --dry-run, a workspace dump to check for existing workspaces")
+    sub.add_argument('--report', help="JSON file for the estimate (default: stdout)")
+
+    sub = commands.add_parser('props', help="copy environment properties between workspaces")
+    sub.add_argument('source')
+    sub.add_argument('destination')
+    sub.add_argument('--prefix', default='')
+    sub.add_argument('--dry-run', action='store_true')
+
+    sub = commands.add_parser('jobs', help="a recipe's jobs")
+    sub.add_argument('recipe')
+    sub.add_argument('--workspace', help="managed user workspace (default: the API client's own workspace)")
+    sub.add_argument('--job', help="show only this job")
+    sub.add_argument('--output', help="JSON file (default: stdout)")
+
+    sub = commands.add_parser('schema', help="generate a Workato schema from JSON")
+    sub.add_argument('arguments', nargs=argparse.REMAINDER)
+
+    sub = commands.add_parser('batch', help="run the commands listed in a file")
+    sub.add_argument('file')
+    return parser
+
+def run_command(parser, clients, args):
+    if args.command == 'batch':
+        return batch(parser, clients, args.file)
+    try:
+        client = None if args.command in OFFLINE_COMMANDS else clients.get(args)
+        with client.deadline(args.deadline) if client is not None and args.deadline else contextlib.nullcontext():
+            return COMMANDS[args.command](client, args)
+    except workato_oem.InternalOperationError as ex:
+        print(f"{args.command}: {ex.message}", file=sys.stderr)
+        return 1
+
+def batch(parser, clients, batch_file):
+    with open(batch_file, 'r') as bf:
+        lines = [line.strip() for line in bf if line.strip() and not line.strip().startswith('#')]
+    failed = []
+    for n, line in enumerate(lines, 1):
+        print(f"[{n}/{len(lines)}] {line}", file=sys.stderr)
+        try:
+            status = run_command(parser, clients, parser.parse_args(shlex.split(line)))
+        except SystemExit as ex:    # argparse errors (and tools that exit) end the line, not the batch
+            status = ex.code if isinstance(ex.code, int) else 1
+        except Exception as ex:     # so does anything else a command raises
+            print(f"{line}: {type(ex).__name__}: {ex}", file=sys.stderr)
+            status = 1
+        if status:
+            failed.append(line)
+    if failed:
+        print(f"\n{len(failed)} of {len(lines)} commands failed:\n\t" + "\n\t".join(failed), file=sys.stderr)
+    return 1 if failed else 0
+
+## MAIN
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    clients = Clients()
+    try:
+        return run_command(parser, clients, args)
+    finally:
+        clients.close()
+        if args.metrics:
+            with open(args.metrics, 'w') as mf:
+                json.dump([{'region': region, 'metrics': client.metrics.snapshot()}
+                           for (region, *_), client in clients.clients.items()], mf, indent=4, default=str)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,7 +8,11 @@
         for the creation of DevOps pipelines manged outside of Workato.
 """
 
-import sys, json, requests, time
+import sys, os, re, json, copy, hashlib, heapq, threading, time
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+# Everything else -- `requests`, http.client, zipfile, gzip, tempfile, concurrent.futures and so on -- is imported
+# where it is first needed, so short-lived scripts that only parse arguments (or fail early) start quickly.
 
 ## CONSTANTS
 
@@ -20,6 +24,28 @@ API_ENVIRONMENTS = {
 }   # if you would prefer to include the `/api/` directory in the target specification for functions rather than
     # implied by the api_root used globally, you can remove this suffix from each of the above
 
+CACHE_TTLS = [
+    (r"/api/roles", 3600),
+    (r"/api/managed_users/[^/]+/(exports|imports)", 0),
+    (r"/api/managed_users/[^/]+/(recipes|connections)/?$", 0),
+    (r"/api/managed_users/[^/]+/(folders|projects|members)", 600),
+    (r"/api/managed_users/?$", 300),
+]   # (pattern, seconds) pairs checked in order against the request path; the first match sets the TTL for
+    # a cached GET. A TTL of 0 disables caching for that family (eg. export/import status, which must be live).
+CACHE_DEFAULT_TTL = 60
+SECRET_PATTERN = r"(token|secret|password|signature|credential|api[_-]?key|auth)"    # names of headers, query
+    # parameters and JSON keys whose values are scrubbed from recorded traffic
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]    # upper bounds (seconds) for latency histograms
+PRIORITIES = {'high': 0, 'normal': 1, 'bulk': 2}    # request priority classes; lower values go first when
+    # requests queue for the rate limiter
+DEFAULT_TIMEOUT = (10, 60)    # (connect, read) seconds allowed each request; see Workato(timeout=...)
+PACKAGE_SPOOL_SIZE = 64 * 1024 * 1024    # bytes of a package `transfer_package()` holds in memory before spilling
+    # the rest to an anonymous temporary file
+PACKAGE_ASSET_KINDS = [
+    (r"\.recipe\.json$", 'recipe'),
+    (r"\.connection\.json$", 'connection'),
+    (r"\.lookup_table\.json$", 'lookup_table'),
+]   # (pattern, kind) pairs classifying the files in an RLCM package zip; anything else is 'other'
 
 #
 # FUNCTIONS
@@ -32,8 +58,136 @@ def generate_response_log_message(response):
         log_message = f"Request returned {response.status_code}: {response.json()['message']}"
     elif response.status_code in [500]:
         log_message = f"Request generated an internal server error: {response.json()['message']}"
+    elif response.status_code in [304]:
+        log_message = f"Request returned 304: resource not modified."
+    elif response.status_code in [429]:
+        log_message = f"Request was throttled (429); retry after {response.headers.get('Retry-After', 'an interval')} seconds."
+    else:
+        log_message = f"Request returned {response.status_code}."
     return log_message
 
+def cache_scope(target):
+    """
+    Returns the URL prefix whose cached GETs a write to `target` may have changed: the whole managed user
+    workspace for workspace-scoped endpoints, otherwise the top-level collection the target belongs to.
+    """
+    scoped = re.match(r"(.*/api/managed_users/[^/?]+)", target) or re.match(r"(.*/api/[^/?]+)", target)
+    if scoped:
+        return scoped.group(1)
+    return target.split('?')[0]
+
+def endpoint_family(target):
+    """
+    Reduces a request URL to the endpoint it calls, with IDs replaced by `:id`, so metrics for
+    `/api/managed_users/1234/exports/99` and `/api/managed_users/E5678/exports/12` land in the same series.
+    Download URLs outside the API (pre-signed package links) are reported by host only.
+    """
+    host, path = re.match(r"^(?:https?://([^/]+))?([^?]*)", target).groups()
+    if not path.startswith('/api/'):
+        return f"download:{host}" if host else path
+    return "/".join(':id' if re.search(r"\d", segment) else segment for segment in path.rstrip('/').split('/'))
+
+def payload_size(data):
+    # request bodies are strings, bytes or (for package uploads) open files
+    if data is None:
+        return 0
+    if isinstance(data, str):
+        return len(data.encode('utf-8'))
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    try:
+        return os.fstat(data.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        pass
+    try:    # in-memory buffers (io.BytesIO)
+        position = data.tell()
+        size = data.seek(0, os.SEEK_END)
+        data.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return 0
+
+def iter_json_items(chunks, result_key='result'):
+    """
+    Decodes a JSON list -- the whole document, or the `result_key` list of a top-level object -- from an iterable
+    of byte chunks, yielding each item as soon as it is complete, so only one item (plus a chunk) is held in
+    memory. Other members of the object are decoded and dropped. Raises ValueError if the JSON is malformed or
+    holds no such list.
+    """
+    import codecs
+    decoder, utf8 = json.JSONDecoder(), codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        for chunk in chunks:
+            text = utf8.decode(chunk)
+            if text:
+                buffer, pos = buffer[pos:] + text, 0
+                return True
+        buffer, pos, eof = buffer[pos:] + utf8.decode(b'', final=True), 0, True
+        return False
+
+    def peek():
+        # the next non-whitespace character ('' at the end of the document)
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer) or not fill() and pos >= len(buffer):
+                return buffer[pos:pos + 1]
+
+    def value():
+        # a value is only taken once a delimiter follows it, so a number cut by a chunk boundary isn't mistaken
+        # for a shorter one
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                decoded, end = decoder.raw_decode(buffer, pos)
+                if eof or end < len(buffer) and buffer[end] in " \t\r\n,:]}":
+                    pos = end
+                    return decoded
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            fill()
+
+    def expect(char):
+        nonlocal pos
+        if peek() != char:
+            raise ValueError(f"Expected '{char}' in JSON near: {buffer[pos:pos + 40]!r}")
+        pos += 1
+
+    def items():
+        nonlocal pos
+        expect('[')
+        if peek() == ']':
+            pos += 1
+            return
+        while True:
+            yield value()
+            if peek() == ']':
+                pos += 1
+                return
+            expect(',')
+
+    if peek() == '[':
+        yield from items()
+        return None
+    expect('{')
+    while peek() != '}':
+        key = value()
+        expect(':')
+        if key == result_key and peek() == '[':
+            yield from items()
+            return None
+        value()
+        if peek() == ',':
+            pos += 1
+    raise ValueError(f"No '{result_key}' list in the JSON object.")
+
 
 #
 # EXCEPTION CLASSES 
@@ -42,6 +196,1486 @@ class InternalOperationError(Exception):
     def __init__(self, message):
         self.message = message
 
+class DeadlineExceeded(InternalOperationError):
+    """Raised when an operation runs out of the time given to it with `Workato.deadline()`."""
+
+class CircuitOpenError(InternalOperationError):
+    def __init__(self, message, endpoint=None, retry_in=None):
+        self.message = message
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+#
+# CACHE CLASSES
+# [opt-in storage for GET responses; see Workato(cache=...)]
+
+class CacheEntry:
+    def __init__(self, target, status_code, headers, text, etag, stored_at, expires_at):
+        self.target = target
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+        self.etag = etag
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.data = None        # the decoded body, kept after the first hit
+
+    def is_fresh(self):
+        return time.time() < self.expires_at
+
+    def to_dict(self):
+        return {'target': self.target, 'status_code': self.status_code, 'headers': self.headers, 'text': self.text,
+                'etag': self.etag, 'stored_at': self.stored_at, 'expires_at': self.expires_at}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['target'], data['status_code'], data['headers'], data['text'], data['etag'],
+                   data['stored_at'], data['expires_at'])
+
+    def to_response(self, log_message="Request served from the response cache."):
+        # each hit gets its own top-level list or dict, so callers filtering or extending it don't change the
+        # entry; the objects inside are shared
+        if self.data is None:
+            self.data = json.loads(self.text)
+        return WorkatoResponse(self.status_code, dict(self.headers), self.text, copy.copy(self.data), log_message)
+
+class DiskCacheBackend:
+    def __init__(self, directory, max_entries=5000):
+        """
+        Stores cache entries as one JSON file per key in `directory`, so several processes pointed at the same
+        directory share their responses. Files are grouped in one subdirectory per `cache_scope()` of their
+        target (its name is the quoted scope), so invalidating a scope removes directories by name without
+        opening any entry. Writes go through a temp file and `os.replace()`, so a reader never sees a partial
+        entry. Reading an entry touches its modification time; once the directory holds more than
+        `max_entries` files, the least recently used are removed.
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def _scope_dir(self, scope):
+        from urllib.parse import quote
+        return os.path.join(self.directory, quote(scope, safe=''))
+
+    def _path(self, key):
+        # keys are ResponseCache.make_key() lists, whose second item is the target URL
+        return os.path.join(self._scope_dir(cache_scope(json.loads(key)[1])),
+                            f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r') as cf:
+                entry = CacheEntry.from_dict(json.load(cf))
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return entry
+
+    def set(self, key, entry):
+        import tempfile
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        except OSError:
+            return None
+        try:
+            with os.fdopen(fd, 'w') as cf:
+                json.dump(entry.to_dict(), cf)
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return None
+        self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def invalidate(self, prefix):
+        """Removes the entries of every scope starting with `prefix` (the scope directories, by name)."""
+        import shutil
+        from urllib.parse import unquote
+        for name in os.listdir(self.directory):
+            if unquote(name).startswith(prefix):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def clear(self):
+        import shutil
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif name.endswith('.json'):
+                self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        files = []
+        for name in os.listdir(self.directory):
+            scope_dir = os.path.join(self.directory, name)
+            if os.path.isdir(scope_dir):
+                try:
+                    files += [os.path.join(scope_dir, fn) for fn in os.listdir(scope_dir) if fn.endswith('.json')]
+                except OSError:
+                    continue    # invalidated meanwhile
+        if len(files) <= self.max_entries:
+            return None
+        files.sort(key=lambda f: os.path.getmtime(f) if os.path.exists(f) else 0)
+        for f in files[:len(files) - self.max_entries]:
+            self._remove(f)
+
+class ResponseCache:
+    def __init__(self, max_entries=1024, ttls=None, default_ttl=CACHE_DEFAULT_TTL, disk=None):
+        """
+        An LRU cache of successful GET responses for a Workato client. `max_entries` bounds the in-memory layer,
+        `ttls` is a list of (path pattern, seconds) pairs (defaults to CACHE_TTLS) with `default_ttl` used for
+        anything unmatched, and `disk` is an optional DiskCacheBackend (or a directory name) that backs the memory
+        layer and is shared between processes. Stale entries that carried an ETag are kept so the client can
+        revalidate them with If-None-Match instead of downloading the body again.
+        """
+        self.max_entries = max_entries
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in (ttls if ttls is not None else CACHE_TTLS)]
+        self.default_ttl = default_ttl
+        self.disk = DiskCacheBackend(disk) if isinstance(disk, str) else disk
+        self.entries = OrderedDict()
+        self.hits, self.misses, self.revalidations = 0, 0, 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(target, url_params=None, payload=None, scope=None):
+        # `scope` keeps apart the entries of clients with different credentials sharing a cache
+        params = sorted((str(k), str(v)) for k, v in (url_params or {}).items()) if isinstance(url_params, dict) else url_params
+        return json.dumps([scope, target, params, payload], default=str)
+
+    def ttl_for(self, target):
+        path = re.sub(r"^https?://[^/]+", "", target)
+        for pattern, ttl in self.ttls:
+            if pattern.search(path):
+                return ttl
+        return self.default_ttl
+
+    def lookup(self, key):
+        """
+        Returns the entry stored for `key` (fresh or stale) or None, promoting it in the LRU order and pulling it
+        up from the disk backend when the memory layer doesn't have it.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self._remember(key, entry)
+        with self.lock:
+            if entry is not None and entry.is_fresh():
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry
+
+    def store(self, key, target, result):
+        ttl = self.ttl_for(target)
+        if ttl <= 0:
+            return None
+        now = time.time()
+        entry = CacheEntry(target, result.status_code, dict(result.headers), result.text,
+                           result.headers.get('ETag'), now, now + ttl)
+        self._remember(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry)
+        return entry
+
+    def refresh(self, key, entry):
+        """Extends a stale entry's lifetime after the API confirmed (304) that it hasn't changed."""
+        now = time.time()
+        entry.stored_at, entry.expires_at = now, now + self.ttl_for(entry.target)
+        with self.lock:
+            self.revalidations += 1
+        self._remember(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry)
+        return entry
+
+    def invalidate(self, prefix):
+        """Drops every entry whose target URL starts with `prefix`."""
+        with self.lock:
+            for key in [k for k, e in self.entries.items() if e.target.startswith(prefix)]:
+                del self.entries[key]
+        if self.disk is not None:
+            self.disk.invalidate(prefix)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def _remember(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+#
+# TRANSPORT CLASSES
+# [the layer that actually moves bytes for a Workato client; see Workato(transport=...)]
+
+class SessionTransport:
+    def __init__(self):
+        """
+        Sends requests through `requests` sessions. Sessions aren't guaranteed to be thread-safe, so each thread
+        gets its own (and, with it, its own connection pool).
+        """
+        self._local = threading.local()
+        self._sessions = []
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = self._local.session = requests.Session()
+            self._sessions.append(session)
+        return session
+
+    def request(self, method, url, headers=None, params=None, data=None, stream=False, timeout=None):
+        return self._session().request(method, url, headers=headers, params=params, data=data, stream=stream, timeout=timeout)
+
+    def connection_reuse_rate(self):
+        opened, sent = 0, 0
+        for session in list(self._sessions):
+            for adapter in session.adapters.values():
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is not None:
+                        opened += pool.num_connections
+                        sent += pool.num_requests
+        return 1 - (opened / sent) if sent else 0.0
+
+class HTTPTransport:
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_redirects=5):
+        """
+        Sends requests with the standard library's http.client instead of `requests`, keeping one persistent
+        (keep-alive) connection per host in each thread. Used by default when `requests` isn't installed; it
+        follows redirects for GETs (dropping the Authorization header when the host changes). `timeout` is
+        used for requests sent without one: seconds, or a (connect, read) pair as with `requests`.
+        """
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self._local = threading.local()
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.sent = 0
+
+    def _connection(self, scheme, netloc, fresh=False):
+        import http.client
+        connections = self._local.__dict__.setdefault('connections', {})
+        connection = connections.get((scheme, netloc))
+        if connection is None or fresh:
+            if connection is not None:
+                connection.close()
+            connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            connection = connections[(scheme, netloc)] = connection_class(netloc, timeout=self.timeout)
+            with self.lock:
+                self.opened += 1
+        return connection
+
+    def request(self, method, url, headers=None, params=None, data=None, stream=False, timeout=None):
+        from urllib.parse import urlsplit, urljoin, urlencode
+        import http.client
+        timeout = timeout if timeout is not None else self.timeout
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        headers = dict(headers or {})
+        query = urlencode([(k, v) for k, v in (params or {}).items() if v is not None])
+        body = data.encode('utf-8') if isinstance(data, str) else data
+        if body is not None:
+            headers.setdefault('Content-Length', str(payload_size(body)))
+        for redirect in range(self.max_redirects + 1):
+            parts = urlsplit(url)
+            path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+            if query:
+                path += ('&' if parts.query else '?') + query
+            position = body.tell() if hasattr(body, 'tell') else None
+            for attempt in range(2):
+                # a kept-alive connection may have been closed by the server since its last use: reconnect once
+                connection = self._connection(parts.scheme, parts.netloc, fresh=attempt > 0)
+                try:
+                    if connection.sock is None:
+                        connection.timeout = connect_timeout
+                        connection.connect()
+                    connection.sock.settimeout(read_timeout)
+                    connection.request(method, path, body=body, headers=headers)
+                    response = connection.getresponse()
+                    break
+                except (http.client.RemoteDisconnected, http.client.ImproperConnectionState, BrokenPipeError, ConnectionResetError):
+                    if attempt or (position is None and hasattr(body, 'read')):
+                        raise
+                    if position is not None:
+                        body.seek(position)
+                except OSError:
+                    connection.close()      # eg. timed out: a late response would be read as the next one's
+                    raise
+            with self.lock:
+                self.sent += 1
+            location = response.getheader('Location')
+            if method == 'GET' and response.status in [301, 302, 303, 307, 308] and location:
+                response.read()
+                target = urljoin(url, location)
+                if urlsplit(target).netloc != parts.netloc:
+                    headers = {k: v for k, v in headers.items() if k.lower() != 'authorization'}
+                url, query = target, ''
+                continue
+            if stream:
+                return StreamedResponse(response, connection)
+            return RecordedResponse(response.status, response.msg, response.read())
+        raise InternalOperationError(f"HTTPTransport: too many redirects for {url}")
+
+    def connection_reuse_rate(self):
+        return 1 - (self.opened / self.sent) if self.sent else 0.0
+
+class StreamedResponse:
+    def __init__(self, response, connection=None):
+        """
+        An http.client response whose body is read only as it is iterated (or when `.content` is used). Closing
+        it before the body has been read also closes its `connection`, which couldn't be reused.
+        """
+        self.response = response
+        self.connection = connection
+        self.status_code = response.status
+        self.headers = response.msg
+        self._content = None
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = self.response.read()
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=128):
+        if self._content is not None:
+            yield from (self._content[i:i + chunk_size] for i in range(0, len(self._content), chunk_size))
+            return
+        for chunk in iter(lambda: self.response.read(chunk_size), b''):
+            yield chunk
+
+    def close(self):
+        if not self.response.isclosed() and self.connection is not None:
+            self.connection.close()
+        self.response.close()
+
+def default_transport():
+    """A SessionTransport when `requests` is installed (without importing it yet); otherwise an HTTPTransport."""
+    import importlib.util
+    return SessionTransport() if importlib.util.find_spec('requests') is not None else HTTPTransport()
+
+class RecordedResponse:
+    def __init__(self, status_code, headers, content):
+        """A fully read response (from a cassette, or HTTPTransport), exposing the parts of `requests.Response` we use."""
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=128):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+def open_cassette(cassette_file, mode):
+    # cassettes are NDJSON, gzipped when the file name ends in .gz
+    if cassette_file.endswith('.gz'):
+        import gzip
+        return gzip.open(cassette_file, mode + 't', encoding='utf-8')
+    return open(cassette_file, mode, encoding='utf-8')
+
+def scrub_url(url):
+    """Replaces the values of secret-looking query parameters (eg. pre-signed download signatures)."""
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+    parts = urlsplit(url)
+    query = [(k, 'SCRUBBED' if re.search(SECRET_PATTERN, k, re.I) else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+def scrub_json(value):
+    if isinstance(value, dict):
+        return {k: 'SCRUBBED' if re.search(SECRET_PATTERN, str(k), re.I) and isinstance(v, str) else scrub_json(v)
+                for k, v in value.items()}
+    if isinstance(value, list):
+        return [scrub_json(v) for v in value]
+    if isinstance(value, str) and '?' in value and re.match(r"https?://", value):
+        return scrub_url(value)    # eg. pre-signed download links
+    return value
+
+def cassette_key(method, url, params=None):
+    # requests are matched on method, path and query -- not host -- so a cassette replays against any api_root
+    from urllib.parse import urlsplit, parse_qsl, urlencode
+    parts = urlsplit(scrub_url(url))
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True) + [(str(k), str(v)) for k, v in (params or {}).items()])
+    query = [(k, 'SCRUBBED' if re.search(SECRET_PATTERN, k, re.I) else v) for k, v in query]
+    return f"{method.upper()} {parts.path}?{urlencode(query)}"
+
+class RecordingTransport:
+    def __init__(self, inner, cassette_file, record_bodies=True):
+        """
+        Wraps another transport and appends every request/response pair it carries to `cassette_file` as one
+        NDJSON line: the method and URL (with secret-looking query values scrubbed), request body size, status,
+        response headers, body size and SHA-256, and elapsed time. JSON bodies are kept in the line itself; other
+        bodies (eg. package zips) and streamed ones are written once each to `<cassette_file>.bodies/`, named by
+        their SHA-256, and streamed responses are passed through as they are read rather than buffered.
+        Authorization headers are never written, and string values of secret-looking JSON keys in response
+        bodies are scrubbed. Set `record_bodies=False` to keep only sizes and hashes.
+        """
+        self.inner = inner
+        self.cassette_file = cassette_file
+        self.bodies_dir = f"{cassette_file}.bodies"
+        self.record_bodies = record_bodies
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.out = open_cassette(cassette_file, 'a')
+
+    def request(self, method, url, headers=None, params=None, data=None, stream=False, timeout=None):
+        offset, started = time.time() - self.started, time.perf_counter()
+        result = self.inner.request(method, url, headers=headers, params=params, data=data, stream=stream, timeout=timeout)
+        entry = {'key': cassette_key(method, url, params), 'offset': round(offset, 6), 'elapsed': None,
+                 'request_bytes': payload_size(data), 'status': result.status_code,
+                 'headers': {k: v for k, v in result.headers.items()
+                             if not re.search(SECRET_PATTERN + "|cookie|content-length|content-encoding|transfer-encoding", k, re.I)}}
+        if stream:
+            return RecordingStream(self, result, entry, started)
+        content = result.content or b''
+        entry.update(elapsed=round(time.perf_counter() - started, 6), response_bytes=len(content),
+                     sha256=hashlib.sha256(content).hexdigest())
+        if self.record_bodies:
+            try:
+                entry['json'] = scrub_json(json.loads(content)) if content else None
+            except ValueError:
+                entry['body'] = self.store_body(content)
+        self.write(entry)
+        return RecordedResponse(result.status_code, dict(result.headers), content)
+
+    def store_body(self, content):
+        # writes a body to the side directory (once per distinct body) and returns its file name
+        name = hashlib.sha256(content).hexdigest()
+        body_file = os.path.join(self.bodies_dir, name)
+        if not os.path.exists(body_file):
+            import tempfile
+            os.makedirs(self.bodies_dir, exist_ok=True)
+            handle, temp_file = tempfile.mkstemp(dir=self.bodies_dir, suffix='.tmp')
+            with os.fdopen(handle, 'wb') as tf:
+                tf.write(content)
+            os.replace(temp_file, body_file)
+        return name
+
+    def spool_body(self):
+        # a temporary file in the side directory for a streamed body, kept by keep_body()
+        import tempfile
+        os.makedirs(self.bodies_dir, exist_ok=True)
+        handle, temp_file = tempfile.mkstemp(dir=self.bodies_dir, suffix='.tmp')
+        return os.fdopen(handle, 'wb'), temp_file
+
+    def keep_body(self, temp_file, sha256, scrub):
+        # streamed JSON is scrubbed like inline bodies; anything else is kept as received
+        if scrub:
+            try:
+                with open(temp_file, 'rb') as tf:
+                    content = json.dumps(scrub_json(json.load(tf))).encode('utf-8')
+            except ValueError:
+                pass
+            else:
+                os.remove(temp_file)
+                return self.store_body(content)
+        body_file = os.path.join(self.bodies_dir, sha256)
+        if os.path.exists(body_file):
+            os.remove(temp_file)
+        else:
+            os.replace(temp_file, body_file)
+        return sha256
+
+    def write(self, entry):
+        with self.lock:
+            self.out.write(json.dumps(entry, separators=(',', ':')) + "\n")
+            self.out.flush()
+
+    def connection_reuse_rate(self):
+        reuse_rate = getattr(self.inner, 'connection_reuse_rate', None)
+        return reuse_rate() if reuse_rate is not None else 0.0
+
+    def close(self):
+        with self.lock:
+            self.out.close()
+
+class RecordingStream:
+    def __init__(self, recorder, response, entry, started):
+        """
+        A streamed response passed through a RecordingTransport: chunks are handed on as they arrive, hashed and
+        (with bodies recorded) copied to a side file, and the cassette entry is written once the body has been
+        read or the response is closed (marked 'partial' if it wasn't read to the end).
+        """
+        self.recorder = recorder
+        self.response = response
+        self.entry = entry
+        self.started = started
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.digest = hashlib.sha256()
+        self.received = 0
+        self.spool = recorder.spool_body() if recorder.record_bodies else None
+        self.recorded = False
+        self._content = None
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = b''.join(self.iter_content(65536))
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=128):
+        if self._content is not None:
+            yield from (self._content[i:i + chunk_size] for i in range(0, len(self._content), chunk_size))
+            return
+        for chunk in self.response.iter_content(chunk_size=chunk_size):
+            self.digest.update(chunk)
+            self.received += len(chunk)
+            if self.spool is not None:
+                self.spool[0].write(chunk)
+            yield chunk
+        self._record(complete=True)
+
+    def close(self):
+        self._record(complete=False)
+        if hasattr(self.response, 'close'):
+            self.response.close()
+
+    def _record(self, complete):
+        if self.recorded:
+            return None
+        self.recorded = True
+        self.entry.update(elapsed=round(time.perf_counter() - self.started, 6), response_bytes=self.received,
+                          sha256=self.digest.hexdigest())
+        if not complete:
+            self.entry['partial'] = True
+        if self.spool is not None:
+            handle, temp_file = self.spool
+            handle.close()
+            if complete:
+                scrub = 'json' in str(self.headers.get('Content-Type') or '')
+                self.entry['body'] = self.recorder.keep_body(temp_file, self.entry['sha256'], scrub)
+            else:
+                os.remove(temp_file)
+        self.recorder.write(self.entry)
+        return None
+
+class ReplayTransport:
+    def __init__(self, cassette_file, latency_scale=1.0, strict=False):
+        """
+        Serves the responses in a cassette written by RecordingTransport instead of calling the API. Requests are
+        matched on method, path and query; repeated requests (eg. status polling) get the recorded responses in
+        order, and the last one again once they run out. Each response is delayed by its recorded elapsed time
+        multiplied by `latency_scale` (0 for no delay). Bodies kept in side files are read from
+        `<cassette_file>.bodies/`. Unmatched requests get a 404, or raise InternalOperationError when `strict` is set.
+        """
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.bodies_dir = f"{cassette_file}.bodies"
+        self.recorded = {}
+        self.served = {}
+        self.lock = threading.Lock()
+        with open_cassette(cassette_file, 'r') as cf:
+            for line in cf:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.recorded.setdefault(entry['key'], []).append(entry)
+
+    def request(self, method, url, headers=None, params=None, data=None, stream=False, timeout=None):
+        key = cassette_key(method, url, params)
+        with self.lock:
+            entries = self.recorded.get(key)
+            if entries:
+                index = self.served.get(key, 0)
+                self.served[key] = index + 1
+                entry = entries[min(index, len(entries) - 1)]
+            else:
+                entry = None
+        if entry is None:
+            if self.strict:
+                raise InternalOperationError(f"ReplayTransport: no recorded response for {key}")
+            return RecordedResponse(404, {'Content-Type': 'application/json'}, b'{"message": "Not found"}')
+        if self.latency_scale:
+            time.sleep(entry['elapsed'] * self.latency_scale)
+        if 'body' in entry:
+            with open(os.path.join(self.bodies_dir, entry['body']), 'rb') as body:
+                content = body.read()
+        elif 'base64' in entry:     # cassettes written before bodies went to side files
+            import base64
+            content = base64.b64decode(entry['base64'])
+        elif entry.get('json') is not None:
+            content = json.dumps(entry['json']).encode('utf-8')
+        else:
+            content = b''   # recorded without bodies (or the body was empty)
+        return RecordedResponse(entry['status'], dict(entry['headers']), content)
+
+#
+# INSTRUMENTATION CLASSES
+# [latency, volume and polling metrics for a Workato client; see Workato(metrics=..., tracer=...)]
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q):
+        """Estimates the q-th quantile (0-1) as the upper bound of the bucket it falls in."""
+        if self.count == 0:
+            return None
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return float('inf')
+
+class ClientMetrics:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Collects metrics for every request a Workato client sends: a latency histogram, request counts by status,
+        and bytes sent/received per (method, endpoint family); throttle (429) and retry counts; circuit breaker
+        state changes; and the time spent polling export/import status. Callables registered with `add_listener()` receive each event as a dict, and
+        `add_gauge()` exposes point-in-time values (eg. connection reuse) through `snapshot()` and
+        `prometheus_text()`. One instance may be shared between several clients.
+        """
+        self.buckets = buckets
+        self.latency = {}
+        self.request_counts = {}
+        self.bytes_out = {}
+        self.bytes_in = {}
+        self.errors = {}
+        self.throttled = 0
+        self.retries = 0
+        self.polls = {}
+        self.circuit_changes = {}
+        self.gauges = {}
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+        return callback
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def add_gauge(self, name, fn, **labels):
+        self.gauges[(name, tuple(sorted(labels.items())))] = fn
+
+    def emit(self, event):
+        for callback in list(self.listeners):
+            try:
+                callback(event)
+            except Exception:
+                pass    # a misbehaving hook must never break the request that triggered it
+
+    def record_request(self, method, endpoint, status_code, seconds, bytes_out=0, bytes_in=0):
+        key = (method, endpoint)
+        with self.lock:
+            if key not in self.latency:
+                self.latency[key] = LatencyHistogram(self.buckets)
+            self.latency[key].observe(seconds)
+            self.request_counts[(method, endpoint, status_code)] = self.request_counts.get((method, endpoint, status_code), 0) + 1
+            self.bytes_out[key] = self.bytes_out.get(key, 0) + bytes_out
+            self.bytes_in[key] = self.bytes_in.get(key, 0) + bytes_in
+            if status_code == 429:
+                self.throttled += 1
+        self.emit({'event': 'request', 'method': method, 'endpoint': endpoint, 'status_code': status_code,
+                   'seconds': seconds, 'bytes_out': bytes_out, 'bytes_in': bytes_in})
+
+    def record_error(self, method, endpoint, seconds, error):
+        with self.lock:
+            self.errors[(method, endpoint)] = self.errors.get((method, endpoint), 0) + 1
+        self.emit({'event': 'error', 'method': method, 'endpoint': endpoint, 'seconds': seconds, 'error': repr(error)})
+
+    def record_bytes_in(self, endpoint, count):
+        with self.lock:
+            self.bytes_in[('get', endpoint)] = self.bytes_in.get(('get', endpoint), 0) + count
+        self.emit({'event': 'bytes_in', 'endpoint': endpoint, 'bytes_in': count})
+
+    def record_retry(self, method, endpoint, reason):
+        with self.lock:
+            self.retries += 1
+        self.emit({'event': 'retry', 'method': method, 'endpoint': endpoint, 'reason': reason})
+
+    def record_circuit(self, circuit, state):
+        with self.lock:
+            self.circuit_changes[(circuit, state)] = self.circuit_changes.get((circuit, state), 0) + 1
+        self.emit({'event': 'circuit', 'circuit': circuit, 'state': state})
+
+    def record_poll(self, operation, seconds, polls):
+        with self.lock:
+            total_seconds, total_polls, waits = self.polls.get(operation, (0.0, 0, 0))
+            self.polls[operation] = (total_seconds + seconds, total_polls + polls, waits + 1)
+        self.emit({'event': 'poll', 'operation': operation, 'seconds': seconds, 'polls': polls})
+
+    def snapshot(self):
+        """Returns the current metrics as plain, JSON-serializable data."""
+        with self.lock:
+            endpoints = []
+            for (method, endpoint), hist in sorted(self.latency.items()):
+                endpoints.append({'method': method, 'endpoint': endpoint, 'count': hist.count,
+                                  'seconds_total': hist.total, 'p50': hist.quantile(0.5), 'p99': hist.quantile(0.99),
+                                  'bytes_out': self.bytes_out.get((method, endpoint), 0),
+                                  'bytes_in': self.bytes_in.get((method, endpoint), 0),
+                                  'errors': self.errors.get((method, endpoint), 0)})
+            result = {'endpoints': endpoints, 'throttled': self.throttled, 'retries': self.retries,
+                      'polls': {op: {'seconds': v[0], 'requests': v[1], 'waits': v[2]} for op, v in self.polls.items()},
+                      'circuit_changes': [{'circuit': c, 'state': state, 'count': n}
+                                          for (c, state), n in sorted(self.circuit_changes.items())]}
+        result['gauges'] = [{'name': name, 'labels': dict(labels), 'value': fn()} for (name, labels), fn in self.gauges.items()]
+        return result
+
+    def prometheus_text(self, prefix='workato'):
+        """Renders the metrics in the Prometheus text exposition format."""
+        def labels(**kw):
+            return "{" + ",".join(f'{k}="{v}"' for k, v in kw.items()) + "}"
+        lines = [f"# HELP {prefix}_request_duration_seconds Latency of Workato API requests.",
+                 f"# TYPE {prefix}_request_duration_seconds histogram"]
+        with self.lock:
+            for (method, endpoint), hist in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, n in zip(hist.buckets + ['+Inf'], hist.counts):
+                    cumulative += n
+                    lines.append(f"{prefix}_request_duration_seconds_bucket{labels(method=method, endpoint=endpoint, le=bound)} {cumulative}")
+                lines.append(f"{prefix}_request_duration_seconds_sum{labels(method=method, endpoint=endpoint)} {hist.total}")
+                lines.append(f"{prefix}_request_duration_seconds_count{labels(method=method, endpoint=endpoint)} {hist.count}")
+            lines += [f"# TYPE {prefix}_requests_total counter"]
+            for (method, endpoint, status), n in sorted(self.request_counts.items(), key=str):
+                lines.append(f"{prefix}_requests_total{labels(method=method, endpoint=endpoint, status=status)} {n}")
+            lines += [f"# TYPE {prefix}_request_errors_total counter"]
+            for (method, endpoint), n in sorted(self.errors.items()):
+                lines.append(f"{prefix}_request_errors_total{labels(method=method, endpoint=endpoint)} {n}")
+            lines += [f"# TYPE {prefix}_bytes_total counter"]
+            for direction, table in (('out', self.bytes_out), ('in', self.bytes_in)):
+                for (method, endpoint), n in sorted(table.items()):
+                    lines.append(f"{prefix}_bytes_total{labels(direction=direction, method=method, endpoint=endpoint)} {n}")
+            lines += [f"# TYPE {prefix}_throttled_total counter", f"{prefix}_throttled_total {self.throttled}",
+                      f"# TYPE {prefix}_retries_total counter", f"{prefix}_retries_total {self.retries}",
+                      f"# TYPE {prefix}_poll_seconds_total counter"]
+            for operation, (seconds, polls, waits) in sorted(self.polls.items()):
+                lines.append(f"{prefix}_poll_seconds_total{labels(operation=operation)} {seconds}")
+            lines += [f"# TYPE {prefix}_poll_requests_total counter"]
+            for operation, (seconds, polls, waits) in sorted(self.polls.items()):
+                lines.append(f"{prefix}_poll_requests_total{labels(operation=operation)} {polls}")
+            lines += [f"# TYPE {prefix}_circuit_transitions_total counter"]
+            for (circuit, state), n in sorted(self.circuit_changes.items()):
+                lines.append(f"{prefix}_circuit_transitions_total{labels(circuit=circuit, state=state)} {n}")
+        typed = set()
+        for (name, gauge_labels), fn in sorted(self.gauges.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                typed.add(name)
+            lines.append(f"{prefix}_{name}{labels(**dict(gauge_labels)) if gauge_labels else ''} {fn()}")
+        return "\n".join(lines) + "\n"
+
+class ProgressReporter:
+    def __init__(self, total=None, metrics=None, label='', mode='terminal', output=None, interval=1.0, window=10.0):
+        """
+        Live progress for bulk operations: items done, in flight and failed, throughput and ETA, plus the API
+        request rate and throttle (429) and retry counts taken from `metrics` (a client's ClientMetrics). While
+        running (between `start()` and `stop()`, or as a context manager) it renders every `interval` seconds
+        to `output` (stderr by default): a single updating line in 'terminal' mode, or one JSON object per line
+        in 'json' mode. Rates are averaged over the last `window` seconds.
+        """
+        self.total = total
+        self.metrics = metrics
+        self.label = label
+        self.mode = mode
+        self.output = output if output is not None else sys.stderr
+        self.interval = interval
+        self.window = window
+        self.in_flight = set()
+        self.done = 0
+        self.failed = 0
+        self.throttled = 0
+        self.retries = 0
+        self.completions = deque()
+        self.requests = deque()
+        self.started_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.listener = None
+
+    def _on_event(self, event):
+        now = time.monotonic()
+        with self.lock:
+            if event['event'] == 'request':
+                self.requests.append(now)
+                if event['status_code'] == 429:
+                    self.throttled += 1
+            elif event['event'] == 'retry':
+                self.retries += 1
+
+    def started(self, item):
+        with self.lock:
+            self.in_flight.add(item)
+
+    def finished(self, item, ok=True):
+        with self.lock:
+            self.in_flight.discard(item)
+            self.done += 1
+            self.failed += 0 if ok else 1
+            self.completions.append(time.monotonic())
+
+    @contextmanager
+    def item(self, item):
+        """Tracks the work inside the `with` block as one item; an exception marks it failed."""
+        self.started(item)
+        try:
+            yield item
+        except BaseException:
+            self.finished(item, ok=False)
+            raise
+        else:
+            self.finished(item)
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            for times in (self.completions, self.requests):
+                while times and now - times[0] > self.window:
+                    times.popleft()
+            elapsed = now - self.started_at
+            span = min(self.window, elapsed) or 1e-9
+            throughput = len(self.completions) / span
+            remaining = self.total - self.done if self.total is not None else None
+            return {'label': self.label, 'total': self.total, 'done': self.done, 'in_flight': len(self.in_flight),
+                    'failed': self.failed, 'elapsed': round(elapsed, 1), 'items_per_sec': round(throughput, 2),
+                    'eta': round(remaining / throughput, 1) if remaining and throughput else (0.0 if remaining == 0 else None),
+                    'requests_per_sec': round(len(self.requests) / span, 2), 'throttled': self.throttled,
+                    'retries': self.retries}
+
+    def render(self, final=False):
+        state = self.snapshot()
+        if self.mode == 'json':
+            self.output.write(json.dumps(state) + "\n")
+        else:
+            eta = f"{int(state['eta'] // 60)}:{int(state['eta'] % 60):02d}" if state['eta'] is not None else '?'
+            line = (f"{state['label'] + ' ' if state['label'] else ''}{state['done']}/{state['total'] or '?'} done, "
+                    f"{state['in_flight']} running, {state['failed']} failed | {state['items_per_sec']} items/s, "
+                    f"ETA {eta} | API {state['requests_per_sec']} req/s, {state['throttled']} throttled, "
+                    f"{state['retries']} retries")
+            interactive = getattr(self.output, 'isatty', lambda: False)()
+            self.output.write(("\r" + line + "\033[K" + ("\n" if final else "")) if interactive else line + "\n")
+        self.output.flush()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.render()
+
+    def start(self):
+        if self.metrics is not None:
+            self.listener = self.metrics.add_listener(self._on_event)
+        self.started_at = time.monotonic()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.listener is not None:
+            self.metrics.remove_listener(self.listener)
+        self.render(final=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+class LogRecord:
+    __slots__ = ('time', 'status', 'error', 'message', 'operation', 'input', 'output')
+
+    def __init__(self, status, message, operation=None, input=None, output=None, error=False, at=None):
+        # one event of a long-running operation; the fields of bulk_migrator's log rows, with a float timestamp
+        self.time = time.time() if at is None else at
+        self.status = status
+        self.error = error
+        self.message = message
+        self.operation = operation
+        self.input = input
+        self.output = output
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+class NDJSONSink:
+    def __init__(self, log_file, buffer_size=100, flush_interval=5.0):
+        """
+        Appends records to `log_file` as NDJSON (gzipped when the name ends in .gz), buffering up to `buffer_size`
+        lines and writing them out whenever the buffer fills or `flush_interval` seconds have passed.
+        """
+        self.out = open_cassette(log_file, 'a')
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.flushed = time.monotonic()
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record.to_dict(), separators=(',', ':'), default=str)
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) >= self.buffer_size or time.monotonic() - self.flushed >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            self.out.write("\n".join(self.buffer) + "\n")
+            self.buffer = []
+        self.out.flush()
+        self.flushed = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.out.close()
+
+class OperationLog:
+    def __init__(self, sink=None, max_payload=2048, sample_every=None, tail=100):
+        """
+        A structured event log for long-running operations (migrations, deployments) whose memory use stays
+        flat: records go to `sink` (eg. an NDJSONSink; anything with `write(record)`) and only the last `tail`
+        are kept in memory. Inputs and outputs have secret-looking values scrubbed (see SECRET_PATTERN) and are
+        cut down to a preview once their JSON is longer than `max_payload` characters. `sample_every` maps
+        statuses of repetitive events (eg. {'poll': 10}) to keeping one in that many; errors are always kept.
+        """
+        self.sink = sink
+        self.max_payload = max_payload
+        self.sample_every = sample_every or {}
+        self.records = deque(maxlen=tail)
+        self.seen = {}
+        self.counts = {}
+        self.errors = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def _payload(self, value):
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        value = scrub_json(value) if isinstance(value, (dict, list)) else str(value)
+        text = value if isinstance(value, str) else json.dumps(value, default=str)
+        if len(text) <= self.max_payload:
+            return value
+        return {'truncated': True, 'length': len(text), 'preview': text[:self.max_payload]}
+
+    def event(self, status, message, operation=None, input=None, output=None, error=False):
+        """Records one event; returns the LogRecord, or None when it was sampled out."""
+        with self.lock:
+            seen = self.seen[(operation, status)] = self.seen.get((operation, status), 0) + 1
+            self.counts[status] = self.counts.get(status, 0) + 1
+            if error:
+                self.errors += 1
+            elif status in self.sample_every and (seen - 1) % self.sample_every[status]:
+                self.dropped += 1
+                return None
+        record = LogRecord(status, message, operation, self._payload(input), self._payload(output), bool(error))
+        with self.lock:
+            self.records.append(record)
+        if self.sink is not None:
+            self.sink.write(record)
+        return record
+
+    def exception(self, status, ex, operation=None, input=None):
+        message = ex.message if isinstance(ex, InternalOperationError) and isinstance(ex.message, str) else repr(ex)
+        return self.event(status, message, operation, input, error=True)
+
+    def listen(self, metrics, sample_every=None):
+        """
+        Logs the requests a client sends (from its ClientMetrics) as 'request' events -- one in `sample_every`
+        of them, if given -- and every failed request as an error.
+        """
+        if sample_every:
+            self.sample_every = {**self.sample_every, 'request': sample_every}
+
+        def on_event(event):
+            if event['event'] == 'request':
+                self.event('request', f"{event['method'].upper()} {event['endpoint']} -> {event['status_code']}",
+                           output={k: event[k] for k in ['status_code', 'seconds'] if k in event},
+                           error=event['status_code'] >= 500)
+            elif event['event'] == 'error':
+                self.event('request_error', f"{event['method'].upper()} {event['endpoint']} failed: {event['error']}", error=True)
+        metrics.add_listener(on_event)
+        return None
+
+    def summary(self):
+        with self.lock:
+            return {'events': dict(self.counts), 'errors': self.errors, 'dropped': self.dropped}
+
+    def close(self):
+        if self.sink is not None and hasattr(self.sink, 'close'):
+            self.sink.close()
+
+#
+# PACKAGE CLASSES
+# [what is inside an RLCM package, and what was last deployed where]
+
+def package_assets(package_file, chunk_size=65536):
+    """
+    Reads an RLCM package zip's index and returns {path: {'kind', 'size', 'sha256'}} for every file in it,
+    hashing each one as it streams out of the archive (the package is never loaded into memory whole).
+    """
+    import zipfile
+    assets = {}
+    try:
+        with zipfile.ZipFile(package_file) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                digest = hashlib.sha256()
+                with zf.open(info) as member:
+                    for chunk in iter(lambda: member.read(chunk_size), b''):
+                        digest.update(chunk)
+                kind = next((k for pattern, k in PACKAGE_ASSET_KINDS if re.search(pattern, info.filename)), 'other')
+                assets[info.filename] = {'kind': kind, 'size': info.file_size, 'sha256': digest.hexdigest()}
+    except (OSError, zipfile.BadZipFile) as ex:
+        raise InternalOperationError(f"package_assets(): cannot read package {package_file}: {ex}")
+    return assets
+
+def spool_stream(chunks, spool_size=PACKAGE_SPOOL_SIZE):
+    """
+    Collects an iterable of byte chunks (eg. a download's `iter_content()`) in memory, moving it to an anonymous
+    temporary file only once it grows past `spool_size` bytes. Returns the buffer rewound, ready to upload;
+    close it when done.
+    """
+    import io
+    buffer = io.BytesIO()
+    for chunk in chunks:
+        if isinstance(buffer, io.BytesIO) and buffer.tell() + len(chunk) > spool_size:
+            import tempfile
+            spilled = tempfile.TemporaryFile()
+            spilled.write(buffer.getbuffer())
+            buffer = spilled
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
+
+def diff_assets(assets, deployed):
+    """
+    Compares a package's assets (from `package_assets()`) with those recorded as deployed (path -> sha256).
+    Returns lists of the paths that are new, changed, unchanged, and deployed but absent from the package.
+    """
+    diff = {'added': [], 'changed': [], 'unchanged': [], 'missing': sorted(set(deployed) - set(assets))}
+    for path, asset in sorted(assets.items()):
+        if path not in deployed:
+            diff['added'].append(path)
+        elif deployed[path] != asset['sha256']:
+            diff['changed'].append(path)
+        else:
+            diff['unchanged'].append(path)
+    return diff
+
+def trim_package(package_file, keep, trimmed_file):
+    """
+    Writes a copy of a package holding only the paths in `keep` (plus any files that are not recipes,
+    connections or lookup tables), copying each member across in chunks.
+    """
+    import zipfile
+    with zipfile.ZipFile(package_file) as source, zipfile.ZipFile(trimmed_file, 'w', zipfile.ZIP_DEFLATED) as trimmed:
+        for info in source.infolist():
+            kind = next((k for pattern, k in PACKAGE_ASSET_KINDS if re.search(pattern, info.filename)), 'other')
+            if info.is_dir() or (kind != 'other' and info.filename not in keep):
+                continue
+            with source.open(info) as member, trimmed.open(info.filename, 'w') as copy:
+                for chunk in iter(lambda: member.read(65536), b''):
+                    copy.write(chunk)
+    return trimmed_file
+
+class DeploymentRecord:
+    def __init__(self, record_file):
+        """
+        A JSON file recording the hash of every asset last imported into each destination (workspace and
+        folder), so unchanged packages can be skipped. Use one record per region; it is rewritten atomically
+        after each successful import and may be shared by threads.
+        """
+        self.record_file = record_file
+        self.lock = threading.Lock()
+        try:
+            with open(record_file, 'r') as rf:
+                self.destinations = json.load(rf)
+        except FileNotFoundError:
+            self.destinations = {}
+
+    def key(self, workspace, folder):
+        return f"{workspace}:{folder}"
+
+    def deployed(self, workspace, folder):
+        with self.lock:
+            return dict(self.destinations.get(self.key(workspace, folder), {}))
+
+    def update(self, workspace, folder, assets):
+        """Records `assets` (from `package_assets()`) as deployed on top of whatever was there already."""
+        with self.lock:
+            current = self.destinations.setdefault(self.key(workspace, folder), {})
+            current.update({path: asset['sha256'] for path, asset in assets.items()})
+            import tempfile
+            handle, temp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.record_file)), suffix='.tmp')
+            with os.fdopen(handle, 'w') as tf:
+                json.dump(self.destinations, tf, indent=4, sort_keys=True)
+            os.replace(temp_file, self.record_file)
+
+#
+# CONCURRENCY CLASSES
+# [coordination between threads sharing one Workato client]
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Coalesces duplicate concurrent calls: while a call for a given key is running, any other thread that asks
+        for the same key waits for it and receives the same result (or the same exception) instead of starting its
+        own. Nothing is remembered once the call finishes; pair with a ResponseCache for that.
+
+        A waiting thread gives up with DeadlineExceeded when its own `deadline` (a Deadline) passes. If the call
+        it waited on ran out of its caller's deadline instead, it makes the call itself rather than share that.
+        """
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.calls, self.shared = 0, 0
+
+    def do(self, key, fn, *args, deadline=None, **kwargs):
+        while True:
+            with self.lock:
+                flight = self.flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self.flights[key] = _Flight()
+                    self.calls += 1
+                else:
+                    flight.waiters += 1
+                    self.shared += 1
+            if leader:
+                break
+            while not flight.done.wait(max(0.0, deadline.remaining()) if deadline is not None else None):
+                deadline.check("SingleFlight: waiting on an identical call")
+            if isinstance(flight.error, DeadlineExceeded):
+                continue        # the other caller's deadline, not ours: try again
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn(*args, **kwargs)
+        except Exception as ex:
+            flight.error = ex
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result
+
+class RateLimiter:
+    def __init__(self, rate, burst=None):
+        """
+        A token bucket allowing `rate` requests per second on average, with bursts of up to `burst` (defaults to
+        `rate`, at least 1). `acquire()` blocks until a token is available; `pause()` empties the bucket for a
+        while, eg. when the API answers 429 with a Retry-After. Callers waiting for a token queue by priority (see
+        PRIORITIES) and then arrival, so high-priority requests go ahead of any bulk traffic already waiting.
+        `rate` must be positive; leave the client's `rate_limit` unset for no limit.
+        """
+        if rate <= 0:
+            raise ValueError(f"RateLimiter(): rate must be positive, not {rate}.")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.waiting = []
+        self.tickets = 0
+        self.waited = 0.0
+        self.waited_by_priority = {}
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority=PRIORITIES['normal']):
+        started = time.monotonic()
+        with self.condition:
+            self.tickets += 1
+            ticket = (priority, self.tickets)
+            heapq.heappush(self.waiting, ticket)
+            self.condition.notify_all()
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self.waiting[0] != ticket:
+                        self.condition.wait()
+                    elif now >= self.paused_until and self.tokens >= 1:
+                        self.tokens -= 1
+                        return None
+                    else:
+                        self.condition.wait(max(self.paused_until - now, (1 - self.tokens) / self.rate))
+            finally:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.condition.notify_all()
+                waited = time.monotonic() - started
+                self.waited += waited
+                self.waited_by_priority[priority] = self.waited_by_priority.get(priority, 0.0) + waited
+
+    def pause(self, seconds):
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+            self.condition.notify_all()
+
+class _Circuit:
+    def __init__(self, window):
+        self.state = 'closed'
+        self.outcomes = deque(maxlen=window)
+        self.opened_at = 0.0
+        self.probes = 0
+
+class CircuitBreaker:
+    def __init__(self, failure_rate=0.5, window=20, min_requests=5, reset_timeout=30, half_open_probes=1):
+        """
+        Tracks the health of each endpoint family and stops sending requests to one that is failing. A circuit
+        opens when at least `failure_rate` of its last `window` requests (and no fewer than `min_requests`) failed
+        -- a connection error, timeout or 5xx; throttling does not count. While open, requests fail immediately
+        with CircuitOpenError. After `reset_timeout` seconds the circuit goes half-open and lets up to
+        `half_open_probes` requests through: a success closes it again, a failure re-opens it. One breaker may
+        be shared by several clients (keys include the region).
+        """
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_requests = min_requests
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.circuits = {}
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def add_listener(self, callback):
+        # called as callback(key, state) whenever a circuit changes state
+        self.listeners.append(callback)
+
+    def _transition(self, key, circuit, state):
+        circuit.state = state
+        if state == 'open':
+            circuit.opened_at = time.monotonic()
+        if state == 'closed':
+            circuit.outcomes.clear()
+        circuit.probes = 0
+        return (key, state)
+
+    def before(self, key):
+        """Raises CircuitOpenError unless a request to `key` may be sent now."""
+        changed = None
+        with self.lock:
+            circuit = self.circuits.setdefault(key, _Circuit(self.window))
+            if circuit.state == 'open':
+                retry_in = circuit.opened_at + self.reset_timeout - time.monotonic()
+                if retry_in > 0:
+                    raise CircuitOpenError(f"Circuit open for {key}; retry in {retry_in:.1f}s.", key, retry_in)
+                changed = self._transition(key, circuit, 'half_open')
+            if circuit.state == 'half_open':
+                if circuit.probes >= self.half_open_probes:
+                    raise CircuitOpenError(f"Circuit half-open for {key}; waiting on a probe request.", key, 0.0)
+                circuit.probes += 1
+        if changed is not None:
+            self._notify(*changed)
+
+    def release(self, key):
+        """Gives back what `before(key)` took for a request that was never sent, so a half-open probe isn't lost."""
+        with self.lock:
+            circuit = self.circuits.get(key)
+            if circuit is not None and circuit.state == 'half_open' and circuit.probes > 0:
+                circuit.probes -= 1
+
+    def record(self, key, success):
+        """Records the outcome of a request sent after `before(key)`."""
+        changed = None
+        with self.lock:
+            circuit = self.circuits.setdefault(key, _Circuit(self.window))
+            if circuit.state == 'half_open':
+                changed = self._transition(key, circuit, 'closed' if success else 'open')
+            elif circuit.state == 'closed':
+                circuit.outcomes.append(success)
+                failures = circuit.outcomes.count(False)
+                if len(circuit.outcomes) >= self.min_requests and failures >= self.failure_rate * len(circuit.outcomes):
+                    changed = self._transition(key, circuit, 'open')
+        if changed is not None:
+            self._notify(*changed)
+
+    def _notify(self, key, state):
+        for callback in list(self.listeners):
+            try:
+                callback(key, state)
+            except Exception:
+                pass
+
+    def states(self):
+        """Returns {key: {'state', 'requests', 'failures', 'retry_in'}} for every endpoint seen so far."""
+        now = time.monotonic()
+        with self.lock:
+            return {key: {'state': c.state, 'requests': len(c.outcomes), 'failures': c.outcomes.count(False),
+                          'retry_in': max(0.0, c.opened_at + self.reset_timeout - now) if c.state == 'open' else 0.0}
+                    for key, c in self.circuits.items()}
+
+    def open_circuits(self, prefix=''):
+        with self.lock:
+            return sum(1 for key, c in self.circuits.items() if c.state != 'closed' and key.startswith(prefix))
+
+def _run_batch(fn, batch):
+    # runs in a worker process: a whole batch of calls goes across (pickled) as one task
+    return [fn(*args) for args in batch]
+
+class CPUPool:
+    def __init__(self, workers=None, batch_size=16):
+        """
+        Runs CPU-bound stages -- hashing packages, inferring schemas, rendering reports -- in a pool of worker
+        processes, so they use every core instead of holding the GIL that the client's I/O threads need to send
+        requests. `workers` defaults to one per CPU, and the processes only start when first used; `workers=0`
+        runs everything in the calling thread instead (for debugging, or jobs too small to be worth it).
+        Functions must be defined at module level and everything passed must pickle, so pass file paths rather
+        than file contents where possible and let the workers read the files themselves.
+        """
+        self.workers = workers
+        self.batch_size = batch_size
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def _pool(self):
+        with self.lock:
+            if self.executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self.executor
+
+    def submit(self, fn, *args):
+        """Starts `fn(*args)` in a worker process and returns its Future, leaving the calling thread free."""
+        if self.workers == 0:
+            from concurrent.futures import Future
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as ex:
+                future.set_exception(ex)
+            return future
+        return self._pool().submit(fn, *args)
+
+    def run(self, fn, *args):
+        """Runs `fn(*args)` in a worker process and returns the result; only the calling thread waits."""
+        return self.submit(fn, *args).result()
+
+    def starmap(self, fn, arguments, batch_size=None):
+        """
+        Yields `fn(*args)` for each tuple in `arguments`, in order. Calls are sent to the workers in batches of
+        `batch_size` (so many small calls don't cost a round trip each), and `arguments` is consumed as results
+        are yielded, with at most two batches per worker waiting -- it can be a generator still being fed by a
+        crawl on other threads.
+        """
+        size = batch_size or self.batch_size
+        limit = 2 * (self.workers or os.cpu_count() or 1)
+        pending, batch = deque(), []
+        for args in arguments:
+            batch.append(tuple(args))
+            if len(batch) >= size:
+                pending.append(self.submit(_run_batch, fn, batch))
+                batch = []
+                if len(pending) >= limit:
+                    yield from pending.popleft().result()
+        if batch:
+            pending.append(self.submit(_run_batch, fn, batch))
+        while pending:
+            yield from pending.popleft().result()
+
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+class Deadline:
+    def __init__(self, seconds):
+        """
+        The time by which an operation -- possibly many requests, like an export, its polling, the download, the
+        import and its polling -- must be finished, `seconds` from now. See `Workato.deadline()`.
+        """
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def check(self, operation):
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(f"{operation}: the {self.seconds}s deadline has passed.")
+
 #
 # WORKATO CLASSES
 # [represents the API client through which all requests are processed]
@@ -57,7 +1691,9 @@ class WorkatoResponse:
 class Workato:
     #
     # Defining the API client class
-    def __init__(self, region, api_token):
+    def __init__(self, region, api_token, cache=None, coalesce=False, metrics=None, tracer=None, poll_interval=3,
+                 transport=None, rate_limit=None, circuit_breaker=None, priority='normal', cpu_pool=None,
+                 timeout=DEFAULT_TIMEOUT):
         """
         The Workato class represents a useable objecat can be used to make requests from Workato's API. It is
         configured with the Workato region, which is used to establish the root URL for requests to be sent to, and
@@ -65,45 +1701,475 @@ class Workato:
         the properties `.region` (representing the Workato region), `.api_root` (representing the base URL for the
         connection and all subsequent requests), and `.api_header` (contains the authorization key; it can also be
         expanded to include additional header keys).
+
+        Optionally, pass a ResponseCache as `cache` (or `True` for one with default settings) to have GET requests
+        made through `api_request()` served from the cache while they're fresh. With `coalesce=True`, identical GETs
+        issued concurrently from several threads share a single request and its decoded response.
+
+        Every request is recorded in `.metrics` (a ClientMetrics, which can be passed in to share it between
+        clients). If a `tracer` is supplied -- anything with an OpenTelemetry-style `start_as_current_span(name,
+        attributes=...)` context manager -- each request is also wrapped in a span. `poll_interval` is the number
+        of seconds `get_export_status()` and `get_import_status()` wait between status checks.
+
+        Requests are sent through `transport` -- by default a SessionTransport (pooled `requests` sessions, with
+        `requests` imported on the first request), or an HTTPTransport (standard library only) when `requests`
+        isn't installed; or eg. a ReplayTransport to serve a recorded cassette back instead of calling the API. `rate_limit` caps the
+        client's request rate: a number of requests per second, or a RateLimiter (which may be shared). Requests
+        waiting on the rate limiter go in order of priority class (see PRIORITIES): `priority` sets the client's
+        default, and `with client.priority('high'):` changes it for the requests the current thread sends.
+        Pass a CircuitBreaker (or `True` for one with default settings) as `circuit_breaker` to have requests to
+        an endpoint family that keeps failing raise CircuitOpenError at once instead of waiting on the API.
+        Pass a CPUPool as `cpu_pool` to have CPU-heavy work the client does itself (hashing and trimming
+        packages in `import_package_if_changed()`) run in its worker processes.
+
+        Every request is sent with `timeout`: seconds, or a (connect, read) pair (default DEFAULT_TIMEOUT), which
+        the request and transfer methods also take per call. For a limit on a whole operation rather than each
+        request, see `deadline()`.
+
+        `watch_export()` and `watch_import()` wait on operations through `.watcher`, an OperationWatcher shared by
+        all of them (replace it to change its settings or add a notification source).
         """
         self.region = region
         self.api_root = API_ENVIRONMENTS[region]
         self.api_header = {'Authorization': f"Bearer {api_token}"}
+        self.cache = ResponseCache() if cache is True else (cache or None)
+        self.flights = SingleFlight() if coalesce else None
+        self.metrics = metrics if metrics is not None else ClientMetrics()
+        self.tracer = tracer
+        self.poll_interval = poll_interval
+        self.transport = transport if transport is not None else default_transport()
+        self.rate_limiter = RateLimiter(rate_limit) if isinstance(rate_limit, (int, float)) else rate_limit
+        self.circuit_breaker = CircuitBreaker() if circuit_breaker is True else circuit_breaker
+        if priority not in PRIORITIES:
+            raise InternalOperationError(f"Workato(): unknown priority class {priority}.")
+        self.default_priority = priority
+        self.priorities = threading.local()
+        self.cpu_pool = cpu_pool
+        self.timeout = timeout
+        self.deadlines = threading.local()
+        self.watcher = OperationWatcher(self)
+        self.metrics.add_gauge('connection_reuse_ratio', self.connection_reuse_rate, region=region)
+        if self.rate_limiter is not None:
+            for name, value in PRIORITIES.items():
+                self.metrics.add_gauge('rate_limit_wait_seconds', lambda value=value: self.rate_limiter.waited_by_priority.get(value, 0.0),
+                                       region=region, priority=name)
+        if self.circuit_breaker is not None:
+            self.metrics.add_gauge('open_circuits', lambda: self.circuit_breaker.open_circuits(f"{region} "), region=region)
+            self.circuit_breaker.add_listener(self.metrics.record_circuit)
         return None
+
+    #
+    # Connection handling and instrumentation
+    def connection_reuse_rate(self):
+        """
+        Returns the share of requests (0-1) that were sent over an already-open connection, as reported by the
+        client's transport (0.0 for transports that don't pool connections).
+        """
+        reuse_rate = getattr(self.transport, 'connection_reuse_rate', None)
+        return reuse_rate() if reuse_rate is not None else 0.0
+
+    @contextmanager
+    def priority(self, priority_class):
+        """
+        Sends the requests made by the current thread inside the `with` block at `priority_class` ('high',
+        'normal' or 'bulk'). Blocks may be nested; threads started inside the block keep the client's default.
+        """
+        if priority_class not in PRIORITIES:
+            raise InternalOperationError(f"Workato.priority(): unknown priority class {priority_class}.")
+        previous = getattr(self.priorities, 'current', None)
+        self.priorities.current = priority_class
+        try:
+            yield self
+        finally:
+            self.priorities.current = previous
+
+    def current_priority(self):
+        return getattr(self.priorities, 'current', None) or self.default_priority
+
+    @contextmanager
+    def deadline(self, seconds):
+        """
+        Gives everything the current thread does inside the `with` block `seconds` (or a Deadline, to share one
+        between threads) to finish. Each request's timeout is cut to the time left, status polling gives up
+        rather than wait past the deadline, downloads stop when it passes, and once it has passed any further
+        request raises DeadlineExceeded -- so a stuck step can't hold up a pipeline. Nested blocks can only
+        bring the deadline forward. The client's own thread pools (deployment plans, bulk exports, inventory
+        crawls, fleet operations) pass it on to their worker threads; see `carry_deadline()` for others.
+        """
+        deadline = seconds if isinstance(seconds, Deadline) else Deadline(seconds)
+        previous = getattr(self.deadlines, 'current', None)
+        self.deadlines.current = previous if previous is not None and previous.expires < deadline.expires else deadline
+        try:
+            yield self.deadlines.current
+        finally:
+            self.deadlines.current = previous
+
+    def current_deadline(self):
+        return getattr(self.deadlines, 'current', None)
+
+    def carry_deadline(self, fn):
+        """
+        Returns `fn` wrapped to run under the current thread's deadline (if any) in whichever thread calls it --
+        for handing work to a thread pool without the workers running unbounded.
+        """
+        deadline = self.current_deadline()
+        if deadline is None:
+            return fn
+
+        def bounded(*args, **kwargs):
+            with self.deadline(deadline):
+                return fn(*args, **kwargs)
+        return bounded
+
+    def _request_timeout(self, timeout, operation):
+        # (connect, read) for one request: the call's timeout or the client's, cut to what's left of the deadline
+        timeout = timeout if timeout is not None else self.timeout
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        deadline = self.current_deadline()
+        if deadline is not None:
+            deadline.check(operation)
+            left = deadline.remaining()
+            connect, read = min(connect or left, left), min(read or left, left)
+        return connect, read
+
+    def _poll_wait(self, operation):
+        deadline = self.current_deadline()
+        if deadline is not None and deadline.remaining() < self.poll_interval:
+            raise DeadlineExceeded(f"{operation}: the {deadline.seconds}s deadline would pass before the next status check.")
+        time.sleep(self.poll_interval)
+
+    def _download_chunks(self, response, operation):
+        deadline = self.current_deadline()
+        for chunk in response.iter_content(chunk_size=65536):
+            if deadline is not None:
+                deadline.check(operation)
+            yield chunk
+
+    def offload(self, fn, *args):
+        """Runs `fn(*args)` in the client's CPUPool, if it has one, or in the calling thread if not."""
+        return self.cpu_pool.run(fn, *args) if self.cpu_pool is not None else fn(*args)
+
+    def record(self, cassette_file, record_bodies=True):
+        """
+        Starts recording every request this client sends (and its response and timing) to `cassette_file`;
+        see RecordingTransport. Returns the recording transport -- call its `.close()` when finished.
+        """
+        self.transport = RecordingTransport(self.transport, cassette_file, record_bodies)
+        return self.transport
+
+    def _send(self, method, url, headers=None, params=None, data=None, stream=False, timeout=None):
+        """
+        Sends a single HTTP request through the client's transport and records it in `.metrics` (and a span, if
+        the client has a tracer). Exceptions from the transport are recorded and re-raised unchanged, except
+        that one caused by the deadline passing is raised as DeadlineExceeded. A successful write invalidates
+        the cached GETs it may have changed (see `cache_scope()`).
+        """
+        endpoint = endpoint_family(url)
+        if self.tracer is not None:
+            with self.tracer.start_as_current_span(f"workato {method.upper()} {endpoint}",
+                                                   attributes={'http.method': method.upper(), 'workato.endpoint': endpoint,
+                                                               'workato.region': self.region}) as span:
+                result = self._timed_send(method, url, endpoint, headers, params, data, stream, timeout)
+                if span is not None and hasattr(span, 'set_attribute'):
+                    span.set_attribute('http.status_code', result.status_code)
+        else:
+            result = self._timed_send(method, url, endpoint, headers, params, data, stream, timeout)
+        if self.cache is not None and method.lower() != 'get' and result.status_code in [200, 201, 204]:
+            self.cache.invalidate(cache_scope(url))
+        return result
+
+    def _write_headers(self, payload):
+        # payloads passed to api_request() as strings are JSON documents, as in the specialty methods
+        return {**self.api_header, "content-type": "application/json"} if isinstance(payload, str) else self.api_header
+
+    def _cache_key(self, target, url_params, payload):
+        credential = hashlib.sha256(self.api_header.get('Authorization', '').encode('utf-8')).hexdigest()[:16]
+        return self.cache.make_key(target, url_params, payload, scope=credential)
+
+    def _timed_send(self, method, url, endpoint, headers, params, data, stream, timeout=None):
+        circuit = f"{self.region} {endpoint}"
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before(circuit)
+        try:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(PRIORITIES[self.current_priority()])
+            timeout = self._request_timeout(timeout, f"{method.upper()} {endpoint}")
+        except BaseException:
+            # nothing was sent (e.g. the deadline passed while waiting), so don't hold a half-open probe
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.release(circuit)
+            raise
+        started = time.perf_counter()
+        try:
+            result = self.transport.request(method.upper(), url, headers=headers, params=params, data=data, stream=stream,
+                                            timeout=timeout)
+        except Exception as ex:
+            self.metrics.record_error(method, endpoint, time.perf_counter() - started, ex)
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record(circuit, False)
+            deadline = self.current_deadline()
+            if deadline is not None and deadline.remaining() <= 0:
+                raise DeadlineExceeded(f"{method.upper()} {endpoint}: the {deadline.seconds}s deadline passed ({ex}).")
+            raise
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(circuit, result.status_code < 500)
+        self.metrics.record_request(method, endpoint, result.status_code, time.perf_counter() - started,
+                                    payload_size(data), 0 if stream else len(result.content or b''))
+        if result.status_code == 429 and self.rate_limiter is not None:
+            try:
+                self.rate_limiter.pause(float(result.headers.get('Retry-After') or 1))
+            except ValueError:
+                self.rate_limiter.pause(1)
+        return result
     
     #
     # Standard API request for GET, POST, PATCH, and DELETE
     # (mostly tested)
-    def api_request(self, req_type, target, url_params=None, payload=None):
+    def api_request(self, req_type, target, url_params=None, payload=None, use_cache=True, timeout=None, stream=False,
+                    result_key='result'):
         """
         This is a general purpose method for the Workato class that allows an instance of Workato to
         make an API request for a given resource from Workato. You must specify the request type, the
         resource, URL parajeters (if any), and a payload (if there is one). The response is an object
-        of the WorkatoResponse class.
+        of the WorkatoResponse class. When the client has a cache, GETs are answered from it while fresh
+        and revalidated with If-None-Match once stale; pass `use_cache=False` to force a live request.
+        On a client made with `coalesce=True`, concurrent identical GETs (down to `use_cache` and `timeout`) are
+        coalesced into one request, and every caller receives the same WorkatoResponse object -- treat its `.data`
+        as read-only. `timeout` overrides the client's for this request.
+
+        With `stream=True`, a successful GET of a list is decoded as it arrives instead: `.data` is a generator
+        over the items of the body (or of its `result_key` list), `.message` is None, and only the item being
+        decoded is held in memory. Streamed requests skip the cache and coalescing. Read the generator to the
+        end, or close it, before the thread sends another request. Only GETs can be streamed; `stream=True` with
+        any other `req_type` raises ValueError.
         """
-        # Might need to comment out this "blank" assignment -- it was added just to initialize the
-        # variable 'result' but may create problems to remove it.
-        result = requests.Response
+        if stream and req_type != 'get':
+            raise ValueError(f"Workato.api_request(): only GET requests can be streamed, not {req_type}.")
+        if stream:
+            return self._stream_request(target, url_params, payload, timeout, result_key)
+        if req_type == 'get' and self.flights is not None:
+            flight_key = ResponseCache.make_key(f"{self.api_root}{target}", url_params, payload, scope=[use_cache, timeout])
+            return self.flights.do(flight_key, self._api_request, req_type, target, url_params, payload, use_cache, timeout,
+                                   deadline=self.current_deadline())
+        return self._api_request(req_type, target, url_params, payload, use_cache, timeout)
+
+    def _api_request(self, req_type, target, url_params=None, payload=None, use_cache=True, timeout=None):
         target = f"{self.api_root}{target}"
+        cache_key, cached = None, None
+        headers = self.api_header
+        if req_type == 'get' and use_cache and self.cache is not None:
+            cache_key = self._cache_key(target, url_params, payload)
+            cached = self.cache.lookup(cache_key)
+            if cached is not None and cached.is_fresh():
+                return cached.to_response()
+            if cached is not None and cached.etag:
+                headers = {**self.api_header, 'If-None-Match': cached.etag}
         try:
             if req_type == 'get':
-                result = requests.get(target, headers=self.api_header, params=url_params, data=payload)
+                result = self._send('get', target, headers=headers, params=url_params, data=payload, timeout=timeout)
             elif req_type == 'post':
-                result = requests.post(target, headers=self.api_header, params=url_params, data=payload)
+                result = self._send('post', target, headers=self._write_headers(payload), params=url_params, data=payload, timeout=timeout)
             elif req_type == 'patch':
-                result = requests.patch(target, headers=self.api_header, params=url_params, data=payload)
+                result = self._send('patch', target, headers=self._write_headers(payload), params=url_params, data=payload, timeout=timeout)
             elif req_type == 'delete':
-                result = requests.delete(target, headers=self.api_header, params=url_params, data=payload)
+                result = self._send('delete', target, headers=self.api_header, params=url_params, data=payload, timeout=timeout)
             else:
                 raise Exception("Workato.api_request(): Invalid request type.")
+        except InternalOperationError:
+            raise
         except Exception as ex:
             raise InternalOperationError(ex)
-        else:
-            response = WorkatoResponse(result.status_code, result.headers, result.text, # "None", "Log message")
-                                   result.json() if result.status_code in [200, 201] else "None", 
-                                   generate_response_log_message(result))
+        if cache_key is not None:
+            if result.status_code == 304 and cached is not None:
+                return self.cache.refresh(cache_key, cached).to_response("Cached response revalidated (304).")
+            if result.status_code == 200:
+                self.cache.store(cache_key, target, result)
+        response = WorkatoResponse(result.status_code, result.headers, result.text, # "None", "Log message")
+                               result.json() if result.status_code in [200, 201] else "None", 
+                               generate_response_log_message(result))
         return response
     
+    def _stream_request(self, target, url_params, payload, timeout, result_key):
+        endpoint = endpoint_family(target)
+        try:
+            result = self._send('get', f"{self.api_root}{target}", headers=self.api_header, params=url_params, data=payload,
+                                stream=True, timeout=timeout)
+        except InternalOperationError:
+            raise
+        except Exception as ex:
+            raise InternalOperationError(ex)
+        if result.status_code not in [200, 201]:
+            return WorkatoResponse(result.status_code, result.headers, result.text, "None", generate_response_log_message(result))
+
+        def items():
+            received = 0
+
+            def chunks():
+                nonlocal received
+                for chunk in self._download_chunks(result, f"Workato.api_request(): {endpoint}"):
+                    received += len(chunk)
+                    yield chunk
+            body = chunks()
+            try:
+                yield from iter_json_items(body, result_key)
+                for _ in body:      # the rest of the object, so the connection can be reused
+                    pass
+            except ValueError as ex:
+                raise InternalOperationError(f"Workato.api_request(): {endpoint}: {ex}")
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+                self.metrics.record_bytes_in(endpoint, received)
+        return WorkatoResponse(result.status_code, result.headers, None, items(), generate_response_log_message(result))
+
+    #
+    # Paginated GET
+    def paginate(self, target, url_params=None, per_page=100, result_key='result', stream=False):
+        """
+        Generator over every item of a paginated list endpoint (eg. `/api/managed_users`), requesting pages of
+        `per_page` items until a short page comes back. Items are read from `result_key` in each page (or from
+        the page itself when it's a bare list). With `stream=True`, each page is decoded as it arrives (see
+        `api_request()`), so memory holds one item rather than one page. Raises InternalOperationError if a page
+        request fails.
+        """
+        page = 1
+        while True:
+            response = self.api_request('get', target, url_params={**(url_params or {}), 'page': page, 'per_page': per_page},
+                                        stream=stream, result_key=result_key)
+            if response.status_code not in [200, 201]:
+                raise InternalOperationError(f"Workato.paginate(): {target} page {page}: {response.log_message}")
+            if stream:
+                items = 0
+                for item in response.data:
+                    items += 1
+                    yield item
+            else:
+                found = response.data if isinstance(response.data, list) else response.data.get(result_key) or []
+                items = len(found)
+                yield from found
+            if items < per_page:
+                return None
+            page += 1
+
+    def list_workspaces(self, per_page=100, stream=False):
+        """Generator over every managed user workspace in the organization (see `paginate()` for `stream`)."""
+        return self.paginate("/api/managed_users", per_page=per_page, stream=stream)
+
+    def list_workspace_members(self, workspace_id=None, external_id=None, stream=False):
+        """
+        Returns the list of collaborators in a managed user workspace, identified by Workato ID or external ID;
+        with `stream=True`, a generator decoding them one at a time (see `api_request()`).
+        """
+        if workspace_id is None and external_id is None:
+            raise InternalOperationError("Workato.list_workspace_members(): no workspace or external ID provided.")
+        client_id = workspace_id if workspace_id is not None else f"E{external_id}"
+        response = self.api_request('get', f"/api/managed_users/{client_id}/members", stream=stream)
+        if response.status_code not in [200, 201]:
+            raise InternalOperationError(f"Workato.list_workspace_members(): {response.log_message}")
+        return response.data['result'] if isinstance(response.data, dict) else response.data
+
+    def list_export_manifests(self, workspace_id=None, external_id=None, folder_id=None):
+        """
+        Generator over the RLCM export manifests in a managed user workspace (identified by Workato ID or
+        external ID), optionally only those in the folder `folder_id`.
+        """
+        if workspace_id is None and external_id is None:
+            raise InternalOperationError("Workato.list_export_manifests(): no workspace or external ID provided.")
+        client_id = workspace_id if workspace_id is not None else f"E{external_id}"
+        return self.paginate(f"/api/managed_users/{client_id}/export_manifests",
+                             {'folder_id': folder_id} if folder_id is not None else None)
+
+    def list_recipes(self, workspace_id=None, external_id=None, per_page=100, stream=False):
+        """
+        Generator over the recipes in a managed user workspace, identified by Workato ID or external ID. Each
+        recipe comes as the API returns it, code included; see `recipe_record()` for a compact form, and
+        `paginate()` for `stream`.
+        """
+        if workspace_id is None and external_id is None:
+            raise InternalOperationError("Workato.list_recipes(): no workspace or external ID provided.")
+        client_id = workspace_id if workspace_id is not None else f"E{external_id}"
+        return self.paginate(f"/api/managed_users/{client_id}/recipes", per_page=per_page, stream=stream)
+
+    def list_connections(self, workspace_id=None, external_id=None, folder_id=None):
+        """
+        Returns the connections in a managed user workspace (identified by Workato ID or external ID), optionally
+        only those in the folder `folder_id`.
+        """
+        if workspace_id is None and external_id is None:
+            raise InternalOperationError("Workato.list_connections(): no workspace or external ID provided.")
+        client_id = workspace_id if workspace_id is not None else f"E{external_id}"
+        response = self.api_request('get', f"/api/managed_users/{client_id}/connections",
+                                    url_params={'folder_id': folder_id} if folder_id is not None else None)
+        if response.status_code not in [200, 201]:
+            raise InternalOperationError(f"Workato.list_connections(): {response.log_message}")
+        return response.data['result'] if isinstance(response.data, dict) else response.data
+
+    def crawl_inventory(self, workspaces=None, workers=8, progress=None):
+        """
+        Builds an Inventory of the recipes and connections in every workspace of `workspaces` (workspace dicts,
+        as yielded by `list_workspaces()`; default: every managed user workspace). Up to `workers` workspaces are
+        crawled at a time, at 'bulk' priority, and each recipe and connection is cut down to a compact record as
+        it arrives (see `recipe_record()` and `connection_record()`). A workspace that can't be read is
+        left out and its error kept in the inventory's `.errors`. A ProgressReporter passed as `progress`
+        counts the workspaces.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        with self.priority('bulk'):
+            workspaces = list(self.list_workspaces() if workspaces is None else workspaces)
+        if progress is not None and progress.total is None:
+            progress.total = len(workspaces)
+
+        def crawl(workspace):
+            if progress is not None:
+                progress.started(workspace['id'])
+            records, error = None, None
+            try:
+                with self.priority('bulk'):
+                    records = [recipe_record(recipe, workspace) for recipe in self.list_recipes(workspace['id'], stream=True)]
+                    records += [connection_record(connection, workspace) for connection in self.list_connections(workspace['id'])]
+            except InternalOperationError as ex:
+                error = ex.message
+            if progress is not None:
+                progress.finished(workspace['id'], ok=error is None)
+            return workspace, records, error
+
+        inventory = Inventory()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for workspace, records, error in pool.map(self.carry_deadline(crawl), workspaces):
+                if error is None:
+                    inventory.add(records)
+                else:
+                    inventory.errors[workspace['id']] = error
+        return inventory
+
+    def get_properties(self, workspace_id=None, external_id=None, prefix=''):
+        """
+        Returns a managed user workspace's environment properties as {name: value}, optionally only those whose
+        names start with `prefix`.
+        """
+        if workspace_id is None and external_id is None:
+            raise InternalOperationError("Workato.get_properties(): no workspace or external ID provided.")
+        client_id = workspace_id if workspace_id is not None else f"E{external_id}"
+        response = self.api_request('get', f"/api/managed_users/{client_id}/properties", url_params={'prefix': prefix})
+        if response.status_code not in [200, 201]:
+            raise InternalOperationError(f"Workato.get_properties(): {response.log_message}")
+        items = response.data['result'] if isinstance(response.data, dict) else response.data
+        return {item['name']: item['value'] for item in items}
+
+    def upsert_properties(self, properties, workspace_id=None, external_id=None):
+        """
+        Creates or updates environment properties ({name: value}) in a managed user workspace; properties not
+        named are left alone.
+        """
+        if workspace_id is None and external_id is None:
+            raise InternalOperationError("Workato.upsert_properties(): no workspace or external ID provided.")
+        client_id = workspace_id if workspace_id is not None else f"E{external_id}"
+        response = self.api_request('post', f"/api/managed_users/{client_id}/properties",
+                                    payload=json.dumps({'properties': properties}))
+        if response.status_code not in [200, 201]:
+            raise InternalOperationError(f"Workato.upsert_properties(): {response.log_message}")
+        return response.data
+
     #
     # SPECIALTY FUNCTIONS
 
@@ -120,7 +2186,9 @@ class Workato:
         target = f"{self.api_root}/api/managed_users"
         payload = {'name': workspace_name, 'external_id': external_id, 'notification_email': notification_email}
         try:
-            result = requests.post(target, headers={**self.api_header, "content-type": "application/json"}, data=json.dumps(payload))
+            result = self._send('post', target, headers={**self.api_header, "content-type": "application/json"}, data=json.dumps(payload))
+        except InternalOperationError:
+            raise
         except Exception as ex:
             raise InternalOperationError(ex)
         else:
@@ -146,7 +2214,9 @@ class Workato:
         payload = json.dumps({'name': name, 'email': email, 'role_name': role})
         try:
             #result = requests.post(target, headers={**self.api_header, "content-type": "application/json"}, data=payload)
-            result = requests.post(target, headers=self.api_header, data=payload)
+            result = self._send('post', target, headers=self.api_header, data=payload)
+        except InternalOperationError:
+            raise
         except Exception as ex:
             raise InternalOperationError(ex)
         else:
@@ -158,7 +2228,7 @@ class Workato:
     #
     # Export RLCM Package
     # (untested)
-    def export_package(self, manifest_id, workspace_id=None, external_id=None):
+    def export_package(self, manifest_id, workspace_id=None, external_id=None, timeout=None):
         """
         Method to initialize an export operation for a manifest in the Recipe Life Cycle Management
         console. The operation will trigger the export of the manifest's artifacts as a zip file. The
@@ -173,7 +2243,9 @@ class Workato:
             client_id = workspace_id if workspace_id is not None else f"E{external_id}"
         target = f"{self.api_root}/api/managed_users/{client_id}/exports/{manifest_id}"
         try:
-            result = requests.post(target, headers=self.api_header)
+            result = self._send('post', target, headers=self.api_header, timeout=timeout)
+        except InternalOperationError:
+            raise
         except Exception as ex:
             raise InternalOperationError(ex)
         else:
@@ -186,46 +2258,62 @@ class Workato:
     #
     # Get status of an active manifest export
     # (untested)
-    def get_export_status(self, package_id, workspace_id=None, external_id=None):
+    def get_export_status(self, package_id, workspace_id=None, external_id=None, timeout=None):
         """
         Monitor an ongoing manifest export operation. The method takes a package ID and either a Workato
         workspace ID or an external ID for the workspace the export is coming from. The method will query
-        the status every three seconds until it either reports the export is complete or throws an error.
+        the status every `poll_interval` seconds (three, by default) until it either reports the export is
+        complete or throws an error. Inside `deadline()`, it raises DeadlineExceeded rather than poll past it.
         """
         if workspace_id is None and external_id is None:
             raise InternalOperationError("Workato.get_export_status(): No workspace or external ID provided.")
         else:
             client_id = workspace_id if workspace_id is not None else f"E{external_id}"
         target = f"{self.api_root}/api/managed_users/{client_id}/exports/{package_id}"
+        started, polls = time.perf_counter(), 1
         try:
-            result = requests.get(target, headers=self.api_header)
+            result = self._send('get', target, headers=self.api_header, timeout=timeout)
             while result.status_code in [200, 201] and result.json()['status'] not in ['completed', 'failed', 'error', 'stopped']:
-                time.sleep(3)
-                result = requests.get(target, headers=self.api_header)
+                self._poll_wait("Workato.get_export_status()")
+                result = self._send('get', target, headers=self.api_header, timeout=timeout)
+                polls += 1
+        except InternalOperationError:
+            raise
         except Exception as ex:
             raise InternalOperationError(ex)
         else:
             response = WorkatoResponse(result.status_code, result.headers, result.text, 
                                 result.json()['result'] if result.status_code in [200, 201] else "None", 
                                 generate_response_log_message(result))
+        finally:
+            self.metrics.record_poll('export', time.perf_counter() - started, polls)
         return response
     
     #
     # Download RLCM Package
     # (untested)
-    def download_package(self, download_url, local_file):
+    def download_package(self, download_url, local_file, timeout=None):
         """
         This method facilitates downloading a package zip file to a specified local file once
         a manifest export operation has been completed. It must be supplied with the download
         URL provided from the package's status, and a name for the local file. It returns a
         simple log message confirming the package has been downloaded and repeating the local
-        file name.
+        file name. `timeout` (seconds, or a (connect, read) pair) overrides the client's for the download.
         """
         try:
-            data = requests.get(download_url, stream=True)
-            with open(local_file, 'wb') as of:
-                for chunk in data.iter_content(chunk_size=128):
-                    of.write(chunk)
+            data = self._send('get', download_url, stream=True, timeout=timeout)
+            received = 0
+            try:
+                with open(local_file, 'wb') as of:
+                    for chunk in self._download_chunks(data, "Workato.download_package()"):
+                        of.write(chunk)
+                        received += len(chunk)
+            finally:
+                if hasattr(data, 'close'):
+                    data.close()
+            self.metrics.record_bytes_in(endpoint_family(download_url), received)
+        except InternalOperationError:
+            raise
         except Exception as ex:
             raise InternalOperationError(ex)
         else:
@@ -235,7 +2323,7 @@ class Workato:
     #
     # Import RLCM Package
     # (untested)
-    def import_package(self, package_file, folder_id, restart=False, workspace_id=None, external_id=None):
+    def import_package(self, package_file, folder_id, restart=False, workspace_id=None, external_id=None, timeout=None):
         """
         This method initiates an import operation in the specified workspace. Like `export_package()`, this
         method only triggers the process; you must use `get_import_status()` to monitor the status of the
@@ -243,6 +2331,9 @@ class Workato:
         ID for the destination folder, and the workspace or external ID for the destination workspace. Optionally,
         you can also supply a `restart` parameter (boolean; defaults to `False`) if you would like to automatically
         restart recipes that are changed during the operation. Returns a WorkatoResponse object.
+
+        `package_file` is the path of the zip, or a binary file object positioned at its start (which is
+        uploaded from there and left open). `timeout` overrides the client's for the upload.
         """
         if workspace_id is None and external_id is None:
             raise InternalOperationError("Workato.import_package(): no workspace or external ID provided.")
@@ -251,8 +2342,11 @@ class Workato:
         target = f"{self.api_root}/api/managed_users/{client_id}/imports"
         parameters = { 'folder_id': folder_id, 'restart_recipes': restart }
         try:
-            package = open(package_file, 'rb')
-            result = requests.post(target, params=parameters, headers={**self.api_header, 'Content-Type': 'application/octet-stream'}, data=package)
+            with nullcontext(package_file) if hasattr(package_file, 'read') else open(package_file, 'rb') as package:
+                result = self._send('post', target, params=parameters, headers={**self.api_header, 'Content-Type': 'application/octet-stream'}, data=package,
+                                    timeout=timeout)
+        except InternalOperationError:
+            raise
         except Exception as ex:
             raise InternalOperationError(ex)
         else:
@@ -261,33 +2355,129 @@ class Workato:
                                        generate_response_log_message(result))
         return response
     
+    #
+    # Move a package from one workspace to another without writing it to disk
+    def transfer_package(self, download_url, folder_id, restart=False, workspace_id=None, external_id=None,
+                         spool_size=PACKAGE_SPOOL_SIZE, timeout=None):
+        """
+        Downloads an exported package (the `download_url` from `get_export_status()`) and starts importing it
+        into the destination folder, as `download_package()` followed by `import_package()` -- but the package
+        is held in memory between the two (spilling to an anonymous temporary file only past `spool_size`
+        bytes) instead of being written to and read back from a local file. Returns the import's
+        WorkatoResponse; use `get_import_status()` to follow it. `timeout` applies to the download and the upload.
+        """
+        if workspace_id is None and external_id is None:
+            raise InternalOperationError("Workato.transfer_package(): no workspace or external ID provided.")
+        try:
+            data = self._send('get', download_url, stream=True, timeout=timeout)
+            try:
+                if data.status_code not in [200, 201]:
+                    raise InternalOperationError(f"Workato.transfer_package(): download returned {data.status_code}.")
+                package = spool_stream(self._download_chunks(data, "Workato.transfer_package()"), spool_size)
+            finally:
+                if hasattr(data, 'close'):
+                    data.close()
+            self.metrics.record_bytes_in(endpoint_family(download_url), payload_size(package))
+        except InternalOperationError:
+            raise
+        except Exception as ex:
+            raise InternalOperationError(ex)
+        with package:
+            return self.import_package(package, folder_id, restart, workspace_id, external_id, timeout)
+
     #
     # Monitor status of manifest import
     # (untested)
-    def get_import_status(self, import_id, workspace_id = None, external_id = None):
+    def get_import_status(self, import_id, workspace_id = None, external_id = None, timeout=None):
         """
         Monitor the status of an import operation until the process finishes or fails. Requires the 
         import ID for the operation (from `import_package()`) and either the workspace ID or external
-        ID. Returns a WorkatoResponse object.
+        ID. Returns a WorkatoResponse object. Inside `deadline()`, it raises DeadlineExceeded rather than
+        poll past it.
         """
         if workspace_id is None and external_id is None:
             raise InternalOperationError("Workato.get_import_status(): no workspace or external ID provided.")
         else:
             client_id = workspace_id if workspace_id is not None else f"E{external_id}"
         target = f"{self.api_root}/api/managed_users/{client_id}/imports/{import_id}"
+        started, polls = time.perf_counter(), 1
         try:
-            result = requests.get(target, headers=self.api_header)
+            result = self._send('get', target, headers=self.api_header, timeout=timeout)
             while result.status_code in [200, 201] and result.json()['status'] not in ['completed', 'failed', 'error']:
-                time.sleep(3)
-                result = requests.get(target, headers=self.api_header)
+                self._poll_wait("Workato.get_import_status()")
+                result = self._send('get', target, headers=self.api_header, timeout=timeout)
+                polls += 1
+        except InternalOperationError:
+            raise
         except Exception as ex:
             raise InternalOperationError(ex)
         else:
             response = WorkatoResponse(result.status_code, result.headers, result.text, 
                                 result.json() if result.status_code in [200, 201] else "None", 
                                 generate_response_log_message(result))
+        finally:
+            self.metrics.record_poll('import', time.perf_counter() - started, polls)
         return response
     
+    def watch_export(self, package_id, workspace_id=None, external_id=None, callback=None, timeout=None):
+        """
+        The non-blocking form of `get_export_status()`: returns a Future for the export's final status, with
+        the status checks made by the client's shared OperationWatcher. See `OperationWatcher.watch()`.
+        """
+        return self.watcher.watch('export', package_id, workspace_id, external_id, callback, timeout)
+
+    def watch_import(self, import_id, workspace_id=None, external_id=None, callback=None, timeout=None):
+        """
+        The non-blocking form of `get_import_status()`: returns a Future for the import's final status, with
+        the status checks made by the client's shared OperationWatcher. See `OperationWatcher.watch()`.
+        """
+        return self.watcher.watch('import', import_id, workspace_id, external_id, callback, timeout)
+
+    #
+    # Import a package only where it changes something
+    def import_package_if_changed(self, package_file, folder_id, record, restart=False, workspace_id=None,
+                                  external_id=None, trim=True):
+        """
+        Compares the package's assets with what `record` (a DeploymentRecord) says was last deployed to the
+        destination folder. If nothing differs, no request is made and the response has status 304 and data
+        {'status': 'unchanged', 'diff': ...}. Otherwise the package -- trimmed to its new and changed assets
+        when `trim` is set -- is imported and, once `get_import_status()` reports it completed, recorded as
+        deployed. The returned response is the final import status, with the diff added to its data.
+        """
+        if workspace_id is None and external_id is None:
+            raise InternalOperationError("Workato.import_package_if_changed(): no workspace or external ID provided.")
+        else:
+            client_id = workspace_id if workspace_id is not None else f"E{external_id}"
+        assets = self.offload(package_assets, package_file)
+        diff = diff_assets(assets, record.deployed(client_id, folder_id))
+        if not diff['added'] and not diff['changed']:
+            return WorkatoResponse(304, {}, "No changes to import.", {'status': 'unchanged', 'diff': diff},
+                                   f"Skipped import into {client_id} folder {folder_id}: nothing changed.")
+        upload_file = package_file
+        if trim and diff['unchanged']:
+            # each import gets its own trimmed copy: plan steps may be importing the same download at once
+            import tempfile
+            descriptor, trimmed_file = tempfile.mkstemp(suffix='.zip', dir=os.path.dirname(os.path.abspath(package_file)))
+            os.close(descriptor)
+            try:
+                upload_file = self.offload(trim_package, package_file, set(diff['added'] + diff['changed']), trimmed_file)
+            except BaseException:
+                os.remove(trimmed_file)
+                raise
+        try:
+            started = self.import_package(upload_file, folder_id, restart, workspace_id=client_id)
+            if started.status_code not in [200, 201]:
+                return started
+            response = self.get_import_status(started.data['id'], workspace_id=client_id)
+        finally:
+            if upload_file != package_file:
+                os.remove(upload_file)
+        if response.status_code in [200, 201] and response.data['status'] == 'completed':
+            record.update(client_id, folder_id, assets)
+        if isinstance(response.data, dict):
+            response.data['diff'] = diff
+        return response
+
     #
     # Start or stop a specific recipe
     # (untested)
@@ -303,11 +2493,1388 @@ class Workato:
             client_id = workspace_id if workspace_id is not None else f"E{external_id}"
         target = f"{self.api_root}/api/managed_users/{client_id}/recipes/{recipe_id}/{operation}"
         try:
-            result = requests.put(target, headers=self.api_header)
+            result = self._send('put', target, headers=self.api_header)
+        except InternalOperationError:
+            raise
         except Exception as ex:
             raise InternalOperationError(ex)
         else:
             response = WorkatoResponse(result.status_code, result.headers, result.text,
                                        result.json() if result.status_code in [200, 201] else "None",
                                        generate_response_log_message(result))
-        return response
\ No newline at end of file
+        return response
+
+#
+# OPERATION WATCHING CLASSES
+# [completion of many exports and imports, from one shared polling scheduler or pushed notifications]
+
+class WatchedOperation:
+    def __init__(self, kind, operation_id, client_id, future, interval, expires=None):
+        self.kind = kind                    # 'export' or 'import'
+        self.operation_id = operation_id
+        self.client_id = client_id          # workspace ID, or "E<external_id>"
+        self.future = future
+        self.started = time.monotonic()
+        self.next_check = self.started + interval
+        self.interval = interval            # grows with each check that finds the operation still running
+        self.expires = expires
+        self.polls = 0
+        self.errors = 0
+
+class OperationWatcher:
+    def __init__(self, client, interval=None, max_interval=30, checks_per_interval=10, workers=4, max_errors=3,
+                 source=None, poll=True):
+        """
+        Waits on many export and import operations at once. `watch()` returns a Future for each operation, and a
+        single scheduler thread checks their status on behalf of all of them: at most `checks_per_interval`
+        requests (over up to `workers` threads) every `interval` seconds (default: the client's `poll_interval`),
+        the longest-waiting operations first. Each operation is checked less often the longer it runs, its
+        interval doubling up to `max_interval` seconds, so waiting on hundreds of long imports costs a handful
+        of requests per interval rather than one per operation.
+
+        Completions can also be pushed: anything can call `notify()` with an operation's status, and a `source`
+        (eg. a WebhookListener; anything with `start(notify)` and `stop()`) is started with the watcher and
+        stopped with it. With `poll=False` the watcher relies on notifications alone.
+        """
+        self.client = client
+        self.interval = interval
+        self.max_interval = max_interval
+        self.checks_per_interval = checks_per_interval
+        self.workers = workers
+        self.max_errors = max_errors
+        self.source = source
+        self.poll = poll
+        self.lock = threading.Condition()
+        self.watched = {}                   # (kind, operation ID) -> WatchedOperation
+        self.notified = OrderedDict()       # finished operations notified before they were watched
+        self.thread = None
+        self.stopping = False
+
+    def watch(self, kind, operation_id, workspace_id=None, external_id=None, callback=None, timeout=None):
+        """
+        Starts watching an export (by package ID) or import (by import ID) in a managed user workspace. Returns a
+        concurrent.futures.Future for the final status, as the WorkatoResponse `get_export_status()` or
+        `get_import_status()` would return (`asyncio.wrap_future()` makes it awaitable). `callback`, if given,
+        is called with the future once it is done. After `timeout` seconds the future fails with
+        DeadlineExceeded, and after `max_errors` failed status checks in a row with InternalOperationError.
+        Checks answered with 429 or a 5xx (or refused by an open circuit) don't count as failures: the
+        operation is checked again later, after any Retry-After and with its interval doubling.
+        """
+        from concurrent.futures import Future
+        if kind not in ['export', 'import']:
+            raise InternalOperationError(f"OperationWatcher.watch(): unknown operation kind '{kind}'.")
+        if workspace_id is None and external_id is None:
+            raise InternalOperationError("OperationWatcher.watch(): no workspace or external ID provided.")
+        client_id = workspace_id if workspace_id is not None else f"E{external_id}"
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        interval = self.interval if self.interval is not None else self.client.poll_interval
+        operation = WatchedOperation(kind, str(operation_id), client_id, future, interval,
+                                     time.monotonic() + timeout if timeout is not None else None)
+        with self.lock:
+            status = self.notified.pop((kind, str(operation_id)), None)
+            if status is None:
+                self.watched[(kind, str(operation_id))] = operation
+                self._start()
+                self.lock.notify_all()
+        if status is not None:
+            self._finish(operation, status, "Completion notified before the operation was watched.")
+        return future
+
+    def notify(self, kind, operation_id, status):
+        """
+        Reports an operation's status (a dict shaped like the API's status response) without a status request.
+        A finished status completes the operation's future, even if it is only watched later.
+        """
+        status = (status.get('result') or status) if kind == 'export' else status
+        if status.get('status') not in self._finished_states(kind):
+            return None
+        with self.lock:
+            operation = self.watched.pop((kind, str(operation_id)), None)
+            if operation is None:
+                self.notified[(kind, str(operation_id))] = status
+                while len(self.notified) > 1000:
+                    self.notified.popitem(last=False)
+                return None
+        self._finish(operation, status, "Completion notified.")
+        return None
+
+    def pending(self):
+        with self.lock:
+            return len(self.watched)
+
+    def stop(self):
+        """Stops the scheduler thread and the notification source; operations still watched are left pending."""
+        with self.lock:
+            self.stopping = True
+            self.lock.notify_all()
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            thread.join()
+            if self.source is not None:
+                self.source.stop()
+        self.stopping = False
+
+    def _start(self):
+        # called with the lock held
+        if self.thread is None:
+            if self.source is not None:
+                self.source.start(self.notify)
+            self.thread = threading.Thread(target=self._run, name='operation-watcher', daemon=True)
+            self.thread.start()
+
+    def _finished_states(self, kind):
+        return ['completed', 'failed', 'error', 'stopped'] if kind == 'export' else ['completed', 'failed', 'error']
+
+    def _finish(self, operation, status, log_message):
+        seconds = time.monotonic() - operation.started
+        if operation.polls:
+            self.client.metrics.record_poll(operation.kind, seconds, operation.polls)
+        if not operation.future.done():
+            operation.future.set_result(WorkatoResponse(200, {}, json.dumps(status, default=str), status, log_message))
+
+    def _fail(self, operation, error):
+        if not operation.future.done():
+            operation.future.set_exception(error)
+
+    def _due(self):
+        # waits for the next round, then takes its operations off the watch list (called with the lock held)
+        interval = self.interval if self.interval is not None else self.client.poll_interval
+        while not self.stopping:
+            now = time.monotonic()
+            for key, operation in list(self.watched.items()):
+                if operation.expires is not None and now >= operation.expires:
+                    del self.watched[key]
+                    self._fail(operation, DeadlineExceeded(
+                        f"OperationWatcher: {operation.kind} {operation.operation_id} did not finish in time."))
+            if not self.watched:
+                self.lock.wait()
+                continue
+            due = sorted((o for o in self.watched.values() if o.next_check <= now), key=lambda o: o.next_check)
+            if self.poll and due:
+                return due[:self.checks_per_interval], now + interval
+            waits = [o.expires for o in self.watched.values() if o.expires is not None]
+            if self.poll:
+                waits.append(min(o.next_check for o in self.watched.values()))
+            self.lock.wait(max(0.0, min(waits) - now) if waits else None)
+        return [], None
+
+    def _run(self):
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                with self.lock:
+                    due, next_round = self._due()
+                if not due:
+                    return None
+                for operation, checked in zip(due, pool.map(self._check, due)):
+                    self._checked(operation, *checked)
+                with self.lock:
+                    while not self.stopping and time.monotonic() < next_round:
+                        self.lock.wait(next_round - time.monotonic())
+
+    def _check(self, operation):
+        # one status request; returns (finished status, or the response if it was refused, or None; error or None;
+        # seconds to wait before retrying a throttled or failing server, or None)
+        operation.polls += 1
+        try:
+            response = self.client.api_request('get', f"/api/managed_users/{operation.client_id}/{operation.kind}s/{operation.operation_id}",
+                                               use_cache=False)
+        except CircuitOpenError as ex:
+            return None, None, ex.retry_in or 0.0
+        except InternalOperationError as ex:
+            return None, ex, None
+        if response.status_code == 429 or response.status_code >= 500:
+            try:
+                return None, None, float((response.header or {}).get('Retry-After') or 0)
+            except ValueError:
+                return None, None, 0.0
+        if response.status_code not in [200, 201]:
+            return response, None, None
+        status = (response.data.get('result') or response.data) if operation.kind == 'export' else response.data
+        return (status if status.get('status') in self._finished_states(operation.kind) else None), None, None
+
+    def _checked(self, operation, status, error, retry_in):
+        key = (operation.kind, operation.operation_id)
+        with self.lock:
+            if self.watched.get(key) is not operation:
+                return None         # notified while the check was in flight
+            if retry_in is not None:
+                # throttled or server-side trouble: back off without counting it against the operation
+                operation.interval = min(operation.interval * 2, self.max_interval)
+                operation.next_check = time.monotonic() + max(retry_in, operation.interval)
+                return None
+            operation.errors = operation.errors + 1 if error is not None else 0
+            if status is None and (error is None or operation.errors < self.max_errors):
+                operation.interval = min(operation.interval * 2, self.max_interval) if error is None else operation.interval
+                operation.next_check = time.monotonic() + operation.interval
+                return None
+            del self.watched[key]
+        if isinstance(status, WorkatoResponse):
+            self.client.metrics.record_poll(operation.kind, time.monotonic() - operation.started, operation.polls)
+            operation.future.set_result(status)
+        elif status is not None:
+            self._finish(operation, status, f"{operation.kind.title()} {operation.operation_id} {status['status']}.")
+        else:
+            self._fail(operation, error)
+        return None
+
+class WebhookListener:
+    def __init__(self, host='127.0.0.1', port=0, path='/operations'):
+        """
+        A notification source for OperationWatcher: a small HTTP server that takes POSTed operation statuses --
+        JSON shaped like the API's status response, with 'operation_type' ('export' or 'import'), 'id' and
+        'status' -- eg. from a recipe that calls back when a deployment finishes. `.url` is set once started.
+        """
+        self.host = host
+        self.port = port
+        self.path = path
+        self.server = None
+        self.url = None
+
+    def start(self, notify):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        listener = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                return None
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                try:
+                    status = json.loads(body)
+                    status = status.get('result') or status
+                    kind, operation_id = status['operation_type'], status['id']
+                except (ValueError, KeyError, AttributeError):
+                    kind = None
+                if self.path != listener.path:
+                    self.send_response(404)
+                elif kind is None:
+                    self.send_response(400)
+                else:
+                    notify(kind, operation_id, status)
+                    self.send_response(204)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{self.host}:{self.server.server_address[1]}{self.path}"
+        threading.Thread(target=self.server.serve_forever, name='webhook-listener', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+#
+# FLEET CLASSES
+# [several regional Workato clients driven as one]
+
+class WorkatoFleet:
+    def __init__(self, tokens, rate_limits=None, **client_options):
+        """
+        Holds one Workato client per region, each with its own connection pools and rate limiter. `tokens` maps
+        region codes (see API_ENVIRONMENTS) to API tokens; `rate_limits` is either one requests-per-second figure
+        applied to each region separately or a dict of them by region. Any other keyword arguments (cache,
+        metrics, poll_interval...) are passed to every client.
+        """
+        self.clients = {}
+        for region, token in tokens.items():
+            limit = rate_limits.get(region) if isinstance(rate_limits, dict) else rate_limits
+            self.clients[region] = Workato(region, token, rate_limit=limit, **client_options)
+
+    @contextmanager
+    def deadline(self, seconds):
+        """
+        `Workato.deadline()` for the whole fleet: everything the current thread does through any region's client
+        inside the `with` block shares one deadline of `seconds`, including `run()`, `stream()` and `audit()`.
+        """
+        from contextlib import ExitStack
+        deadline = seconds if isinstance(seconds, Deadline) else Deadline(seconds)
+        with ExitStack() as stack:
+            for client in self.clients.values():
+                stack.enter_context(client.deadline(deadline))
+            yield deadline
+
+    def _operation(self, operation):
+        # operations are callables taking a client first, or the name of a Workato method
+        if isinstance(operation, str):
+            return lambda client, *args, **kwargs: getattr(client, operation)(*args, **kwargs)
+        return operation
+
+    def run(self, operation, *args, regions=None, return_exceptions=False, **kwargs):
+        """
+        Runs `operation` against every region's client at once and returns {region: result}. If a region fails,
+        the other regions still finish; the first error is then raised as an InternalOperationError -- or, with
+        `return_exceptions=True`, stored as that region's result.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        operation = self._operation(operation)
+        selected = regions or list(self.clients)
+        results, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=len(selected)) as pool:
+            futures = {region: pool.submit(self.clients[region].carry_deadline(operation), self.clients[region], *args, **kwargs)
+                       for region in selected}
+            for region, future in futures.items():
+                try:
+                    results[region] = future.result()
+                except Exception as ex:
+                    errors[region] = results[region] = ex
+        if errors and not return_exceptions:
+            region, error = next(iter(errors.items()))
+            raise InternalOperationError(f"WorkatoFleet.run(): {region}: {error}")
+        return results
+
+    def stream(self, operation, *args, regions=None, return_exceptions=False, **kwargs):
+        """
+        Runs an operation that returns (or yields) many items against every region at once and yields
+        (region, item) pairs as they arrive from any region, so results can be consumed as one merged stream.
+        Errors behave as in `run()`: raised once every region has finished, or yielded as (region, exception).
+        """
+        import queue
+        from concurrent.futures import ThreadPoolExecutor
+        operation = self._operation(operation)
+        selected = regions or list(self.clients)
+        merged, done, stopped = queue.Queue(maxsize=1000), object(), threading.Event()
+        errors = {}
+
+        def put(entry):
+            # bounded, so a fast region can't run far ahead of the consumer; gives up once the consumer is gone
+            while not stopped.is_set():
+                try:
+                    merged.put(entry, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce(region):
+            try:
+                for item in operation(self.clients[region], *args, **kwargs):
+                    if not put((region, item)):
+                        return None
+            except Exception as ex:
+                errors[region] = ex
+                if return_exceptions:
+                    put((region, ex))
+            finally:
+                put((region, done))
+
+        with ThreadPoolExecutor(max_workers=len(selected)) as pool:
+            for region in selected:
+                pool.submit(self.clients[region].carry_deadline(produce), region)
+            remaining = len(selected)
+            try:
+                while remaining:
+                    region, item = merged.get()
+                    if item is done:
+                        remaining -= 1
+                    else:
+                        yield region, item
+            finally:
+                stopped.set()
+        if errors and not return_exceptions:
+            region, error = next(iter(errors.items()))
+            raise InternalOperationError(f"WorkatoFleet.stream(): {region}: {error}")
+
+    def list_workspaces(self, regions=None):
+        """Yields (region, workspace) for every managed user workspace in every region."""
+        return self.stream(lambda client: client.list_workspaces(), regions=regions)
+
+    def audit(self, regions=None, workers=4):
+        """
+        The access audit crawl across regions: yields (region, workspace, members) for every managed user
+        workspace, fetching members for up to `workers` workspaces at a time within each region. The crawl is
+        sent at 'bulk' priority.
+        """
+        def workspace_members(client, workspace):
+            with client.priority('bulk'):
+                return client.list_workspace_members(workspace['id'])
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        def crawl(client):
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                with client.priority('bulk'):
+                    workspaces = list(client.list_workspaces())
+                fetch = client.carry_deadline(lambda ws: workspace_members(client, ws))
+                for workspace, found in zip(workspaces, pool.map(fetch, workspaces)):
+                    yield workspace, found
+        for region, (workspace, members) in self.stream(crawl, regions=regions):
+            yield region, workspace, members
+
+    def roles(self, regions=None):
+        """Returns {region: list of roles} for every region."""
+        def get_roles(client):
+            response = client.api_request('get', '/api/roles')
+            if response.status_code not in [200, 201]:
+                raise InternalOperationError(f"WorkatoFleet.roles(): {response.log_message}")
+            return response.data
+        return self.run(get_roles, regions=regions)
+
+
+#
+# DEPLOYMENT PLAN CLASSES
+# [declarative, dependency-aware execution of many RLCM deployments]
+
+class PlanStep:
+    def __init__(self, step_id, action, run, depends_on=(), details=None, calls=()):
+        """
+        One unit of work in a plan: `run` is a callable taking no arguments whose return value becomes the
+        step's result; it raises to fail the step. `depends_on` lists the IDs of steps that must succeed first.
+        `calls` describes the requests the step will send, in order, as (method, endpoint family, poll) tuples --
+        `poll` names the status operation ('export', 'import') for requests repeated until an operation ends --
+        so that `ScheduleSimulator` can estimate a plan without running it.
+        """
+        self.id = step_id
+        self.action = action
+        self.run = run
+        self.depends_on = list(depends_on)
+        self.details = details or {}
+        self.calls = list(calls)
+        self.status = 'pending'
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+
+    def report(self):
+        return {'id': self.id, 'action': self.action, 'status': self.status, 'depends_on': self.depends_on,
+                'details': self.details, 'error': self.error,
+                'seconds': round(self.finished - self.started, 3) if self.finished and self.started else None}
+
+class StepScheduler:
+    def __init__(self, steps, max_workers=8, context=None):
+        """
+        Runs a DAG of PlanSteps with up to `max_workers` at a time, starting every step as soon as its
+        dependencies have succeeded (longest remaining chain first). When a step fails, everything that depends
+        on it is skipped and everything else carries on. `context`, if given, is called with each step for a
+        context manager to run it in (eg. one entering a client's `priority()`).
+        """
+        self.steps = {step.id: step for step in steps}
+        self.max_workers = max_workers
+        self.context = context
+        for step in steps:
+            for dep in step.depends_on:
+                if dep not in self.steps:
+                    raise InternalOperationError(f"StepScheduler: step {step.id} depends on unknown step {dep}.")
+        self.chain = {}
+        for step_id in self.steps:
+            self._chain_length(step_id, set())
+
+    def _chain_length(self, step_id, visiting):
+        # length of the longest chain of steps waiting on this one; also detects cycles
+        if step_id in self.chain:
+            return self.chain[step_id]
+        if step_id in visiting:
+            raise InternalOperationError(f"StepScheduler: dependency cycle through step {step_id}.")
+        visiting.add(step_id)
+        dependents = [s.id for s in self.steps.values() if step_id in s.depends_on]
+        self.chain[step_id] = 1 + max((self._chain_length(d, visiting) for d in dependents), default=0)
+        visiting.discard(step_id)
+        return self.chain[step_id]
+
+    def _execute(self, step):
+        step.started = time.time()
+        try:
+            if self.context is not None:
+                with self.context(step):
+                    step.result = step.run()
+            else:
+                step.result = step.run()
+            step.status = 'succeeded'
+        except Exception as ex:
+            step.status = 'failed'
+            step.error = ex.message if isinstance(ex, InternalOperationError) and isinstance(ex.message, str) else str(ex)
+        step.finished = time.time()
+        return step
+
+    def run(self, on_step=None):
+        """Runs every step and returns them by ID. `on_step` is called with each step as it finishes."""
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+        pending = dict(self.steps)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for step in list(pending.values()):
+                    if any(self.steps[d].status in ['failed', 'skipped'] for d in step.depends_on):
+                        step.status = 'skipped'
+                        step.error = "A step it depends on did not succeed."
+                        del pending[step.id]
+                        if on_step is not None:
+                            on_step(step)
+                ready = [s for s in pending.values() if all(self.steps[d].status == 'succeeded' for d in s.depends_on)]
+                for step in sorted(ready, key=lambda s: -self.chain[s.id]):
+                    step.status = 'running'
+                    running[pool.submit(self._execute, step)] = step
+                    del pending[step.id]
+                if not running:
+                    break
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    if on_step is not None:
+                        on_step(step)
+        return self.steps
+
+def load_plan(plan_file):
+    """
+    Reads a deployment plan from a JSON or YAML file (YAML needs PyYAML installed).
+    """
+    with open(plan_file, 'r') as pf:
+        if plan_file.endswith(('.yml', '.yaml')):
+            try:
+                import yaml
+            except ImportError:
+                raise InternalOperationError("load_plan(): PyYAML is required to read YAML plans (or use JSON).")
+            return yaml.safe_load(pf)
+        return json.load(pf)
+
+class DeploymentPlan:
+    def __init__(self, plan, client, workdir=None):
+        """
+        Turns a plan (see `load_plan()`) into a DAG of steps run through `client`. A plan looks like:
+
+            {"max_workers": 8,
+             "deployments": [
+                {"name": "client-9000",
+                 "source": {"workspace": "E9000_DEV", "manifest": 123},      # or "package": <package_id>
+                 "destinations": [
+                    {"workspace": "E9000", "folder": 111, "restart": true,
+                     "properties": {"from": "E9000_DEV", "prefix": "acme_"},  # or {"values": {...}}
+                     "restart_recipes": [1, 2]}],
+                 "depends_on": ["other-deployment"]}],
+             "workspaces": [
+                {"name": "Acme", "external_id": "9000", "notification_email": "ops@acme.com"}]}
+
+        Each distinct source is exported and downloaded once, however many deployments use it. For each
+        destination, properties are synced before the import, and listed recipes are restarted after it. Each of
+        "workspaces" (optional) is a managed user workspace to create, and steps that name it as "E<external_id>"
+        wait for it to be created. With "record": "<file>" in the plan, imports go through
+        `Workato.import_package_if_changed()`, so destinations already holding the same assets are skipped (along
+        with their recipe restarts).
+
+        Downloads go to `workdir`; without one, the plan makes a temporary directory, which `close()` (or
+        leaving a `with` block) deletes.
+        """
+        self.plan = plan
+        self.client = client
+        self.owns_workdir = workdir is None
+        if workdir is None:
+            import tempfile
+            workdir = tempfile.mkdtemp(prefix='workato_plan_')
+        self.workdir = workdir
+        self.record = DeploymentRecord(plan['record']) if plan.get('record') else None
+        self.steps = []
+        self._build()
+
+    def close(self):
+        if self.owns_workdir:
+            import shutil
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def _source_key(self, source):
+        kind = 'manifest' if 'manifest' in source else 'package'
+        return f"download:{source['workspace']}:{kind}:{source[kind]}"
+
+    def _build(self):
+        downloads, finals, imports = {}, {}, {}
+        names, created = set(), {}
+        for workspace in self.plan.get('workspaces', []):
+            key = f"E{workspace['external_id']}"
+            if key in created:
+                raise InternalOperationError(f"DeploymentPlan: workspace {key} is created twice.")
+            created[key] = PlanStep(f"create:{key}", 'create_workspace', self._create_step(workspace),
+                                    details={'name': workspace['name'], 'external_id': workspace['external_id']},
+                                    calls=[('post', '/api/managed_users', None)])
+            self.steps.append(created[key])
+        for deployment in self.plan.get('deployments', []):
+            name = deployment['name']
+            if name in names:
+                raise InternalOperationError(f"DeploymentPlan: duplicate deployment name {name}.")
+            names.add(name)
+            source = deployment['source']
+            download_id = self._source_key(source)
+            if download_id not in downloads:
+                downloads[download_id] = PlanStep(download_id, 'download', self._download_step(source),
+                                                  details={'source': source}, calls=self._download_calls(source))
+                self.steps.append(downloads[download_id])
+            finals[name], imports[name] = [], []
+            if str(source['workspace']) in created:
+                downloads[download_id].depends_on.append(created[str(source['workspace'])].id)
+            for dest in deployment.get('destinations', []):
+                depends = [download_id]
+                if str(dest['workspace']) in created:
+                    depends.append(created[str(dest['workspace'])].id)
+                if dest.get('properties'):
+                    props = PlanStep(f"properties:{name}:{dest['workspace']}", 'properties',
+                                     self._properties_step(dest['workspace'], dest['properties']),
+                                     details={'workspace': dest['workspace']},
+                                     calls=self._properties_calls(dest['properties']))
+                    self.steps.append(props)
+                    depends.append(props.id)
+                step = PlanStep(f"import:{name}:{dest['workspace']}", 'import',
+                                self._import_step(downloads[download_id], dest), depends,
+                                details={'workspace': dest['workspace'], 'folder': dest['folder']},
+                                calls=[('post', '/api/managed_users/:id/imports', None),
+                                       ('get', '/api/managed_users/:id/imports/:id', 'import')])
+                self.steps.append(step)
+                imports[name].append(step)
+                final = step
+                if dest.get('restart_recipes'):
+                    final = PlanStep(f"restart:{name}:{dest['workspace']}", 'restart_recipes',
+                                     self._restart_step(step, dest['workspace'], dest['restart_recipes']), [step.id],
+                                     details={'workspace': dest['workspace'], 'recipes': dest['restart_recipes']},
+                                     calls=[('put', f"/api/managed_users/:id/recipes/:id/{operation}", None)
+                                            for _ in dest['restart_recipes'] for operation in ['stop', 'start']])
+                    self.steps.append(final)
+                finals[name].append(final.id)
+        for deployment in self.plan.get('deployments', []):
+            for other in deployment.get('depends_on', []):
+                if other not in finals:
+                    raise InternalOperationError(f"DeploymentPlan: {deployment['name']} depends on unknown deployment {other}.")
+                for step in imports[deployment['name']]:
+                    step.depends_on += finals[other]
+
+    #
+    # Requests each step sends (for dry runs)
+
+    def _download_calls(self, source):
+        calls = [('post', '/api/managed_users/:id/exports/:id', None)] if 'manifest' in source else []
+        return calls + [('get', '/api/managed_users/:id/exports/:id', 'export'), ('get', 'download', None)]
+
+    def _properties_calls(self, properties):
+        calls = [('get', '/api/managed_users/:id/properties', None)] if 'from' in properties else []
+        return calls + [('post', '/api/managed_users/:id/properties', None)]
+
+    #
+    # Step bodies
+
+    def _create_step(self, workspace):
+        def run():
+            response = self.client.create_workspace(workspace['name'], workspace['external_id'], workspace['notification_email'])
+            if response.status_code not in [200, 201]:
+                raise InternalOperationError(f"Creating workspace E{workspace['external_id']} failed: {response.message}")
+            return {'workspace_id': response.data.get('id')}
+        return run
+
+    def _download_step(self, source):
+        def run():
+            workspace = source['workspace']
+            package_id = source.get('package')
+            if 'manifest' in source:
+                export = self.client.export_package(source['manifest'], workspace_id=workspace)
+                if export.status_code not in [200, 201]:
+                    raise InternalOperationError(f"Export failed: {export.log_message}")
+                package_id = export.data['id']
+            status = self.client.get_export_status(package_id, workspace_id=workspace)
+            if status.status_code not in [200, 201] or status.data.get('status') != 'completed':
+                raise InternalOperationError(f"Export {package_id} did not complete: {status.message}")
+            local_file = os.path.join(self.workdir, f"{workspace}_{package_id}.zip")
+            self.client.download_package(status.data['download_url'], local_file)
+            return local_file
+        return run
+
+    def _properties_step(self, workspace, properties):
+        def run():
+            values = dict(properties.get('values', {}))
+            if 'from' in properties:
+                values = {**self.client.get_properties(properties['from'], prefix=properties.get('prefix', '')), **values}
+            self.client.upsert_properties(values, workspace_id=workspace)
+            return {'properties': len(values)}
+        return run
+
+    def _import_step(self, download, dest):
+        def run():
+            if self.record is not None:
+                finished = self.client.import_package_if_changed(download.result, dest['folder'], self.record,
+                                                                 dest.get('restart', False), workspace_id=dest['workspace'])
+                if finished.status_code == 304:
+                    return {'unchanged': True}
+                if finished.status_code not in [200, 201] or finished.data.get('status') != 'completed':
+                    raise InternalOperationError(f"Import did not complete: {finished.message}")
+                return {'import_id': finished.data['id'], 'recipe_status': finished.data.get('recipe_status'),
+                        'changed': len(finished.data['diff']['added'] + finished.data['diff']['changed'])}
+            started = self.client.import_package(download.result, dest['folder'], dest.get('restart', False),
+                                                 workspace_id=dest['workspace'])
+            if started.status_code not in [200, 201]:
+                raise InternalOperationError(f"Import failed to start: {started.log_message}")
+            finished = self.client.get_import_status(started.data['id'], workspace_id=dest['workspace'])
+            if finished.status_code not in [200, 201] or finished.data.get('status') != 'completed':
+                raise InternalOperationError(f"Import {started.data['id']} did not complete: {finished.message}")
+            return {'import_id': started.data['id'], 'recipe_status': finished.data.get('recipe_status')}
+        return run
+
+    def _restart_step(self, imported, workspace, recipes):
+        def run():
+            if imported.result.get('unchanged'):
+                return {'restarted': 0}
+            for recipe_id in recipes:
+                for operation in ['stop', 'start']:
+                    response = self.client.recipe_start_stop(operation, recipe_id, workspace_id=workspace)
+                    if response.status_code not in [200, 201]:
+                        raise InternalOperationError(f"Recipe {recipe_id} {operation} failed: {response.log_message}")
+            return {'restarted': len(recipes)}
+        return run
+
+    def execute(self, max_workers=None, on_step=None, priority='high', log=None, progress=None, deadline=None):
+        """
+        Runs the plan and returns a report: one entry per step with its status, timing and any error. Requests
+        are sent at `priority` (see `Workato.priority()`), so a deploy goes ahead of bulk crawls sharing the client.
+        Each finished step is also recorded in `log` (an OperationLog), and counted in `progress` (a
+        ProgressReporter, whose total is set to the number of steps), if given. With a `deadline` (seconds, or
+        a Deadline; by default the one the calling thread is running under, if any), steps still running when it
+        passes fail with DeadlineExceeded and the steps after them are skipped.
+        """
+        deadline = deadline if deadline is not None else self.client.current_deadline()
+        if deadline is not None and not isinstance(deadline, Deadline):
+            deadline = Deadline(deadline)
+
+        @contextmanager
+        def running(step):
+            with self.client.priority(priority), self.client.deadline(deadline) if deadline is not None else nullcontext():
+                if progress is None:
+                    yield
+                else:
+                    with progress.item(step.id):
+                        yield
+
+        if progress is not None and progress.total is None:
+            progress.total = len(self.steps)
+        def finished(step):
+            if progress is not None and step.status == 'skipped':
+                progress.finished(step.id, ok=False)
+            if log is not None:
+                log.event(step.status, step.error or f"{step.action} {step.status}", step.id, step.details,
+                          step.result, step.status == 'failed')
+            if on_step is not None:
+                on_step(step)
+        scheduler = StepScheduler(self.steps, max_workers or self.plan.get('max_workers', 8), running)
+        steps = scheduler.run(finished)
+        return [step.report() for step in steps.values()]
+
+    def resolve(self, inventory):
+        """
+        Checks every workspace and folder the plan names against `inventory`, a list of workspaces as returned
+        by `Workato.list_workspaces()` or saved by tools/dump_workspaces.py (optionally with their 'folders' and
+        'projects'). Workspaces the plan creates must not exist yet. Returns a list of problems; an empty list
+        means everything was found.
+        """
+        by_id = {str(ws['id']): ws for ws in inventory}
+        by_id.update({f"E{ws['external_id']}": ws for ws in inventory if ws.get('external_id')})
+        problems = []
+        for workspace in self.plan.get('workspaces', []):
+            key = f"E{workspace['external_id']}"
+            if key in by_id:
+                problems.append(f"create: workspace {key} already exists.")
+            by_id.setdefault(key, {'id': None, 'external_id': workspace['external_id']})
+        for deployment in self.plan.get('deployments', []):
+            name = deployment['name']
+            named = [deployment['source']['workspace']]
+            for dest in deployment.get('destinations', []):
+                named += [dest['workspace']] + ([dest['properties']['from']] if 'from' in (dest.get('properties') or {}) else [])
+                ws = by_id.get(str(dest['workspace']))
+                if ws is not None and (ws.get('folders') or ws.get('projects')):
+                    folders = {str(f['id']) for f in ws.get('folders') or []}
+                    folders.update(str(p['folder_id']) for p in ws.get('projects') or [] if 'folder_id' in p)
+                    if str(dest['folder']) not in folders:
+                        problems.append(f"{name}: folder {dest['folder']} not found in workspace {dest['workspace']}.")
+            for workspace in named:
+                if str(workspace) not in by_id:
+                    problems.append(f"{name}: workspace {workspace} not found.")
+        return problems
+
+    def dry_run(self, inventory=None, metrics=None, rate_limit=None, max_workers=None, default_latency=0.5):
+        """
+        Estimates the plan without sending any requests: resolves its inputs against `inventory` (see
+        `resolve()`), counts the requests each step will send, and simulates the schedule with `ScheduleSimulator`
+        using the latency and polling history in `metrics` (the client's, by default) and the client's rate limit
+        (or `rate_limit`, in requests per second). Assumes every step succeeds.
+        """
+        simulator = ScheduleSimulator(metrics if metrics is not None else self.client.metrics,
+                                      rate_limit if rate_limit is not None else self.client.rate_limiter,
+                                      self.client.poll_interval, default_latency)
+        estimate = simulator.run(self.steps, max_workers or self.plan.get('max_workers', 8))
+        estimate['problems'] = self.resolve(inventory) if inventory is not None else []
+        return estimate
+
+class ScheduleSimulator:
+    def __init__(self, metrics=None, rate_limit=None, poll_interval=3, default_latency=0.5, default_polls=2):
+        """
+        Plays a list of PlanSteps through a simulated clock instead of the API. Each request takes the mean
+        latency observed for its endpoint family in `metrics` (or `default_latency`), status checks repeat as
+        many times as they have on average (or `default_polls`) with `poll_interval` between them, and requests
+        pass through a simulated token bucket when `rate_limit` (a RateLimiter or requests per second) is given;
+        0 simulates no limit.
+        """
+        self.latency = {}
+        self.polls = {}
+        if metrics is not None:
+            snapshot = metrics.snapshot()
+            for e in snapshot['endpoints']:
+                family = 'download' if e['endpoint'].startswith('download:') else e['endpoint']
+                self.latency[(e['method'], family)] = e['seconds_total'] / e['count'] if e['count'] else default_latency
+            self.polls = {op: p['requests'] / p['waits'] for op, p in snapshot['polls'].items() if p['waits']}
+        if isinstance(rate_limit, RateLimiter):
+            self.rate, self.burst = rate_limit.rate, rate_limit.burst
+        elif rate_limit:
+            if rate_limit < 0:
+                raise ValueError(f"ScheduleSimulator(): rate_limit must not be negative, not {rate_limit}.")
+            self.rate, self.burst = float(rate_limit), float(max(1, rate_limit))
+        else:
+            self.rate, self.burst = None, None
+        self.poll_interval = poll_interval
+        self.default_latency = default_latency
+        self.default_polls = default_polls
+
+    def actions(self, step):
+        # expands a step's calls into (request or sleep, ...) actions
+        actions = []
+        for method, endpoint, poll in step.calls:
+            latency = self.latency.get((method, endpoint), self.default_latency)
+            repeats = max(1, int(round(self.polls.get(poll, self.default_polls)))) if poll else 1
+            for n in range(repeats):
+                if n:
+                    actions.append(('sleep', self.poll_interval))
+                actions.append(('request', f"{method} {endpoint}", latency))
+        return actions
+
+    def run(self, steps, max_workers=8):
+        """
+        Returns the expected duration, the number of requests (in total and by endpoint), the peak number of
+        steps running and requests in flight at once, and the time spent waiting on the rate limit.
+        """
+        scheduler = StepScheduler(steps, max_workers)
+        chain = scheduler.chain
+        state = {step.id: {'actions': self.actions(step), 'next': 0, 'start': None, 'finish': None} for step in steps}
+        pending, done = {step.id: step for step in steps}, set()
+        events, running, sequence = [], 0, 0
+        tokens, updated, throttled = self.burst, 0.0, 0.0
+        requests, in_flight = {}, []
+        now = 0.0
+        while pending or events:
+            ready = [s for s in pending.values() if all(d in done for d in s.depends_on)]
+            for step in sorted(ready, key=lambda s: -chain[s.id])[:max(0, max_workers - running)]:
+                del pending[step.id]
+                state[step.id]['start'] = now
+                running += 1
+                heapq.heappush(events, (now, sequence, step.id))
+                sequence += 1
+            if not events:
+                break
+            now, _, step_id = heapq.heappop(events)
+            current = state[step_id]
+            if current['next'] == len(current['actions']):
+                current['finish'] = now
+                done.add(step_id)
+                running -= 1
+                continue
+            action = current['actions'][current['next']]
+            current['next'] += 1
+            if action[0] == 'sleep':
+                heapq.heappush(events, (now + action[1], sequence, step_id))
+            else:
+                granted = now
+                if self.rate:
+                    granted = max(now, updated)
+                    tokens = min(self.burst, tokens + (granted - updated) * self.rate)
+                    if tokens < 1:
+                        granted += (1 - tokens) / self.rate
+                        tokens = 1.0
+                    tokens -= 1
+                    updated = granted
+                    throttled += granted - now
+                requests[action[1]] = requests.get(action[1], 0) + 1
+                in_flight.append((granted, granted + action[2]))
+                heapq.heappush(events, (granted + action[2], sequence, step_id))
+            sequence += 1
+
+        def peak(intervals):
+            edges = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+            level = highest = 0
+            for _, delta in edges:
+                level += delta
+                highest = max(highest, level)
+            return highest
+
+        spans = [(v['start'], v['finish']) for v in state.values() if v['finish'] is not None]
+        return {'steps': len(steps), 'requests': sum(requests.values()), 'requests_by_endpoint': requests,
+                'expected_seconds': round(max([end for _, end in spans], default=0.0), 3),
+                'peak_concurrency': peak(spans), 'peak_in_flight': peak(in_flight),
+                'rate_limit_wait_seconds': round(throttled, 3),
+                'schedule': [{'id': step_id, 'start': round(v['start'], 3), 'finish': round(v['finish'], 3)}
+                             for step_id, v in state.items() if v['finish'] is not None]}
+
+
+#
+# BACKUP CLASSES
+# [exporting many manifests' packages into an archive]
+
+class BackupStore:
+    def __init__(self, store_dir):
+        """
+        An incremental backup store for RLCM packages. Each package is split into its member files, which are
+        stored once each under `objects/`, gzipped and named by the SHA-256 of their contents (the same hashes as
+        `package_assets()`), so a recipe that is identical across workspaces and nights takes up space once.
+        Every night gets an index in `indexes/<YYYY-MM-DD>.json` listing, for each backed-up package, its
+        members and their hashes, from which `restore()` rebuilds the zip. Threads may share one store.
+        """
+        self.store_dir = store_dir
+        self.objects_dir = os.path.join(store_dir, 'objects')
+        self.indexes_dir = os.path.join(store_dir, 'indexes')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.indexes_dir, exist_ok=True)
+        self.lock = threading.Condition()
+        self.pending = {}   # night -> {key: entry} not yet written by save_index()
+        self.writing = set()
+        self.in_use = {}    # sha256 -> packages being stored that refer to it, not yet in `pending`
+
+    def object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], f"{sha256}.gz")
+
+    def put_package(self, package_file, night, key, details=None):
+        """
+        Stores the members of `package_file` that the store doesn't have yet and adds the package to `night`'s
+        index as `key` (eg. "<workspace>/<manifest ID>"), along with `details`. Returns the index entry, which
+        counts the objects and (uncompressed) bytes that were new.
+        """
+        import gzip, tempfile, zipfile
+        assets = package_assets(package_file)
+        members, new_objects, new_bytes = [], 0, 0
+        try:
+            with zipfile.ZipFile(package_file) as zf:
+                for info in zf.infolist():
+                    if info.is_dir():
+                        continue
+                    sha256 = assets[info.filename]['sha256']
+                    members.append({'name': info.filename, 'sha256': sha256, 'size': info.file_size,
+                                    'date_time': list(info.date_time)})
+                    object_file = self.object_path(sha256)
+                    with self.lock:
+                        self.in_use[sha256] = self.in_use.get(sha256, 0) + 1   # so prune() leaves it alone
+                        while sha256 in self.writing:   # another thread is storing it from another package
+                            self.lock.wait()
+                        if os.path.exists(object_file):
+                            continue
+                        self.writing.add(sha256)
+                    try:
+                        os.makedirs(os.path.dirname(object_file), exist_ok=True)
+                        handle, temp_file = tempfile.mkstemp(dir=os.path.dirname(object_file), suffix='.tmp')
+                        with os.fdopen(handle, 'wb') as tf, gzip.GzipFile(fileobj=tf, mode='wb', mtime=0) as compressed, zf.open(info) as member:
+                            for chunk in iter(lambda: member.read(65536), b''):
+                                compressed.write(chunk)
+                        os.replace(temp_file, object_file)
+                    finally:
+                        with self.lock:
+                            self.writing.discard(sha256)
+                            self.lock.notify_all()
+                    new_objects += 1
+                    new_bytes += info.file_size
+            entry = {**(details or {}), 'members': members, 'new_objects': new_objects, 'new_bytes': new_bytes}
+            with self.lock:
+                self.pending.setdefault(night, {})[key] = entry
+        finally:
+            with self.lock:
+                for member in members:
+                    self.in_use[member['sha256']] -= 1
+                    if not self.in_use[member['sha256']]:
+                        del self.in_use[member['sha256']]
+        return entry
+
+    def save_index(self, night):
+        """Writes the packages stored for `night` since the last save into its index (adding to what's there)."""
+        import tempfile
+        with self.lock:
+            entries = self.pending.pop(night, {})
+            packages = {**self.index(night), **entries}
+            handle, temp_file = tempfile.mkstemp(dir=self.indexes_dir, suffix='.tmp')
+            with os.fdopen(handle, 'w') as tf:
+                json.dump(packages, tf, indent=4, sort_keys=True)
+            os.replace(temp_file, os.path.join(self.indexes_dir, f"{night}.json"))
+        return packages
+
+    def nights(self):
+        return sorted(fn[:-5] for fn in os.listdir(self.indexes_dir) if fn.endswith('.json'))
+
+    def index(self, night):
+        """Returns {key: entry} for every package backed up on `night` ({} if there was no backup)."""
+        try:
+            with open(os.path.join(self.indexes_dir, f"{night}.json"), 'r') as index:
+                return json.load(index)
+        except FileNotFoundError:
+            return {}
+
+    def restore(self, night, key, package_file):
+        """Rebuilds the package stored as `key` on `night` into the zip `package_file`."""
+        import gzip, zipfile
+        entry = self.index(night).get(key)
+        if entry is None:
+            raise InternalOperationError(f"BackupStore.restore(): no package {key} in the backup of {night}.")
+        with zipfile.ZipFile(package_file, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for member in entry['members']:
+                info = zipfile.ZipInfo(member['name'], tuple(member['date_time']))
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with gzip.open(self.object_path(member['sha256']), 'rb') as stored, zf.open(info, 'w') as copy:
+                    for chunk in iter(lambda: stored.read(65536), b''):
+                        copy.write(chunk)
+        return package_file
+
+    def prune(self, keep_nights):
+        """
+        Deletes the indexes of all but the latest `keep_nights` nights, then every object no remaining index
+        refers to. Packages stored but not yet indexed by `save_index()` keep their objects too. Returns the
+        number of objects deleted.
+        """
+        with self.lock:
+            nights = self.nights()
+            for night in nights[:-keep_nights] if keep_nights else nights:
+                os.remove(os.path.join(self.indexes_dir, f"{night}.json"))
+            entries = [entry for night in self.nights() for entry in self.index(night).values()]
+            entries += [entry for pending in self.pending.values() for entry in pending.values()]
+            referenced = {member['sha256'] for entry in entries for member in entry['members']} | set(self.in_use)
+            removed = 0
+            for prefix in os.listdir(self.objects_dir):
+                for fn in os.listdir(os.path.join(self.objects_dir, prefix)):
+                    if fn.endswith('.gz') and fn[:-3] not in referenced:
+                        os.remove(os.path.join(self.objects_dir, prefix, fn))
+                        removed += 1
+        return removed
+
+    def backup(self, client, workspaces=None, workers=8, night=None, on_export=None, progress=None):
+        """
+        Exports every manifest of `workspaces` (default: every managed user workspace) with a BulkExport and
+        stores the packages for `night` (default: today). Only assets the store hasn't seen before take up
+        space. Returns the BulkExport results.
+        """
+        exporter = BulkExport(client, os.path.join(self.store_dir, 'incoming'), workers, store=self)
+        return exporter.run(exporter.manifests(workspaces), on_export, progress, night)
+
+class BulkExport:
+    def __init__(self, client, archive_dir, workers=8, retries=3, store=None):
+        """
+        Exports many RLCM manifests at once and downloads their packages into a dated directory of `archive_dir`,
+        as `<YYYY-MM-DD>/<workspace external ID (or ID)>/<manifest ID>.zip`. Up to `workers` requests run at a
+        time: exports are all started up front, a single loop then checks every running export once each
+        `client.poll_interval` seconds (instead of a thread sleeping on each one), and each finished package is
+        downloaded as soon as it is ready. A package whose bytes were already stored during the run is hard-linked
+        to the first copy rather than stored again. Requests go at 'bulk' priority, and an export refused with
+        429 is started again at the next poll, up to `retries` times.
+
+        Pass a BackupStore as `store` to keep packages there instead: each is downloaded into `archive_dir`,
+        split into the store under the night's index, and deleted (see `BackupStore.backup()`).
+        """
+        self.client = client
+        self.archive_dir = archive_dir
+        self.workers = workers
+        self.retries = retries
+        self.store = store
+        self.lock = threading.Lock()
+        self.stored = {}    # sha256 -> the first archive path stored with those bytes
+
+    def manifests(self, workspaces=None):
+        """
+        Lists the export manifests of every workspace in `workspaces` (workspace dicts, as yielded by
+        `list_workspaces()`; default: every managed user workspace), `workers` workspaces at a time. Returns a
+        list of {'workspace_id', 'external_id', 'manifest_id', 'name'}.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        with self.client.priority('bulk'):
+            workspaces = list(self.client.list_workspaces() if workspaces is None else workspaces)
+
+        def listed(workspace):
+            with self.client.priority('bulk'):
+                return [{'workspace_id': workspace['id'], 'external_id': workspace.get('external_id'),
+                         'manifest_id': manifest['id'], 'name': manifest.get('name')}
+                        for manifest in self.client.list_export_manifests(workspace['id'])]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return [export for found in pool.map(self.client.carry_deadline(listed), workspaces) for export in found]
+
+    def run(self, exports=None, on_export=None, progress=None, date=None, deadline=None):
+        """
+        Exports and downloads every manifest in `exports` (as returned by `manifests()`, which is called when it
+        is omitted); a manifest listed twice is exported once. Returns one result per manifest: the export's
+        fields plus 'status' ('archived' or 'failed'), 'package_id', 'file', 'size', 'sha256', 'duplicate_of'
+        (the file it is linked to, if its bytes were already stored), 'polls', 'seconds' and 'error'. Paths are
+        relative to `archive_dir`. `on_export(result)` is called as each manifest finishes, and a
+        ProgressReporter passed as `progress` counts them. The results are also saved as index.json in the
+        dated directory -- or, with a store, the packages are indexed there instead, and each result has the
+        'new_objects' and 'new_bytes' the store gained from it in place of a file.
+
+        With a `deadline` (seconds, or a Deadline; by default the one the calling thread is running under, if any),
+        the requests made for every manifest share it, and manifests not archived when it passes are failed.
+        """
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+        deadline = deadline if deadline is not None else self.client.current_deadline()
+        if deadline is not None and not isinstance(deadline, Deadline):
+            deadline = Deadline(deadline)
+
+        def bounded(fn, *args):
+            with self.client.deadline(deadline) if deadline is not None else nullcontext():
+                return fn(*args)
+
+        exports = self.manifests() if exports is None else exports
+        day = date or time.strftime('%Y-%m-%d')
+        results, keys = [], set()
+        for export in exports:
+            if (export['workspace_id'], export['manifest_id']) not in keys:
+                keys.add((export['workspace_id'], export['manifest_id']))
+                results.append({**export, 'status': 'pending', 'package_id': None, 'file': None, 'size': None,
+                                'sha256': None, 'duplicate_of': None, 'polls': 0, 'seconds': None, 'error': None})
+        if progress is not None and progress.total is None:
+            progress.total = len(results)
+        started, attempts = {}, {}
+
+        def finish(result):
+            result['seconds'] = round(time.monotonic() - started[id(result)], 3)
+            if result['polls']:
+                self.client.metrics.record_poll('export', result['seconds'], result['polls'])
+            if progress is not None:
+                progress.finished(f"{result['workspace_id']}:{result['manifest_id']}", result['status'] == 'archived')
+            if on_export is not None:
+                on_export(result)
+
+        def start(result):
+            started.setdefault(id(result), time.monotonic())
+            attempts[id(result)] = attempts.get(id(result), 0) + 1
+            if progress is not None:
+                progress.started(f"{result['workspace_id']}:{result['manifest_id']}")
+            return bounded(self._start, result, attempts[id(result)] > self.retries)
+
+        running, refused = [], []
+        next_poll = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            busy = {pool.submit(start, result): result for result in results}
+            while busy or running or refused:
+                timeout = max(0.0, next_poll - time.monotonic()) if running or refused else None
+                if busy:
+                    done, _ = wait(busy, timeout=timeout, return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(timeout)
+                    done = ()
+                for future in done:
+                    result, state = busy.pop(future), future.result()
+                    if state == 'running':
+                        running.append(result)
+                    elif state == 'refused':
+                        refused.append(result)
+                    else:
+                        finish(result)
+                if deadline is not None and deadline.remaining() <= 0:
+                    for result in running + refused:
+                        self._fail(result, f"BulkExport.run(): the {deadline.seconds}s deadline has passed.")
+                        finish(result)
+                    running, refused = [], []
+                if (running or refused) and time.monotonic() >= next_poll:
+                    busy.update({pool.submit(start, result): result for result in refused})
+                    statuses = pool.map(lambda result: bounded(self._check, result), running)
+                    checked, running, refused = zip(running, statuses), [], []
+                    for result, (state, download_url) in checked:
+                        if state == 'completed':
+                            busy[pool.submit(bounded, self._download, result, download_url, day)] = result
+                        elif state == 'running':
+                            running.append(result)
+                        else:
+                            finish(result)
+                    next_poll = time.monotonic() + self.client.poll_interval
+        if self.store is not None:
+            import shutil
+            shutil.rmtree(os.path.join(self.archive_dir, day), ignore_errors=True)    # only emptied directories left
+            self.store.save_index(day)
+            return results
+        os.makedirs(os.path.join(self.archive_dir, day), exist_ok=True)
+        with open(os.path.join(self.archive_dir, day, 'index.json'), 'w') as index:
+            json.dump(results, index, indent=4, default=str)
+        return results
+
+    def _fail(self, result, error):
+        result['status'], result['error'] = 'failed', str(error)
+        return 'failed'
+
+    def _start(self, result, last_attempt):
+        try:
+            with self.client.priority('bulk'):
+                response = self.client.export_package(result['manifest_id'], workspace_id=result['workspace_id'])
+        except InternalOperationError as ex:
+            return self._fail(result, ex.message)
+        if response.status_code == 429 and not last_attempt:
+            return 'refused'
+        if response.status_code not in [200, 201] or 'id' not in response.data:
+            return self._fail(result, response.log_message)
+        result['package_id'] = response.data['id']
+        return 'running'
+
+    def _check(self, result):
+        # one status request; returns (state, download URL) where state is 'running', 'completed' or 'failed'
+        result['polls'] += 1
+        try:
+            with self.client.priority('bulk'):
+                response = self.client.api_request('get', f"/api/managed_users/{result['workspace_id']}/exports/{result['package_id']}")
+        except InternalOperationError as ex:
+            return self._fail(result, ex.message), None
+        if response.status_code == 429 or response.status_code >= 500:
+            return 'running', None
+        if response.status_code not in [200, 201]:
+            return self._fail(result, response.log_message), None
+        status = response.data.get('result') or response.data
+        if status['status'] == 'completed':
+            return 'completed', status['download_url']
+        if status['status'] in ['failed', 'error', 'stopped']:
+            return self._fail(result, f"Export {result['package_id']} {status['status']}."), None
+        return 'running', None
+
+    def _download(self, result, download_url, day):
+        folder = os.path.join(day, re.sub(r"[^\w.-]", "_", str(result['external_id'] or result['workspace_id'])))
+        os.makedirs(os.path.join(self.archive_dir, folder), exist_ok=True)
+        path = os.path.join(folder, f"{result['manifest_id']}.zip")
+        local_file = os.path.join(self.archive_dir, path)
+        try:
+            self.client.download_package(download_url, f"{local_file}.part")
+            digest = hashlib.sha256()
+            with open(f"{local_file}.part", 'rb') as package:
+                for chunk in iter(lambda: package.read(65536), b''):
+                    digest.update(chunk)
+            result['size'], result['sha256'] = os.path.getsize(f"{local_file}.part"), digest.hexdigest()
+            if self.store is not None:
+                key = f"{os.path.basename(folder)}/{result['manifest_id']}"
+                stored = self.store.put_package(f"{local_file}.part", day, key, {
+                    field: result[field] for field in ['workspace_id', 'external_id', 'manifest_id', 'name', 'package_id', 'size', 'sha256']})
+                os.remove(f"{local_file}.part")
+                result['new_objects'], result['new_bytes'], result['status'] = stored['new_objects'], stored['new_bytes'], 'archived'
+                return 'archived'
+            with self.lock:
+                first = self.stored.get(result['sha256'])
+                if first is None:
+                    os.replace(f"{local_file}.part", local_file)
+                    self.stored[result['sha256']] = path
+                else:
+                    try:
+                        if os.path.exists(local_file):
+                            os.remove(local_file)
+                        os.link(os.path.join(self.archive_dir, first), local_file)
+                        os.remove(f"{local_file}.part")
+                    except OSError:     # no hard links here (eg. some network filesystems): keep the copy
+                        os.replace(f"{local_file}.part", local_file)
+                    result['duplicate_of'] = first
+        except (InternalOperationError, OSError) as ex:
+            return self._fail(result, getattr(ex, 'message', ex))
+        result['status'], result['file'] = 'archived', path
+        return 'archived'
+
+#
+# INVENTORY CLASSES
+# [a local, queryable copy of the recipes and connections in every workspace]
+
+def recipe_record(recipe, workspace):
+    """
+    Cuts a recipe, as listed by the API, down to the fields fleet queries need: where it lives, whether it
+    runs, the connectors it uses and the connections it is bound to, its version and job counts. The recipe's
+    code is dropped.
+    """
+    connectors = recipe.get('applications') or [recipe.get('trigger_application')] + list(recipe.get('action_applications') or [])
+    return {'kind': 'recipe', 'workspace_id': workspace['id'], 'external_id': workspace.get('external_id'),
+            'id': recipe['id'], 'name': recipe.get('name'), 'folder_id': recipe.get('folder_id'),
+            'running': bool(recipe.get('running')), 'trigger': recipe.get('trigger_application'),
+            'connectors': sorted({c for c in connectors if c}),
+            'connection_ids': sorted({c['account_id'] for c in recipe.get('config') or [] if c.get('account_id')}),
+            'version': recipe.get('version_no'), 'updated_at': recipe.get('updated_at'),
+            'last_run_at': recipe.get('last_run_at'), 'stop_cause': recipe.get('stop_cause'),
+            'jobs_succeeded': recipe.get('job_succeeded_count'), 'jobs_failed': recipe.get('job_failed_count')}
+
+def connection_record(connection, workspace):
+    """Cuts a connection, as listed by the API, down to where it lives, its connector and whether it is authorized."""
+    return {'kind': 'connection', 'workspace_id': workspace['id'], 'external_id': workspace.get('external_id'),
+            'id': connection['id'], 'name': connection.get('name'),
+            'connector': connection.get('application') or connection.get('provider'), 'folder_id': connection.get('folder_id'),
+            'authorized': connection.get('authorization_status') == 'success',
+            'error': connection.get('authorization_error'), 'updated_at': connection.get('updated_at')}
+
+class Inventory:
+    def __init__(self, records=()):
+        """
+        Recipe and connection records (see `recipe_record()` and `connection_record()`) from many workspaces,
+        indexed by workspace and by connector, so that questions like "which running recipes use connector X"
+        are answered locally. Build one with `Workato.crawl_inventory()`, or `Inventory.load()` a saved one.
+        Workspaces are given as Workato IDs or "E<external_id>".
+        """
+        self.records = []
+        self.by_workspace = {}
+        self.by_connector = {}
+        self.errors = {}    # workspace ID -> why it couldn't be crawled
+        self.add(records)
+
+    def add(self, records):
+        for record in records:
+            self.records.append(record)
+            for key in {str(record['workspace_id'])} | ({f"E{record['external_id']}"} if record['external_id'] else set()):
+                self.by_workspace.setdefault(key, []).append(record)
+            for connector in record.get('connectors') or [record.get('connector')]:
+                self.by_connector.setdefault(connector, []).append(record)
+        return None
+
+    def _select(self, kind, workspace, connector):
+        # starts from the smaller index that applies, then filters on the other
+        candidates = [self.records]
+        if workspace is not None:
+            candidates.append(self.by_workspace.get(str(workspace), []))
+        if connector is not None:
+            candidates.append(self.by_connector.get(connector, []))
+        records = min(candidates, key=len)
+        return [r for r in records if r['kind'] == kind
+                and (workspace is None or str(workspace) in [str(r['workspace_id']), f"E{r['external_id']}"])
+                and (connector is None or connector in (r.get('connectors') or [r.get('connector')]))]
+
+    def recipes(self, workspace=None, connector=None, running=None):
+        """The recipes in `workspace` (default: all) using `connector` (eg. 'salesforce'), optionally only running ones (or stopped)."""
+        return [r for r in self._select('recipe', workspace, connector) if running is None or r['running'] == running]
+
+    def connections(self, workspace=None, connector=None, authorized=None):
+        """The connections in `workspace` (default: all) to `connector`, optionally only authorized ones (or failing)."""
+        return [r for r in self._select('connection', workspace, connector) if authorized is None or r['authorized'] == authorized]
+
+    def workspaces(self, connector=None, running=None):
+        """The IDs of the workspaces with a recipe using `connector` (running, or stopped, if given)."""
+        return sorted({r['workspace_id'] for r in self.recipes(connector=connector, running=running)}, key=str)
+
+    def summary(self):
+        recipes = [r for r in self.records if r['kind'] == 'recipe']
+        return {'workspaces': len({r['workspace_id'] for r in self.records}), 'recipes': len(recipes),
+                'running': sum(1 for r in recipes if r['running']),
+                'connections': len(self.records) - len(recipes), 'errors': len(self.errors),
+                'connectors': {c: sum(1 for r in found if r['kind'] == 'recipe') for c, found in sorted(self.by_connector.items())}}
+
+    def save(self, inventory_file):
+        """Writes the records, and the workspaces that couldn't be crawled, to `inventory_file` as NDJSON (gzipped if it ends in .gz)."""
+        with open_cassette(inventory_file, 'w') as out:
+            for record in self.records:
+                out.write(json.dumps(record, separators=(',', ':'), default=str) + "\n")
+            for workspace_id, error in self.errors.items():
+                out.write(json.dumps({'kind': 'error', 'workspace_id': workspace_id, 'error': error}, separators=(',', ':')) + "\n")
+        return None
+
+    @classmethod
+    def load(cls, inventory_file):
+        inventory = cls()
+        with open_cassette(inventory_file, 'r') as lines:
+            for line in lines:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record['kind'] == 'error':
+                    inventory.errors[record['workspace_id']] = record['error']
+                else:
+                    inventory.add([record])
+        return inventory